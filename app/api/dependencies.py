@@ -0,0 +1,20 @@
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.services.spotify_api import SpotifyClientError
+from app.services.spotify_client_async import SpotifySession
+
+SESSION_COOKIE_NAME = "spotify_session_id"
+
+
+async def get_spotify_session(request: Request) -> SpotifySession:
+    # FastAPI caches dependencies per request, so every use within a request shares one token lookup.
+    session_id = request.cookies.get(SESSION_COOKIE_NAME)
+    if not session_id:
+        raise HTTPException(status_code=401, detail="Not authorized")
+    return SpotifySession(session_id)
+
+
+async def spotify_client_error_handler(_request: Request, exc: SpotifyClientError) -> JSONResponse:
+    status_code = 401 if exc.auth_error else exc.status_code
+    return JSONResponse(status_code=status_code, content={"detail": exc.message})
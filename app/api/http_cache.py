@@ -0,0 +1,6 @@
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # Weak comparison (RFC 9110 If-None-Match): W/ prefixes are ignored and "*" matches anything.
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
@@ -3,16 +3,18 @@ from fastapi.responses import RedirectResponse
 from urllib.parse import urlencode
 
 from app.core.config import settings
+from app.services.spotify_api import invalidate_session_cache
 from app.services.spotify_oauth import (
     build_authorize_url,
     clear_tokens,
-    exchange_code_for_tokens,
+    exchange_code_for_tokens_async,
     generate_code_challenge,
     generate_code_verifier,
     generate_session_id,
     generate_state,
     is_pending_auth_expired,
     pop_pending_auth,
+    run_token_store_io,
     store_pending_auth,
     store_tokens,
 )
@@ -51,7 +53,7 @@ async def spotify_login(request: Request) -> RedirectResponse:
     state = generate_state()
     verifier = generate_code_verifier()
     challenge = generate_code_challenge(verifier)
-    store_pending_auth(state=state, session_id=session_id, verifier=verifier)
+    await run_token_store_io(store_pending_auth, state=state, session_id=session_id, verifier=verifier)
 
     authorize_url = build_authorize_url(
         authorize_url=settings.spotify_authorize_url,
@@ -95,7 +97,7 @@ async def spotify_callback(
     if cookie_state != state:
         return _redirect_to_frontend_callback(code=code, state=state, error=error)
 
-    pending_auth = pop_pending_auth(state)
+    pending_auth = await run_token_store_io(pop_pending_auth, state)
     if not pending_auth:
         return _redirect_to_frontend_callback(code=code, state=state, error=error)
     if is_pending_auth_expired(pending_auth):
@@ -107,7 +109,7 @@ async def spotify_callback(
 
     verifier = str(pending_auth["verifier"])
     try:
-        token_data = exchange_code_for_tokens(
+        token_data = await exchange_code_for_tokens_async(
             token_url=settings.spotify_token_url,
             client_id=settings.spotify_client_id,
             code=code,
@@ -117,7 +119,9 @@ async def spotify_callback(
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    store_tokens(session_id=session_id, token_data=token_data)
+    await run_token_store_io(store_tokens, session_id=session_id, token_data=token_data, new_login=True)
+    # The session cookie outlives a sign-in; drop whatever the previous account left cached here.
+    invalidate_session_cache(session_id)
 
     response = RedirectResponse(url="/", status_code=302)
     response.delete_cookie(STATE_COOKIE_NAME)
@@ -129,7 +133,8 @@ async def spotify_callback(
 async def auth_logout(request: Request) -> Response:
     session_id = request.cookies.get(SESSION_COOKIE_NAME)
     if session_id:
-        clear_tokens(session_id)
+        await run_token_store_io(clear_tokens, session_id)
+        invalidate_session_cache(session_id)
 
     response = Response(status_code=204)
     response.delete_cookie(SESSION_COOKIE_NAME)
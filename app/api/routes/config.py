@@ -1,5 +1,10 @@
-from fastapi import APIRouter, HTTPException
+import hashlib
+import json
+from functools import lru_cache
 
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.api.http_cache import etag_matches
 from app.core.config import settings
 
 DEFAULT_REDIRECT_URI = "http://127.0.0.1:8000/"
@@ -9,24 +14,48 @@ DEFAULT_SCOPES = (
 )
 DEFAULT_AUTHORIZE_URL = "https://accounts.spotify.com/authorize"
 DEFAULT_TOKEN_URL = "https://accounts.spotify.com/api/token"
+# Short max-age so a hot-reloaded .env reaches browsers quickly; revalidation is a cheap 304.
+CONFIG_CACHE_CONTROL = "public, max-age=60, must-revalidate"
 
 router = APIRouter(tags=["config"])
 
 
+@lru_cache(maxsize=8)
+def _encoded_public_config(
+    client_id: str,
+    redirect_uri: str,
+    scopes: str,
+    authorize_url: str,
+    token_url: str,
+) -> tuple[bytes, str]:
+    body = json.dumps(
+        {
+            "spotify_client_id": client_id,
+            "spotify_redirect_uri": redirect_uri,
+            "spotify_scopes": scopes,
+            "spotify_authorize_url": authorize_url,
+            "spotify_token_url": token_url,
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return body, etag
+
+
 @router.get("/api/config")
-async def get_public_config() -> dict[str, str]:
+async def get_public_config(request: Request) -> Response:
     client_id = settings.spotify_client_id.strip()
     if not client_id:
         raise HTTPException(status_code=500, detail="SPOTIFY_CLIENT_ID is not configured")
 
-    redirect_uri = settings.spotify_redirect_uri.strip() or DEFAULT_REDIRECT_URI
-    scopes = settings.spotify_scopes.strip() or DEFAULT_SCOPES
-    authorize_url = settings.spotify_authorize_url.strip() or DEFAULT_AUTHORIZE_URL
-    token_url = settings.spotify_token_url.strip() or DEFAULT_TOKEN_URL
-    return {
-        "spotify_client_id": client_id,
-        "spotify_redirect_uri": redirect_uri,
-        "spotify_scopes": scopes,
-        "spotify_authorize_url": authorize_url,
-        "spotify_token_url": token_url,
-    }
+    body, etag = _encoded_public_config(
+        client_id,
+        settings.spotify_redirect_uri.strip() or DEFAULT_REDIRECT_URI,
+        settings.spotify_scopes.strip() or DEFAULT_SCOPES,
+        settings.spotify_authorize_url.strip() or DEFAULT_AUTHORIZE_URL,
+        settings.spotify_token_url.strip() or DEFAULT_TOKEN_URL,
+    )
+    headers = {"ETag": etag, "Cache-Control": CONFIG_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
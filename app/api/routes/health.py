@@ -1,8 +1,27 @@
+from typing import Any
+
 from fastapi import APIRouter
 
+import app.services.spotify_oauth as spotify_oauth
+from app.services.spotify_api import RESPONSE_CACHE
+
 router = APIRouter()
 
 
 @router.get("/health")
 async def health_check() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/health/metrics")
+async def health_metrics() -> dict[str, Any]:
+    return {
+        # Counting rows (SQLite) or scanning keys (Redis) blocks; keep it off the event loop.
+        "token_store": await spotify_oauth.run_token_store_io(spotify_oauth.TOKEN_STORE.stats),
+        "response_cache": {
+            "entries": len(RESPONSE_CACHE),
+            "max_entries": RESPONSE_CACHE.max_entries,
+            "hits": RESPONSE_CACHE.hits,
+            "misses": RESPONSE_CACHE.misses,
+        },
+    }
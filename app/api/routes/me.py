@@ -1,19 +1,23 @@
-from fastapi import APIRouter, HTTPException, Query, Request
-from pydantic import BaseModel
-
-from app.services.spotify_client import (
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.api.dependencies import get_spotify_session
+from app.services.spotify_api import (
+    COALESCED_PAGE_MAX_LIMIT,
+    PLAYLIST_ITEMS_PAGE_LIMIT,
     SpotifyClientError,
-    add_items_to_playlist_for_session,
-    create_my_playlist_for_session,
-    get_current_user_for_session,
-    get_playlist_items_for_session,
-    get_my_playlists_for_session,
-    remove_from_my_library_for_session,
-    save_to_my_library_for_session,
-    search_tracks_for_session,
+    bypass_response_cache,
 )
+from app.services.spotify_client_async import SpotifySession
 
-SESSION_COOKIE_NAME = "spotify_session_id"
+PLAYLIST_MAX_ITEMS = 10000
+DASHBOARD_PLAYLISTS_LIMIT = 50
+DASHBOARD_SAVED_TRACKS_LIMIT = 1
 
 router = APIRouter(tags=["spotify-me"])
 
@@ -28,46 +32,68 @@ class AddPlaylistItemsRequest(BaseModel):
     uris: list[str]
 
 
+class BulkAddPlaylistItemsRequest(BaseModel):
+    uris: list[str]
+    position: int | None = Field(default=None, ge=0)
+
+
 class LibraryItemsRequest(BaseModel):
     uris: list[str]
 
 
 @router.get("/api/me")
-async def get_me(request: Request) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
+async def get_me(spotify: SpotifySession = Depends(get_spotify_session)) -> dict:
+    return await spotify.get_current_user()
+
+
+async def _dashboard_library(spotify: SpotifySession) -> dict | None:
+    # The library summary is a nice-to-have: a failure here should not blank the landing page.
+    try:
+        saved_tracks = await spotify.get_saved_tracks(limit=DASHBOARD_SAVED_TRACKS_LIMIT, offset=0)
+    except SpotifyClientError as exc:
+        if exc.auth_error:
+            raise
+        return None
+    return {"saved_tracks_total": max(0, int(saved_tracks.get("total") or 0))}
+
 
+async def _dashboard_playlists(spotify: SpotifySession) -> tuple[dict | None, dict | None]:
+    # A playlists failure leaves the user signed in; the frontend retries through /api/me/playlists.
     try:
-        return get_current_user_for_session(session_id)
+        playlists = await spotify.get_my_playlists(limit=DASHBOARD_PLAYLISTS_LIMIT, offset=0)
     except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+        if exc.auth_error:
+            raise
+        return None, {"status": exc.status_code, "message": exc.message}
+    return playlists, None
+
+
+@router.get("/api/me/dashboard")
+async def get_my_dashboard(spotify: SpotifySession = Depends(get_spotify_session)) -> dict:
+    # Resolve the token before fanning out so the concurrent calls share one lookup.
+    await spotify.access_token()
+    profile, (playlists, playlists_error), library = await asyncio.gather(
+        spotify.get_current_user(),
+        _dashboard_playlists(spotify),
+        _dashboard_library(spotify),
+    )
+    return {"profile": profile, "playlists": playlists, "playlists_error": playlists_error, "library": library}
 
 
 @router.get("/api/me/playlists")
 async def get_my_playlists(
-    request: Request,
-    limit: int = Query(default=10, ge=1, le=10),
+    limit: int = Query(default=10, ge=1, le=COALESCED_PAGE_MAX_LIMIT),
     offset: int = Query(default=0, ge=0),
+    spotify: SpotifySession = Depends(get_spotify_session),
 ) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
-
-    try:
-        return get_my_playlists_for_session(session_id=session_id, limit=limit, offset=offset)
-    except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+    return await spotify.get_my_playlists(limit=limit, offset=offset)
 
 
 @router.post("/api/me/playlists")
-async def create_my_playlist(request: Request, payload: CreatePlaylistRequest) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
-
+async def create_my_playlist(
+    payload: CreatePlaylistRequest,
+    spotify: SpotifySession = Depends(get_spotify_session),
+) -> dict:
     name = payload.name.strip()
     if not name:
         raise HTTPException(status_code=422, detail="Playlist name is required")
@@ -78,119 +104,105 @@ async def create_my_playlist(request: Request, payload: CreatePlaylistRequest) -
         if not description:
             description = None
 
-    try:
-        return create_my_playlist_for_session(
-            session_id=session_id,
-            name=name,
-            description=description,
-            public=payload.public,
-        )
-    except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+    return await spotify.create_my_playlist(name=name, description=description, public=payload.public)
 
 
 @router.get("/api/me/playlists/{playlist_id}/items")
 async def get_playlist_items(
     playlist_id: str,
-    request: Request,
     limit: int = Query(default=25, ge=1, le=50),
     offset: int = Query(default=0, ge=0),
+    spotify: SpotifySession = Depends(get_spotify_session),
 ) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
+    return await spotify.get_playlist_items(playlist_id=playlist_id, limit=limit, offset=offset)
+
 
+async def _ndjson_lines(items: AsyncIterator[dict[str, Any]]) -> AsyncIterator[bytes]:
     try:
-        return get_playlist_items_for_session(
-            session_id=session_id,
+        async for item in items:
+            yield json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n"
+    except SpotifyClientError as exc:
+        # Headers are already sent, so a mid-stream failure is reported as the final line.
+        error = {"status": 401 if exc.auth_error else exc.status_code, "message": exc.message}
+        yield json.dumps({"error": error}, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+@router.get("/api/me/playlists/{playlist_id}/items/stream")
+async def stream_playlist_items(
+    playlist_id: str,
+    spotify: SpotifySession = Depends(get_spotify_session),
+) -> StreamingResponse:
+    with bypass_response_cache():
+        first_page = await spotify.get_playlist_items(
             playlist_id=playlist_id,
-            limit=limit,
-            offset=offset,
+            limit=PLAYLIST_ITEMS_PAGE_LIMIT,
+            offset=0,
         )
-    except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+    return StreamingResponse(
+        _ndjson_lines(spotify.iter_playlist_items(playlist_id=playlist_id, first_page=first_page)),
+        media_type="application/x-ndjson",
+        headers={"X-Total-Count": str(max(0, int(first_page.get("total") or 0)))},
+    )
 
 
 @router.get("/api/search")
 async def search_tracks(
-    request: Request,
     q: str = Query(min_length=1),
     _search_type: str = Query(default="track", alias="type", pattern="^track$"),
-    limit: int = Query(default=10, ge=1, le=10),
+    limit: int = Query(default=10, ge=1, le=COALESCED_PAGE_MAX_LIMIT),
     offset: int = Query(default=0, ge=0),
+    spotify: SpotifySession = Depends(get_spotify_session),
 ) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
-
-    try:
-        return search_tracks_for_session(
-            session_id=session_id,
-            query=q,
-            limit=limit,
-            offset=offset,
-        )
-    except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+    return await spotify.search_tracks(query=q, limit=limit, offset=offset)
 
 
 @router.post("/api/playlists/{playlist_id}/items")
 async def add_playlist_items(
     playlist_id: str,
-    request: Request,
     payload: AddPlaylistItemsRequest,
+    spotify: SpotifySession = Depends(get_spotify_session),
 ) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
+    uris = [uri.strip() for uri in payload.uris if isinstance(uri, str) and uri.strip()]
+    if not uris:
+        raise HTTPException(status_code=422, detail="At least one track URI is required")
+
+    return await spotify.add_items_to_playlist(playlist_id=playlist_id, uris=uris)
 
+
+@router.post("/api/playlists/{playlist_id}/items/bulk")
+async def add_playlist_items_bulk(
+    playlist_id: str,
+    payload: BulkAddPlaylistItemsRequest,
+    spotify: SpotifySession = Depends(get_spotify_session),
+) -> dict:
     uris = [uri.strip() for uri in payload.uris if isinstance(uri, str) and uri.strip()]
     if not uris:
         raise HTTPException(status_code=422, detail="At least one track URI is required")
+    if len(uris) > PLAYLIST_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {PLAYLIST_MAX_ITEMS} track URIs are allowed")
 
-    try:
-        return add_items_to_playlist_for_session(
-            session_id=session_id,
-            playlist_id=playlist_id,
-            uris=uris,
-        )
-    except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+    return await spotify.add_items_to_playlist_in_chunks(playlist_id=playlist_id, uris=uris, position=payload.position)
 
 
 @router.put("/api/library")
-async def save_to_my_library(request: Request, payload: LibraryItemsRequest) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
-
+async def save_to_my_library(
+    payload: LibraryItemsRequest,
+    spotify: SpotifySession = Depends(get_spotify_session),
+) -> dict:
     uris = [uri.strip() for uri in payload.uris if isinstance(uri, str) and uri.strip()]
     if not uris:
         raise HTTPException(status_code=422, detail="At least one Spotify URI is required")
 
-    try:
-        return save_to_my_library_for_session(session_id=session_id, uris=uris)
-    except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+    return await spotify.save_to_my_library_in_chunks(uris=uris)
 
 
 @router.delete("/api/library")
-async def remove_from_my_library(request: Request, payload: LibraryItemsRequest) -> dict:
-    session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    if not session_id:
-        raise HTTPException(status_code=401, detail="Not authorized")
-
+async def remove_from_my_library(
+    payload: LibraryItemsRequest,
+    spotify: SpotifySession = Depends(get_spotify_session),
+) -> dict:
     uris = [uri.strip() for uri in payload.uris if isinstance(uri, str) and uri.strip()]
     if not uris:
         raise HTTPException(status_code=422, detail="At least one Spotify URI is required")
 
-    try:
-        return remove_from_my_library_for_session(session_id=session_id, uris=uris)
-    except SpotifyClientError as exc:
-        status_code = 401 if exc.auth_error else exc.status_code
-        raise HTTPException(status_code=status_code, detail=exc.message) from exc
+    return await spotify.remove_from_my_library_in_chunks(uris=uris)
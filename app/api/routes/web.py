@@ -0,0 +1,42 @@
+from functools import lru_cache
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.api.http_cache import etag_matches
+from app.services.static_assets import StaticAsset, build_asset_bundle, negotiate_encoding
+
+WEB_DIR = Path(__file__).resolve().parents[2] / "web"
+
+router = APIRouter(tags=["web"])
+
+
+@lru_cache(maxsize=1)
+def get_web_assets() -> dict[str, StaticAsset]:
+    return build_asset_bundle(WEB_DIR)
+
+
+def _asset_response(request: Request, asset: StaticAsset) -> Response:
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), asset.variants)
+    # Each encoding is a distinct representation, so it gets its own strong ETag.
+    etag = asset.etag if encoding == "identity" else f'{asset.etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=asset.variants[encoding], media_type=asset.content_type, headers=headers)
+
+
+@router.api_route("/", methods=["GET", "HEAD"], include_in_schema=False)
+async def read_index(request: Request) -> Response:
+    return _asset_response(request, get_web_assets()["/"])
+
+
+@router.api_route("/web/{asset_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def read_web_asset(request: Request, asset_path: str) -> Response:
+    asset = get_web_assets().get(f"/web/{asset_path}")
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return _asset_response(request, asset)
@@ -1,70 +1,157 @@
 import os
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, fields
 from pathlib import Path
+from typing import Any, cast, get_type_hints
+
+
+DEFAULT_SPOTIFY_SCOPES = (
+    "user-read-private user-read-email playlist-modify-private "
+    "playlist-modify-public user-library-read user-library-modify"
+)
+ENV_FILE_PATH = Path(".env")
+# How often get_settings() may stat .env; keeps per-request attribute reads cheap.
+CONFIG_RELOAD_CHECK_SECONDS = 1.0
 
 
 @dataclass(frozen=True)
 class Settings:
-    spotify_client_id: str
-    spotify_redirect_uri: str
-    spotify_scopes: str
-    spotify_authorize_url: str
-    spotify_token_url: str
+    spotify_client_id: str = ""
+    spotify_redirect_uri: str = "http://127.0.0.1:8000/"
+    spotify_scopes: str = DEFAULT_SPOTIFY_SCOPES
+    spotify_authorize_url: str = "https://accounts.spotify.com/authorize"
+    spotify_token_url: str = "https://accounts.spotify.com/api/token"
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry_seconds: float = 30.0
+    http_connect_timeout_seconds: float = 5.0
+    http_timeout_seconds: float = 15.0
+    token_refresh_skew_seconds: float = 60.0
+    token_refresher_interval_seconds: float = 30.0
+    token_refresher_active_window_seconds: float = 1800.0
+    token_refresh_lease_seconds: float = 30.0
+    token_refresh_failure_backoff_seconds: float = 300.0
+    spotify_cache_max_entries: int = 4096
+    spotify_cache_profile_ttl_seconds: float = 300.0
+    spotify_cache_playlists_ttl_seconds: float = 30.0
+    spotify_cache_track_ttl_seconds: float = 86400.0
+    spotify_rate_limit_per_second: float = 10.0
+    spotify_rate_limit_burst: int = 20
+    spotify_max_retries: int = 3
+    spotify_retry_base_delay_seconds: float = 0.5
+    spotify_retry_max_delay_seconds: float = 30.0
+    spotify_fanout_concurrency: int = 8
+    token_store_url: str = "memory://"
+    token_store_cache_ttl_seconds: float = 5.0
+    token_store_max_entries: int = 100000
+    token_store_sweep_interval_seconds: float = 60.0
+    session_ttl_seconds: float = 2592000.0
+    oauth_exchange_concurrency: int = 4
 
 
-def _read_config_value(key: str) -> str:
-    env_value = os.getenv(key, "").strip()
-    if env_value:
-        return env_value
+_ENV_FILE_LOCK = threading.Lock()
+_ENV_FILE_CACHE: dict[str, Any] = {"signature": None, "values": {}}
+_SETTINGS_CACHE: dict[str, Any] = {"settings": None, "signature": None, "checked_at": 0.0}
+
 
-    env_file = Path(".env")
-    if not env_file.exists():
-        return ""
+def _env_file_signature(env_file: Path) -> tuple[int, int] | None:
+    try:
+        stat = env_file.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
+
+def _parse_env_file(env_file: Path) -> dict[str, str]:
+    values: dict[str, str] = {}
     for raw_line in env_file.read_text(encoding="utf-8").splitlines():
         line = raw_line.strip()
         if not line or line.startswith("#") or "=" not in line:
             continue
 
         name, raw_value = line.split("=", 1)
-        if name.strip() != key:
+        name = name.strip()
+        if name in values:
             continue
+        values[name] = raw_value.split("#", 1)[0].strip().strip("\"'")
+    return values
 
-        value = raw_value.split("#", 1)[0].strip().strip("\"'")
-        return value
-
-    return ""
-
-
-def _first_non_empty(*values: str) -> str:
-    for value in values:
-        if value:
-            return value
-    return ""
-
-
-settings = Settings(
-    spotify_client_id=_first_non_empty(
-        _read_config_value("SPOTIFY_CLIENT_ID"),
-        _read_config_value("CLIENT_ID"),
-    ),
-    spotify_redirect_uri=_first_non_empty(
-        _read_config_value("SPOTIFY_REDIRECT_URI"),
-        "http://127.0.0.1:8000/",
-    ),
-    spotify_scopes=_first_non_empty(
-        _read_config_value("SPOTIFY_SCOPES"),
-        (
-            "user-read-private user-read-email playlist-modify-private "
-            "playlist-modify-public user-library-read user-library-modify"
-        ),
-    ),
-    spotify_authorize_url=_first_non_empty(
-        _read_config_value("SPOTIFY_AUTHORIZE_URL"),
-        "https://accounts.spotify.com/authorize",
-    ),
-    spotify_token_url=_first_non_empty(
-        _read_config_value("SPOTIFY_TOKEN_URL"),
-        "https://accounts.spotify.com/api/token",
-    ),
-)
+
+def _env_file_values() -> dict[str, str]:
+    # Parsed once per (mtime, size) instead of once per key.
+    signature = _env_file_signature(ENV_FILE_PATH)
+    with _ENV_FILE_LOCK:
+        if _ENV_FILE_CACHE["signature"] != signature:
+            _ENV_FILE_CACHE["values"] = _parse_env_file(ENV_FILE_PATH) if signature is not None else {}
+            _ENV_FILE_CACHE["signature"] = signature
+        return _ENV_FILE_CACHE["values"]
+
+
+def _read_config_value(key: str) -> str:
+    env_value = os.getenv(key, "").strip()
+    if env_value:
+        return env_value
+    return _env_file_values().get(key, "")
+
+
+def _coerce_config_value(raw_value: str, field_type: Any, default: Any) -> Any:
+    if not raw_value:
+        return default
+    if field_type is str:
+        return raw_value
+    try:
+        return field_type(raw_value)
+    except ValueError:
+        return default
+
+
+def load_settings() -> Settings:
+    field_types = get_type_hints(Settings)
+    values: dict[str, Any] = {}
+    for field in fields(Settings):
+        raw_value = _read_config_value(field.name.upper())
+        if field.name == "spotify_client_id" and not raw_value:
+            raw_value = _read_config_value("CLIENT_ID")
+        values[field.name] = _coerce_config_value(raw_value, field_types[field.name], field.default)
+    return Settings(**values)
+
+
+def get_settings() -> Settings:
+    now = time.monotonic()
+    cached = _SETTINGS_CACHE["settings"]
+    if cached is not None and now - _SETTINGS_CACHE["checked_at"] < CONFIG_RELOAD_CHECK_SECONDS:
+        return cached
+
+    signature = _env_file_signature(ENV_FILE_PATH)
+    with _ENV_FILE_LOCK:
+        _SETTINGS_CACHE["checked_at"] = now
+        if cached is not None and _SETTINGS_CACHE["signature"] == signature:
+            return cached
+    reloaded = load_settings()
+    with _ENV_FILE_LOCK:
+        _SETTINGS_CACHE["settings"] = reloaded
+        _SETTINGS_CACHE["signature"] = signature
+    return reloaded
+
+
+def reload_settings() -> Settings:
+    with _ENV_FILE_LOCK:
+        _ENV_FILE_CACHE["signature"] = None
+        _SETTINGS_CACHE["settings"] = None
+    return get_settings()
+
+
+class _SettingsProxy:
+    # Modules keep `from app.core.config import settings`; each attribute read sees the
+    # latest .env without a restart. Values captured at import time (pool sizes,
+    # cache capacity) still need one.
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __repr__(self) -> str:
+        return repr(get_settings())
+
+
+# Typed as Settings so attribute names and types are still checked at every call site.
+settings = cast(Settings, _SettingsProxy())
@@ -1,26 +1,44 @@
-from pathlib import Path
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
 
+from app.api.dependencies import spotify_client_error_handler
 from app.api.routes.auth_spotify import router as auth_spotify_router
 from app.api.routes.config import router as config_router
 from app.api.routes.health import router as health_router
 from app.api.routes.me import router as me_router
-
-WEB_DIR = Path(__file__).resolve().parent / "web"
-
-app = FastAPI(title="Spotify Project API")
+from app.api.routes.web import get_web_assets, router as web_router
+from app.core.config import settings
+from app.services.http_pool import close_async_http_clients, close_http_clients
+from app.services.spotify_api import SpotifyClientError
+from app.services.spotify_client_async import run_token_refresher
+from app.services.spotify_oauth import TOKEN_STORE
+from app.services.token_store import run_token_store_sweeper
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    # Hash and compress the frontend once, before the first request.
+    get_web_assets()
+    stop_event = asyncio.Event()
+    token_refresher = asyncio.create_task(run_token_refresher(stop_event))
+    token_store_sweeper = asyncio.create_task(
+        run_token_store_sweeper(TOKEN_STORE, settings.token_store_sweep_interval_seconds, stop_event)
+    )
+    yield
+    stop_event.set()
+    await asyncio.gather(token_refresher, token_store_sweeper)
+    await close_async_http_clients()
+    close_http_clients()
+    TOKEN_STORE.close()
+
+
+app = FastAPI(title="Spotify Project API", lifespan=lifespan)
+app.add_exception_handler(SpotifyClientError, spotify_client_error_handler)
 app.include_router(health_router)
 app.include_router(auth_spotify_router)
 app.include_router(config_router)
 app.include_router(me_router)
-
-
-@app.get("/", include_in_schema=False)
-async def read_index() -> FileResponse:
-    return FileResponse(WEB_DIR / "index.html")
-
-
-app.mount("/web", StaticFiles(directory=WEB_DIR), name="web")
+app.include_router(web_router)
@@ -1,16 +1,30 @@
+import copy
+import itertools
 import json
 import os
+import queue
 import sqlite3
 import threading
 import time
+import weakref
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Hashable, TypeVar
 from urllib.error import HTTPError, URLError
 from urllib.parse import quote, urlencode, unquote
 from urllib.request import Request, urlopen
 
-from app.services.spotify_client import SpotifyClientError, get_track, get_track_for_session
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+from app.services.spotify_api import TRACKS_BATCH_LIMIT, SpotifyClientError
+from app.services.spotify_client import (
+    get_track,
+    get_track_for_session,
+    get_tracks,
+    get_tracks_for_session,
+)
 
 DATABASE_URL_DEFAULT = "sqlite:///./feature_store.db"
 MUSICBRAINZ_BASE_URL = "https://musicbrainz.org"
@@ -20,10 +34,31 @@ TRACK_FEATURES_TTL_SECONDS = 7 * 24 * 60 * 60
 NEGATIVE_TTL_SECONDS = 6 * 60 * 60
 ERROR_BACKOFF_SECONDS = 15 * 60
 MB_MIN_INTERVAL_SECONDS = 1.1
+MUSICBRAINZ_PRIORITY_INTERACTIVE = 0
+MUSICBRAINZ_PRIORITY_BATCH = 5
+MUSICBRAINZ_PRIORITY_WARM = 10
+# A batch waits this long in total; fetches still queued after it are cached in the background.
+MUSICBRAINZ_BATCH_TIMEOUT_SECONDS = 30
+SQLITE_IN_CLAUSE_CHUNK = 500
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+SQLITE_MMAP_SIZE_BYTES = 64 * 1024 * 1024
+L1_CACHE_MAX_ENTRIES = 50000
+L1_CACHE_MAX_TTL_SECONDS = 10 * 60
+
+T = TypeVar("T")
 
 _MB_THROTTLE_LOCK = threading.Lock()
 _LAST_MUSICBRAINZ_REQUEST_MONO = 0.0
 
+_DB_CONNECTIONS = threading.local()
+_DB_CONNECTIONS_LOCK = threading.Lock()
+_DB_POOL_GENERATION = 0
+
+# In-process tier in front of SQLite. Entries never outlive the row's expires_at/backoff_until,
+# and are capped at L1_CACHE_MAX_TTL_SECONDS so writes from other processes are picked up.
+L1_CACHE = ResponseCache(max_entries=L1_CACHE_MAX_ENTRIES)
+_LOOKUP_FLIGHTS = SingleFlight()
+
 
 class _MusicBrainzLookupError(Exception):
     def __init__(self, status_code: int | None, message: str) -> None:
@@ -52,21 +87,84 @@ def _sqlite_path_from_database_url(database_url: str) -> str:
     return raw_path
 
 
-@contextmanager
-def _db_connection() -> Any:
-    database_url = os.getenv("DATABASE_URL", DATABASE_URL_DEFAULT)
-    db_path = _sqlite_path_from_database_url(database_url)
+def _open_db_connection(db_path: str) -> sqlite3.Connection:
     if db_path != ":memory:":
         Path(db_path).expanduser().parent.mkdir(parents=True, exist_ok=True)
 
-    conn = sqlite3.connect(db_path, timeout=30)
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+    # Schema setup runs once per connection, i.e. once per thread and database, not per lookup.
+    _ensure_schema(conn)
+    conn.commit()
+    return conn
+
+
+class _ThreadConnections:
+    # Owned only by its thread's threading.local, so it is collected when the thread exits and
+    # the finalizer closes that thread's handles; nothing else keeps them alive.
+    __slots__ = ("by_path", "generation", "__weakref__")
+
+    def __init__(self, generation: int) -> None:
+        self.by_path: dict[str, sqlite3.Connection] = {}
+        self.generation = generation
+        weakref.finalize(self, _close_connections, self.by_path)
+
+
+_DB_THREAD_CONNECTIONS: "weakref.WeakSet[_ThreadConnections]" = weakref.WeakSet()
+
+
+def _close_connections(by_path: dict[str, sqlite3.Connection]) -> None:
+    connections = list(by_path.values())
+    by_path.clear()
+    for conn in connections:
+        conn.close()
+
+
+def _pooled_db_connection(db_path: str) -> sqlite3.Connection:
+    pool = getattr(_DB_CONNECTIONS, "pool", None)
+    if pool is None or pool.generation != _DB_POOL_GENERATION:
+        pool = _ThreadConnections(_DB_POOL_GENERATION)
+        _DB_CONNECTIONS.pool = pool
+        with _DB_CONNECTIONS_LOCK:
+            _DB_THREAD_CONNECTIONS.add(pool)
+
+    conn = pool.by_path.get(db_path)
+    if conn is None:
+        conn = _open_db_connection(db_path)
+        pool.by_path[db_path] = conn
+    return conn
+
+
+def close_db_connections() -> None:
+    # Closes every thread's handles at once, so only call it when no other thread can be using
+    # the store: at process shutdown and in test teardown. Threads that exit close their own.
+    global _DB_POOL_GENERATION
+
+    with _DB_CONNECTIONS_LOCK:
+        pools = list(_DB_THREAD_CONNECTIONS)
+        _DB_THREAD_CONNECTIONS.clear()
+        # Surviving threads open fresh handles the next time they ask for one.
+        _DB_POOL_GENERATION += 1
+    for pool in pools:
+        _close_connections(pool.by_path)
+
+
+def _current_db_path() -> str:
+    return _sqlite_path_from_database_url(os.getenv("DATABASE_URL", DATABASE_URL_DEFAULT))
+
+
+@contextmanager
+def _db_connection() -> Any:
+    conn = _pooled_db_connection(_current_db_path())
     try:
-        _ensure_schema(conn)
         yield conn
-        conn.commit()
-    finally:
-        conn.close()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
 
 
 def _ensure_schema(conn: sqlite3.Connection) -> None:
@@ -162,6 +260,83 @@ def _musicbrainz_request_json(path: str) -> dict[str, Any]:
     return payload
 
 
+class _MusicBrainzWorker:
+    # The only thread that talks to MusicBrainz, so only it ever sleeps in the throttle.
+    # Request threads wait on futures; identical keys share one queued fetch.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queue: queue.PriorityQueue[tuple[int, int, Hashable]] = queue.PriorityQueue()
+        self._jobs: dict[Hashable, tuple[Future, Callable[[], Any], int]] = {}
+        self._sequence = itertools.count()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, key: Hashable, fetch: Callable[[], Any], priority: int) -> Future:
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                future, queued_fetch, queued_priority = job
+                if priority < queued_priority:
+                    # Re-queue at the higher priority; the stale entry is skipped once the job has run.
+                    self._jobs[key] = (future, queued_fetch, priority)
+                    self._queue.put((priority, next(self._sequence), key))
+                return future
+
+            future = Future()
+            self._jobs[key] = (future, fetch, priority)
+            self._queue.put((priority, next(self._sequence), key))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="musicbrainz-worker", daemon=True)
+                self._thread.start()
+            return future
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def _run(self) -> None:
+        while True:
+            _, _, key = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(key)
+                if job is None or job[0].running():
+                    continue
+                future, fetch, _ = job
+                future.set_running_or_notify_cancel()
+
+            try:
+                result = fetch()
+            except BaseException as exc:
+                with self._lock:
+                    self._jobs.pop(key, None)
+                future.set_exception(exc)
+            else:
+                with self._lock:
+                    self._jobs.pop(key, None)
+                future.set_result(result)
+
+
+MUSICBRAINZ_WORKER = _MusicBrainzWorker()
+
+
+def _fetch_outcome(fetch: Future, timeout: float | None = None) -> tuple[Any, bool]:
+    try:
+        return fetch.result(timeout), False
+    except (_MusicBrainzLookupError, RuntimeError):
+        return None, True
+
+
+def _batch_outcomes(fetches: dict[str, Future]) -> tuple[dict[str, tuple[Any, bool]], list[str]]:
+    deadline = time.monotonic() + MUSICBRAINZ_BATCH_TIMEOUT_SECONDS
+    outcomes: dict[str, tuple[Any, bool]] = {}
+    late_keys: list[str] = []
+    for key, fetch in fetches.items():
+        try:
+            outcomes[key] = _fetch_outcome(fetch, max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            late_keys.append(key)
+    return outcomes, late_keys
+
+
 def _is_cache_usable(row: sqlite3.Row | None, now: int) -> bool:
     if not row:
         return False
@@ -170,6 +345,40 @@ def _is_cache_usable(row: sqlite3.Row | None, now: int) -> bool:
     return now <= expires_at or now <= backoff_until
 
 
+def _l1_key(table: str, key: str) -> tuple[str, str]:
+    return (f"{_current_db_path()}|{table}", key)
+
+
+def _l1_get(table: str, key: str) -> tuple[bool, Any]:
+    entry = L1_CACHE.get(_l1_key(table, key))
+    if entry is None or not entry.is_fresh():
+        return False, None
+    return True, entry.copy_payload()
+
+
+def _l1_put(table: str, key: str, value: Any, usable_until: int) -> None:
+    ttl_seconds = min(usable_until - _epoch_seconds(), L1_CACHE_MAX_TTL_SECONDS)
+    if ttl_seconds > 0:
+        # The caller goes on to return `value`; keep the L1's copy out of its reach.
+        L1_CACHE.put(_l1_key(table, key), copy.deepcopy(value), None, ttl_seconds)
+
+
+def _l1_put_row(table: str, key: str, value: Any, row: sqlite3.Row) -> None:
+    _l1_put(table, key, value, max(int(row["expires_at"]), int(row["backoff_until"])))
+
+
+def _coalesced_lookup(table: str, key: str, resolve: Callable[[], T]) -> T:
+    # Concurrent misses for one key share a single upstream call and a single cache write.
+    def lead() -> T:
+        # A flight that landed between our cache check and now has already filled the L1.
+        entry = L1_CACHE.peek(flight_key)
+        return entry.copy_payload() if entry is not None and entry.is_fresh() else resolve()
+
+    flight_key = _l1_key(table, key)
+    # Every caller in the flight receives the leader's result; give each one its own copy.
+    return copy.deepcopy(_LOOKUP_FLIGHTS.do(flight_key, lead))
+
+
 def _normalize_isrc(isrc: str) -> str:
     return isrc.strip().upper()
 
@@ -189,6 +398,23 @@ def _get_spotify_to_isrc_row(conn: sqlite3.Connection, spotify_track_id: str) ->
     ).fetchone()
 
 
+def _get_spotify_to_isrc_rows(conn: sqlite3.Connection, spotify_track_ids: list[str]) -> dict[str, sqlite3.Row]:
+    rows: dict[str, sqlite3.Row] = {}
+    for start in range(0, len(spotify_track_ids), SQLITE_IN_CLAUSE_CHUNK):
+        chunk = spotify_track_ids[start : start + SQLITE_IN_CLAUSE_CHUNK]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(
+            f"""
+            SELECT spotify_track_id, isrc, updated_at, expires_at, backoff_until
+            FROM spotify_to_isrc
+            WHERE spotify_track_id IN ({placeholders})
+            """,
+            chunk,
+        ):
+            rows[row["spotify_track_id"]] = row
+    return rows
+
+
 def _upsert_spotify_to_isrc(
     conn: sqlite3.Connection,
     spotify_track_id: str,
@@ -228,6 +454,23 @@ def _get_isrc_to_mbid_row(conn: sqlite3.Connection, isrc: str) -> sqlite3.Row |
     ).fetchone()
 
 
+def _get_isrc_to_mbid_rows(conn: sqlite3.Connection, isrcs: list[str]) -> dict[str, sqlite3.Row]:
+    rows: dict[str, sqlite3.Row] = {}
+    for start in range(0, len(isrcs), SQLITE_IN_CLAUSE_CHUNK):
+        chunk = isrcs[start : start + SQLITE_IN_CLAUSE_CHUNK]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(
+            f"""
+            SELECT isrc, mbid, updated_at, expires_at, backoff_until
+            FROM isrc_to_mbid
+            WHERE isrc IN ({placeholders})
+            """,
+            chunk,
+        ):
+            rows[row["isrc"]] = row
+    return rows
+
+
 def _upsert_isrc_to_mbid(
     conn: sqlite3.Connection,
     isrc: str,
@@ -267,6 +510,23 @@ def _get_track_features_row(conn: sqlite3.Connection, mbid: str) -> sqlite3.Row
     ).fetchone()
 
 
+def _get_track_features_rows(conn: sqlite3.Connection, mbids: list[str]) -> dict[str, sqlite3.Row]:
+    rows: dict[str, sqlite3.Row] = {}
+    for start in range(0, len(mbids), SQLITE_IN_CLAUSE_CHUNK):
+        chunk = mbids[start : start + SQLITE_IN_CLAUSE_CHUNK]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(
+            f"""
+            SELECT mbid, tags_json, metadata_json, updated_at, expires_at, backoff_until
+            FROM track_features
+            WHERE mbid IN ({placeholders})
+            """,
+            chunk,
+        ):
+            rows[row["mbid"]] = row
+    return rows
+
+
 def _upsert_track_features(
     conn: sqlite3.Connection,
     mbid: str,
@@ -319,70 +579,146 @@ def _extract_isrc_from_track(track_payload: dict[str, Any]) -> str | None:
     return normalized_isrc
 
 
-def get_isrc_from_spotify_track(spotify_track_id: str, access_token: str) -> str | None:
-    safe_track_id = spotify_track_id.strip()
-    if not safe_track_id:
-        return None
-
-    now = _epoch_seconds()
-    with _db_connection() as conn:
-        cached_row = _get_spotify_to_isrc_row(conn, safe_track_id)
-        if _is_cache_usable(cached_row, now):
-            return cached_row["isrc"]
-
+def _fetch_and_store_isrc(spotify_track_id: str, fetch_track: Callable[[], dict[str, Any]]) -> str | None:
     fetched_isrc: str | None = None
     fetch_failed = False
     try:
-        track_payload = get_track(access_token=access_token, track_id=safe_track_id)
-        fetched_isrc = _extract_isrc_from_track(track_payload)
+        fetched_isrc = _extract_isrc_from_track(fetch_track())
     except SpotifyClientError:
         fetch_failed = True
 
     now = _epoch_seconds()
     with _db_connection() as conn:
-        cached_row = _get_spotify_to_isrc_row(conn, safe_track_id)
+        cached_row = _get_spotify_to_isrc_row(conn, spotify_track_id)
         if fetch_failed:
             if cached_row:
-                _set_spotify_to_isrc_backoff(conn, safe_track_id, now)
+                _set_spotify_to_isrc_backoff(conn, spotify_track_id, now)
+                _l1_put("spotify_to_isrc", spotify_track_id, cached_row["isrc"], now + ERROR_BACKOFF_SECONDS)
                 return cached_row["isrc"]
             return None
 
         ttl_seconds = MAPPING_TTL_SECONDS if fetched_isrc else NEGATIVE_TTL_SECONDS
-        _upsert_spotify_to_isrc(conn, safe_track_id, fetched_isrc, now, ttl_seconds)
+        _upsert_spotify_to_isrc(conn, spotify_track_id, fetched_isrc, now, ttl_seconds)
+        _l1_put("spotify_to_isrc", spotify_track_id, fetched_isrc, now + ttl_seconds)
         return fetched_isrc
 
 
-def get_isrc_from_spotify_track_for_session(session_id: str, spotify_track_id: str) -> str | None:
+def _isrc_for_spotify_track(spotify_track_id: str, fetch_track: Callable[[], dict[str, Any]]) -> str | None:
     safe_track_id = spotify_track_id.strip()
     if not safe_track_id:
         return None
 
+    hit, cached_isrc = _l1_get("spotify_to_isrc", safe_track_id)
+    if hit:
+        return cached_isrc
+
     now = _epoch_seconds()
     with _db_connection() as conn:
         cached_row = _get_spotify_to_isrc_row(conn, safe_track_id)
         if _is_cache_usable(cached_row, now):
+            _l1_put_row("spotify_to_isrc", safe_track_id, cached_row["isrc"], cached_row)
             return cached_row["isrc"]
 
-    fetched_isrc: str | None = None
-    fetch_failed = False
-    try:
-        track_payload = get_track_for_session(session_id=session_id, track_id=safe_track_id)
-        fetched_isrc = _extract_isrc_from_track(track_payload)
-    except SpotifyClientError:
-        fetch_failed = True
+    return _coalesced_lookup(
+        "spotify_to_isrc",
+        safe_track_id,
+        lambda: _fetch_and_store_isrc(safe_track_id, fetch_track),
+    )
+
+
+def get_isrc_from_spotify_track(spotify_track_id: str, access_token: str) -> str | None:
+    return _isrc_for_spotify_track(
+        spotify_track_id,
+        lambda: get_track(access_token=access_token, track_id=spotify_track_id.strip()),
+    )
+
+
+def get_isrc_from_spotify_track_for_session(session_id: str, spotify_track_id: str) -> str | None:
+    return _isrc_for_spotify_track(
+        spotify_track_id,
+        lambda: get_track_for_session(session_id=session_id, track_id=spotify_track_id.strip()),
+    )
+
+
+def _resolve_isrcs_in_batches(
+    spotify_track_ids: list[str],
+    fetch_tracks: Callable[[list[str]], dict[str, dict[str, Any]]],
+) -> dict[str, str | None]:
+    safe_track_ids = list(dict.fromkeys(track_id.strip() for track_id in spotify_track_ids if track_id.strip()))
+    resolved: dict[str, str | None] = {}
+    if not safe_track_ids:
+        return resolved
+
+    uncached_track_ids: list[str] = []
+    for track_id in safe_track_ids:
+        hit, cached_isrc = _l1_get("spotify_to_isrc", track_id)
+        if hit:
+            resolved[track_id] = cached_isrc
+        else:
+            uncached_track_ids.append(track_id)
+    if not uncached_track_ids:
+        return resolved
 
     now = _epoch_seconds()
     with _db_connection() as conn:
-        cached_row = _get_spotify_to_isrc_row(conn, safe_track_id)
-        if fetch_failed:
+        cached_rows = _get_spotify_to_isrc_rows(conn, uncached_track_ids)
+    missing_track_ids: list[str] = []
+    for track_id in uncached_track_ids:
+        cached_row = cached_rows.get(track_id)
+        if _is_cache_usable(cached_row, now):
+            _l1_put_row("spotify_to_isrc", track_id, cached_row["isrc"], cached_row)
+            resolved[track_id] = cached_row["isrc"]
+        else:
+            missing_track_ids.append(track_id)
+
+    fetched: dict[str, str | None] = {}
+    failed_track_ids: list[str] = []
+    for start in range(0, len(missing_track_ids), TRACKS_BATCH_LIMIT):
+        batch = missing_track_ids[start : start + TRACKS_BATCH_LIMIT]
+        try:
+            tracks_by_id = fetch_tracks(batch)
+        except SpotifyClientError:
+            failed_track_ids.extend(batch)
+            continue
+        for track_id in batch:
+            track_payload = tracks_by_id.get(track_id)
+            fetched[track_id] = _extract_isrc_from_track(track_payload) if track_payload else None
+
+    if not fetched and not failed_track_ids:
+        return resolved
+
+    now = _epoch_seconds()
+    with _db_connection() as conn:
+        for track_id in failed_track_ids:
+            cached_row = cached_rows.get(track_id)
             if cached_row:
-                _set_spotify_to_isrc_backoff(conn, safe_track_id, now)
-                return cached_row["isrc"]
-            return None
+                _set_spotify_to_isrc_backoff(conn, track_id, now)
+                _l1_put("spotify_to_isrc", track_id, cached_row["isrc"], now + ERROR_BACKOFF_SECONDS)
+                resolved[track_id] = cached_row["isrc"]
+            else:
+                resolved[track_id] = None
+
+        for track_id, fetched_isrc in fetched.items():
+            ttl_seconds = MAPPING_TTL_SECONDS if fetched_isrc else NEGATIVE_TTL_SECONDS
+            _upsert_spotify_to_isrc(conn, track_id, fetched_isrc, now, ttl_seconds)
+            _l1_put("spotify_to_isrc", track_id, fetched_isrc, now + ttl_seconds)
+            resolved[track_id] = fetched_isrc
+
+    return resolved
+
+
+def get_isrcs_from_spotify_tracks(spotify_track_ids: list[str], access_token: str) -> dict[str, str | None]:
+    return _resolve_isrcs_in_batches(
+        spotify_track_ids,
+        lambda batch: get_tracks(access_token=access_token, track_ids=batch),
+    )
 
-        ttl_seconds = MAPPING_TTL_SECONDS if fetched_isrc else NEGATIVE_TTL_SECONDS
-        _upsert_spotify_to_isrc(conn, safe_track_id, fetched_isrc, now, ttl_seconds)
-        return fetched_isrc
+
+def get_isrcs_from_spotify_tracks_for_session(session_id: str, spotify_track_ids: list[str]) -> dict[str, str | None]:
+    return _resolve_isrcs_in_batches(
+        spotify_track_ids,
+        lambda batch: get_tracks_for_session(session_id=session_id, track_ids=batch),
+    )
 
 
 def _recording_score(recording: dict[str, Any]) -> int:
@@ -420,43 +756,106 @@ def _pick_best_recording(recordings: list[Any], expected_mbid: str | None = None
     return best
 
 
+def _fetch_mbid_for_isrc(normalized_isrc: str) -> str | None:
+    payload = _musicbrainz_request_json(f"/ws/2/isrc/{quote(normalized_isrc)}?fmt=json")
+    recordings = payload.get("recordings")
+    if isinstance(recordings, list):
+        best_recording = _pick_best_recording(recordings)
+        if best_recording:
+            raw_mbid = best_recording.get("id")
+            if isinstance(raw_mbid, str) and raw_mbid.strip():
+                return _normalize_mbid(raw_mbid)
+    return None
+
+
+def _submit_mbid_fetch(isrc: str, priority: int = MUSICBRAINZ_PRIORITY_INTERACTIVE) -> Future:
+    return MUSICBRAINZ_WORKER.submit(("isrc_to_mbid", isrc), partial(_fetch_mbid_for_isrc, isrc), priority)
+
+
+def _write_mbid_result(
+    conn: sqlite3.Connection,
+    isrc: str,
+    cached_row: sqlite3.Row | None,
+    fetched_mbid: str | None,
+    fetch_failed: bool,
+    now: int,
+) -> str | None:
+    if fetch_failed:
+        if cached_row:
+            _set_isrc_to_mbid_backoff(conn, isrc, now)
+            _l1_put("isrc_to_mbid", isrc, cached_row["mbid"], now + ERROR_BACKOFF_SECONDS)
+            return cached_row["mbid"]
+        return None
+
+    ttl_seconds = MAPPING_TTL_SECONDS if fetched_mbid else NEGATIVE_TTL_SECONDS
+    _upsert_isrc_to_mbid(conn, isrc, fetched_mbid, now, ttl_seconds)
+    _l1_put("isrc_to_mbid", isrc, fetched_mbid, now + ttl_seconds)
+    return fetched_mbid
+
+
+def _store_mbid_result(isrc: str, fetch: Future) -> str | None:
+    fetched_mbid, fetch_failed = _fetch_outcome(fetch)
+    now = _epoch_seconds()
+    with _db_connection() as conn:
+        return _write_mbid_result(conn, isrc, _get_isrc_to_mbid_row(conn, isrc), fetched_mbid, fetch_failed, now)
+
+
+def _cached_mbids(isrcs: list[str]) -> tuple[dict[str, str | None], list[str], dict[str, sqlite3.Row]]:
+    safe_isrcs = list(dict.fromkeys(_normalize_isrc(isrc) for isrc in isrcs if _normalize_isrc(isrc)))
+    resolved: dict[str, str | None] = {}
+    uncached_isrcs: list[str] = []
+    for isrc in safe_isrcs:
+        hit, cached_mbid = _l1_get("isrc_to_mbid", isrc)
+        if hit:
+            resolved[isrc] = cached_mbid
+        else:
+            uncached_isrcs.append(isrc)
+    if not uncached_isrcs:
+        return resolved, [], {}
+
+    now = _epoch_seconds()
+    with _db_connection() as conn:
+        cached_rows = _get_isrc_to_mbid_rows(conn, uncached_isrcs)
+    missing_isrcs: list[str] = []
+    for isrc in uncached_isrcs:
+        cached_row = cached_rows.get(isrc)
+        if _is_cache_usable(cached_row, now):
+            _l1_put_row("isrc_to_mbid", isrc, cached_row["mbid"], cached_row)
+            resolved[isrc] = cached_row["mbid"]
+        else:
+            missing_isrcs.append(isrc)
+    return resolved, missing_isrcs, cached_rows
+
+
 def mbid_from_isrc(isrc: str) -> str | None:
     normalized_isrc = _normalize_isrc(isrc)
     if not normalized_isrc:
         return None
 
+    hit, cached_mbid = _l1_get("isrc_to_mbid", normalized_isrc)
+    if hit:
+        return cached_mbid
+
     now = _epoch_seconds()
     with _db_connection() as conn:
         cached_row = _get_isrc_to_mbid_row(conn, normalized_isrc)
         if _is_cache_usable(cached_row, now):
+            _l1_put_row("isrc_to_mbid", normalized_isrc, cached_row["mbid"], cached_row)
             return cached_row["mbid"]
 
-    fetched_mbid: str | None = None
-    fetch_failed = False
-    try:
-        payload = _musicbrainz_request_json(f"/ws/2/isrc/{quote(normalized_isrc)}?fmt=json")
-        recordings = payload.get("recordings")
-        if isinstance(recordings, list):
-            best_recording = _pick_best_recording(recordings)
-            if best_recording:
-                raw_mbid = best_recording.get("id")
-                if isinstance(raw_mbid, str) and raw_mbid.strip():
-                    fetched_mbid = _normalize_mbid(raw_mbid)
-    except (_MusicBrainzLookupError, RuntimeError):
-        fetch_failed = True
+    return _coalesced_lookup(
+        "isrc_to_mbid",
+        normalized_isrc,
+        lambda: _store_mbid_result(normalized_isrc, _submit_mbid_fetch(normalized_isrc)),
+    )
 
-    now = _epoch_seconds()
-    with _db_connection() as conn:
-        cached_row = _get_isrc_to_mbid_row(conn, normalized_isrc)
-        if fetch_failed:
-            if cached_row:
-                _set_isrc_to_mbid_backoff(conn, normalized_isrc, now)
-                return cached_row["mbid"]
-            return None
 
-        ttl_seconds = MAPPING_TTL_SECONDS if fetched_mbid else NEGATIVE_TTL_SECONDS
-        _upsert_isrc_to_mbid(conn, normalized_isrc, fetched_mbid, now, ttl_seconds)
-        return fetched_mbid
+def warm_mbids_from_isrcs(isrcs: list[str]) -> int:
+    # Fire-and-forget: misses are queued behind interactive lookups and cached by the worker.
+    _, missing_isrcs, _ = _cached_mbids(isrcs)
+    for isrc in missing_isrcs:
+        _submit_mbid_fetch(isrc, MUSICBRAINZ_PRIORITY_WARM).add_done_callback(partial(_store_mbid_result, isrc))
+    return len(missing_isrcs)
 
 
 def _extract_track_features(recording: dict[str, Any]) -> tuple[list[dict[str, Any]], dict[str, Any]]:
@@ -597,53 +996,199 @@ def _decode_track_features_row(row: sqlite3.Row) -> dict[str, Any] | None:
     return {"tags": tags, "metadata": metadata}
 
 
+def _fetch_track_features(normalized_mbid: str) -> tuple[list[dict[str, Any]], dict[str, Any] | None]:
+    recording = _lookup_recording_by_mbid(normalized_mbid)
+    if not recording:
+        return [], None
+    return _extract_track_features(recording)
+
+
+def _submit_track_features_fetch(mbid: str, priority: int = MUSICBRAINZ_PRIORITY_INTERACTIVE) -> Future:
+    return MUSICBRAINZ_WORKER.submit(("track_features", mbid), partial(_fetch_track_features, mbid), priority)
+
+
+def _write_track_features_result(
+    conn: sqlite3.Connection,
+    mbid: str,
+    cached_row: sqlite3.Row | None,
+    fetched: tuple[list[dict[str, Any]], dict[str, Any] | None] | None,
+    fetch_failed: bool,
+    now: int,
+) -> dict[str, Any] | None:
+    if fetch_failed or fetched is None:
+        if cached_row:
+            _set_track_features_backoff(conn, mbid, now)
+            cached_features = _decode_track_features_row(cached_row)
+            _l1_put("track_features", mbid, cached_features, now + ERROR_BACKOFF_SECONDS)
+            return cached_features
+        return None
+
+    fetched_tags, fetched_metadata = fetched
+    if fetched_metadata is None:
+        _upsert_track_features(
+            conn=conn,
+            mbid=mbid,
+            tags=[],
+            metadata={"__missing__": True},
+            now=now,
+            ttl_seconds=NEGATIVE_TTL_SECONDS,
+        )
+        _l1_put("track_features", mbid, None, now + NEGATIVE_TTL_SECONDS)
+        return None
+
+    _upsert_track_features(
+        conn=conn,
+        mbid=mbid,
+        tags=fetched_tags,
+        metadata=fetched_metadata,
+        now=now,
+        ttl_seconds=TRACK_FEATURES_TTL_SECONDS,
+    )
+    features = {"tags": fetched_tags, "metadata": fetched_metadata}
+    _l1_put("track_features", mbid, features, now + TRACK_FEATURES_TTL_SECONDS)
+    return features
+
+
+def _store_track_features_result(mbid: str, fetch: Future) -> dict[str, Any] | None:
+    fetched, fetch_failed = _fetch_outcome(fetch)
+    now = _epoch_seconds()
+    with _db_connection() as conn:
+        cached_row = _get_track_features_row(conn, mbid)
+        return _write_track_features_result(conn, mbid, cached_row, fetched, fetch_failed, now)
+
+
+def _cached_track_features(
+    mbids: list[str],
+) -> tuple[dict[str, dict[str, Any] | None], list[str], dict[str, sqlite3.Row]]:
+    safe_mbids = list(dict.fromkeys(_normalize_mbid(mbid) for mbid in mbids if _normalize_mbid(mbid)))
+    resolved: dict[str, dict[str, Any] | None] = {}
+    uncached_mbids: list[str] = []
+    for mbid in safe_mbids:
+        hit, cached_features = _l1_get("track_features", mbid)
+        if hit:
+            resolved[mbid] = cached_features
+        else:
+            uncached_mbids.append(mbid)
+    if not uncached_mbids:
+        return resolved, [], {}
+
+    now = _epoch_seconds()
+    with _db_connection() as conn:
+        cached_rows = _get_track_features_rows(conn, uncached_mbids)
+    missing_mbids: list[str] = []
+    for mbid in uncached_mbids:
+        cached_row = cached_rows.get(mbid)
+        if _is_cache_usable(cached_row, now):
+            cached_features = _decode_track_features_row(cached_row)
+            _l1_put_row("track_features", mbid, cached_features, cached_row)
+            resolved[mbid] = cached_features
+        else:
+            missing_mbids.append(mbid)
+    return resolved, missing_mbids, cached_rows
+
+
 def get_track_features(mbid: str) -> dict[str, Any] | None:
     normalized_mbid = _normalize_mbid(mbid)
     if not normalized_mbid:
         return None
 
+    # The L1 holds decoded features, so hot hits skip the JSON parse as well as SQLite.
+    hit, cached_features = _l1_get("track_features", normalized_mbid)
+    if hit:
+        return cached_features
+
     now = _epoch_seconds()
     with _db_connection() as conn:
         cached_row = _get_track_features_row(conn, normalized_mbid)
         if _is_cache_usable(cached_row, now):
-            return _decode_track_features_row(cached_row)
+            cached_features = _decode_track_features_row(cached_row)
+            _l1_put_row("track_features", normalized_mbid, cached_features, cached_row)
+            return cached_features
+
+    return _coalesced_lookup(
+        "track_features",
+        normalized_mbid,
+        lambda: _store_track_features_result(normalized_mbid, _submit_track_features_fetch(normalized_mbid)),
+    )
+
+
+def warm_track_features(mbids: list[str]) -> int:
+    _, missing_mbids, _ = _cached_track_features(mbids)
+    for mbid in missing_mbids:
+        fetch = _submit_track_features_fetch(mbid, MUSICBRAINZ_PRIORITY_WARM)
+        fetch.add_done_callback(partial(_store_track_features_result, mbid))
+    return len(missing_mbids)
 
-    fetched_tags: list[dict[str, Any]] = []
-    fetched_metadata: dict[str, Any] | None = None
-    fetch_failed = False
-    try:
-        recording = _lookup_recording_by_mbid(normalized_mbid)
-        if recording:
-            fetched_tags, fetched_metadata = _extract_track_features(recording)
-    except (_MusicBrainzLookupError, RuntimeError):
-        fetch_failed = True
 
+def _mbids_from_isrcs(isrcs: list[str]) -> dict[str, str | None]:
+    resolved, missing_isrcs, cached_rows = _cached_mbids(isrcs)
+    if not missing_isrcs:
+        return resolved
+
+    # MusicBrainz has no bulk ISRC lookup: misses are queued together on the worker and written back in one go.
+    # They queue behind single interactive lookups, so one large batch cannot hold those up.
+    fetches = {isrc: _submit_mbid_fetch(isrc, MUSICBRAINZ_PRIORITY_BATCH) for isrc in missing_isrcs}
+    outcomes, late_isrcs = _batch_outcomes(fetches)
+    for isrc in late_isrcs:
+        fetches[isrc].add_done_callback(partial(_store_mbid_result, isrc))
+        cached_row = cached_rows.get(isrc)
+        resolved[isrc] = cached_row["mbid"] if cached_row else None
     now = _epoch_seconds()
     with _db_connection() as conn:
-        cached_row = _get_track_features_row(conn, normalized_mbid)
-        if fetch_failed:
-            if cached_row:
-                _set_track_features_backoff(conn, normalized_mbid, now)
-                return _decode_track_features_row(cached_row)
-            return None
-
-        if fetched_metadata is None:
-            _upsert_track_features(
-                conn=conn,
-                mbid=normalized_mbid,
-                tags=[],
-                metadata={"__missing__": True},
-                now=now,
-                ttl_seconds=NEGATIVE_TTL_SECONDS,
+        for isrc, (fetched_mbid, fetch_failed) in outcomes.items():
+            resolved[isrc] = _write_mbid_result(conn, isrc, cached_rows.get(isrc), fetched_mbid, fetch_failed, now)
+    return resolved
+
+
+def _track_features_for_mbids(mbids: list[str]) -> dict[str, dict[str, Any] | None]:
+    resolved, missing_mbids, cached_rows = _cached_track_features(mbids)
+    if not missing_mbids:
+        return resolved
+
+    fetches = {mbid: _submit_track_features_fetch(mbid, MUSICBRAINZ_PRIORITY_BATCH) for mbid in missing_mbids}
+    outcomes, late_mbids = _batch_outcomes(fetches)
+    for mbid in late_mbids:
+        fetches[mbid].add_done_callback(partial(_store_track_features_result, mbid))
+        cached_row = cached_rows.get(mbid)
+        resolved[mbid] = _decode_track_features_row(cached_row) if cached_row else None
+    now = _epoch_seconds()
+    with _db_connection() as conn:
+        for mbid, (fetched, fetch_failed) in outcomes.items():
+            resolved[mbid] = _write_track_features_result(
+                conn, mbid, cached_rows.get(mbid), fetched, fetch_failed, now
             )
-            return None
+    return resolved
+
+
+def _resolve_features_in_batches(
+    spotify_track_ids: list[str],
+    fetch_tracks: Callable[[list[str]], dict[str, dict[str, Any]]],
+) -> dict[str, dict[str, Any]]:
+    # Each stage reads its cache with one IN (...) query, fetches only misses, and writes back in one transaction.
+    isrcs_by_track_id = _resolve_isrcs_in_batches(spotify_track_ids, fetch_tracks)
+    mbids_by_isrc = _mbids_from_isrcs([isrc for isrc in isrcs_by_track_id.values() if isrc])
+    features_by_mbid = _track_features_for_mbids([mbid for mbid in mbids_by_isrc.values() if mbid])
+
+    resolved: dict[str, dict[str, Any]] = {}
+    for track_id, isrc in isrcs_by_track_id.items():
+        mbid = mbids_by_isrc.get(isrc) if isrc else None
+        resolved[track_id] = {
+            "isrc": isrc,
+            "mbid": mbid,
+            "features": features_by_mbid.get(mbid) if mbid else None,
+        }
+    return resolved
+
+
+def resolve_features_batch(spotify_track_ids: list[str], access_token: str) -> dict[str, dict[str, Any]]:
+    return _resolve_features_in_batches(
+        spotify_track_ids,
+        lambda batch: get_tracks(access_token=access_token, track_ids=batch),
+    )
 
-        _upsert_track_features(
-            conn=conn,
-            mbid=normalized_mbid,
-            tags=fetched_tags,
-            metadata=fetched_metadata,
-            now=now,
-            ttl_seconds=TRACK_FEATURES_TTL_SECONDS,
-        )
-        return {"tags": fetched_tags, "metadata": fetched_metadata}
+
+def resolve_features_batch_for_session(session_id: str, spotify_track_ids: list[str]) -> dict[str, dict[str, Any]]:
+    return _resolve_features_in_batches(
+        spotify_track_ids,
+        lambda batch: get_tracks_for_session(session_id=session_id, track_ids=batch),
+    )
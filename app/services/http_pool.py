@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+_CLIENTS_LOCK = threading.Lock()
+_CLIENTS: dict[str, httpx.Client] = {}
+# Async clients are bound to the event loop that opened their connections.
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _client_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max(1, int(settings.http_max_connections)),
+        max_keepalive_connections=max(0, int(settings.http_max_keepalive_connections)),
+        keepalive_expiry=max(0.0, float(settings.http_keepalive_expiry_seconds)),
+    )
+
+
+def _client_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        float(settings.http_timeout_seconds),
+        connect=float(settings.http_connect_timeout_seconds),
+    )
+
+
+def get_http_client(url: str) -> httpx.Client:
+    # One keep-alive pool per upstream host, so connection limits apply per host.
+    key = _host_key(url)
+    client = _CLIENTS.get(key)
+    if client is not None and not client.is_closed:
+        return client
+
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None or client.is_closed:
+            client = httpx.Client(limits=_client_limits(), timeout=_client_timeout())
+            _CLIENTS[key] = client
+        return client
+
+
+def close_http_clients() -> None:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+
+    for client in clients:
+        client.close()
+
+
+def get_async_http_client(url: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    key = _host_key(url)
+    with _CLIENTS_LOCK:
+        loop_clients = _ASYNC_CLIENTS.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=_client_limits(), timeout=_client_timeout())
+            loop_clients[key] = client
+        return client
+
+
+async def close_async_http_clients() -> None:
+    loop = asyncio.get_running_loop()
+    with _CLIENTS_LOCK:
+        loop_clients = _ASYNC_CLIENTS.pop(loop, {})
+
+    for client in loop_clients.values():
+        await client.aclose()
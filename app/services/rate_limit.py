@@ -0,0 +1,52 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    # reserve() never blocks; callers sleep (or await) the returned delay themselves.
+    def __init__(self, rate_per_second: float, burst: int) -> None:
+        self.rate_per_second = max(0.001, float(rate_per_second))
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            self._tokens -= 1.0
+
+            wait_seconds = 0.0 if self._tokens >= 0 else -self._tokens / self.rate_per_second
+            return max(wait_seconds, self._paused_until - now)
+
+    def pause_for(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, float(seconds)))
+
+
+_BUCKETS_LOCK = threading.Lock()
+_BUCKETS: dict[str, TokenBucket] = {}
+
+
+def bucket_for(key: str, rate_per_second: float, burst: int) -> TokenBucket:
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate_per_second=rate_per_second, burst=burst)
+            _BUCKETS[key] = bucket
+        return bucket
+
+
+def reset_buckets() -> None:
+    with _BUCKETS_LOCK:
+        _BUCKETS.clear()
+
+
+def jittered_backoff(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    # Full jitter keeps retries from many workers from lining up.
+    ceiling = min(max(0.0, float(max_seconds)), max(0.0, float(base_seconds)) * (2**attempt))
+    return random.uniform(0.0, ceiling)
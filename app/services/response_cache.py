@@ -0,0 +1,86 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+class CachedResponse:
+    __slots__ = ("payload", "etag", "expires_at")
+
+    def __init__(self, payload: Any, etag: str | None, expires_at: float) -> None:
+        self.payload = payload
+        self.etag = etag
+        self.expires_at = expires_at
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        return (time.monotonic() if now is None else now) < self.expires_at
+
+    def copy_payload(self) -> Any:
+        # Entries are shared by every caller; hand out copies so no caller can edit another's result.
+        return copy.deepcopy(self.payload)
+
+
+class ResponseCache:
+    # Expired entries are kept (until LRU eviction) so their ETag can still be revalidated.
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+
+    def get(self, key: tuple[str, str]) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_fresh():
+                self.misses += 1
+            else:
+                self.hits += 1
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def peek(self, key: tuple[str, str]) -> CachedResponse | None:
+        # Like get, but leaves the hit/miss counters and LRU order alone.
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: tuple[str, str], payload: Any, etag: str | None, ttl_seconds: float) -> None:
+        entry = CachedResponse(payload, etag, time.monotonic() + max(0.0, float(ttl_seconds)))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, key: tuple[str, str], ttl_seconds: float) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires_at = time.monotonic() + max(0.0, float(ttl_seconds))
+
+    def invalidate(self, scope: str, path_prefix: str) -> int:
+        with self._lock:
+            stale_keys = [
+                key for key in self._entries if key[0] == scope and key[1].startswith(path_prefix)
+            ]
+            for key in stale_keys:
+                del self._entries[key]
+            return len(stale_keys)
+
+    def invalidate_scopes(self, scope_prefix: str) -> int:
+        with self._lock:
+            stale_keys = [key for key in self._entries if key[0].startswith(scope_prefix)]
+            for key in stale_keys:
+                del self._entries[key]
+            return len(stale_keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,560 @@
+import copy
+import hashlib
+import json
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+from urllib.parse import quote, urlencode
+
+from app.core.config import settings
+from app.services.rate_limit import TokenBucket, bucket_for, jittered_backoff
+from app.services.response_cache import CachedResponse, ResponseCache
+from app.services.spotify_oauth import (
+    clear_tokens,
+    forget_cached_tokens,
+    get_tokens,
+    mark_session_active,
+    store_tokens,
+)
+from app.services.token_store import TokenRecord
+
+# Request building, response caching, retry policy and session-token handling shared by the
+# sync and async Spotify clients; each client only adds its own transport on top.
+
+SPOTIFY_API_BASE_URL = "https://api.spotify.com"
+TRACKS_BATCH_LIMIT = 50
+PLAYLISTS_PAGE_LIMIT = 10
+SEARCH_PAGE_LIMIT = 10
+COALESCED_PAGE_MAX_LIMIT = 200
+PLAYLIST_ITEMS_PAGE_LIMIT = 50
+SAVED_TRACKS_PAGE_LIMIT = 50
+PLAYLIST_ADD_ITEMS_LIMIT = 100
+LIBRARY_URIS_LIMIT = 40
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_PLAYLIST_ITEMS_PATH_RE = re.compile(r"^/v1/playlists/[^/]+/items$")
+
+RESPONSE_CACHE = ResponseCache(max_entries=settings.spotify_cache_max_entries)
+# Set while a session-scoped request runs, so per-user cache entries outlive token refreshes.
+_CACHE_SESSION_SCOPE: ContextVar[str | None] = ContextVar("spotify_cache_session_scope", default=None)
+_CACHE_BYPASS: ContextVar[bool] = ContextVar("spotify_cache_bypass", default=False)
+
+
+class SpotifyClientError(Exception):
+    def __init__(self, status_code: int, message: str, auth_error: bool = False) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.auth_error = auth_error
+
+
+def _extract_error_message(payload: Any, fallback: str) -> str:
+    if isinstance(payload, dict):
+        nested_error = payload.get("error")
+        if isinstance(nested_error, dict):
+            nested_message = nested_error.get("message")
+            if isinstance(nested_message, str) and nested_message:
+                return nested_message
+
+        description = payload.get("error_description")
+        if isinstance(description, str) and description:
+            return description
+
+        if isinstance(nested_error, str) and nested_error:
+            return nested_error
+
+        detail = payload.get("detail")
+        if isinstance(detail, str) and detail:
+            return detail
+
+        message = payload.get("message")
+        if isinstance(message, str) and message:
+            return message
+
+    return fallback
+
+
+def _decode_json(response_body: str) -> Any:
+    try:
+        return json.loads(response_body)
+    except json.JSONDecodeError as exc:
+        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid JSON") from exc
+
+
+def _decode_error_payload(error_body: str) -> Any:
+    if not error_body:
+        return None
+    try:
+        return json.loads(error_body)
+    except json.JSONDecodeError:
+        return None
+
+
+def build_api_request(
+    path: str,
+    access_token: str,
+    json_payload: dict[str, Any] | None = None,
+) -> tuple[str, dict[str, str], bytes | None]:
+    headers = {"Authorization": f"Bearer {access_token}"}
+    data: bytes | None = None
+    if json_payload is not None:
+        headers["Content-Type"] = "application/json"
+        data = json.dumps(json_payload).encode("utf-8")
+    return f"{SPOTIFY_API_BASE_URL}{path}", headers, data
+
+
+def _parse_api_response(status_code: int, body: str) -> Any:
+    if status_code >= 400:
+        payload = _decode_error_payload(body)
+        if status_code == 401:
+            message = _extract_error_message(payload, "Unauthorized Spotify token")
+            raise SpotifyClientError(status_code=status_code, message=message, auth_error=True)
+
+        message = _extract_error_message(payload, "Spotify API request failed")
+        raise SpotifyClientError(status_code=status_code, message=message)
+
+    if not body:
+        return {}
+
+    return _decode_json(body)
+
+
+def session_scope(session_id: str, token_record: TokenRecord) -> str:
+    # The login stamp changes on every sign-in, so another account signing in on the same
+    # session cookie never reads the previous account's entries, on any worker.
+    return f"session:{session_id}:{token_record.logged_in_at!r}"
+
+
+@contextmanager
+def session_cache(scope: str) -> Iterator[None]:
+    reset_token = _CACHE_SESSION_SCOPE.set(scope)
+    try:
+        yield
+    finally:
+        _CACHE_SESSION_SCOPE.reset(reset_token)
+
+
+def _session_cache_scope(access_token: str) -> str:
+    session_scope = _CACHE_SESSION_SCOPE.get()
+    if session_scope is not None:
+        return session_scope
+    # Callers holding only a token have no session; its digest scopes entries to that token.
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:32]
+
+
+@contextmanager
+def bypass_response_cache() -> Iterator[None]:
+    # For one-pass fan-out reads, e.g. a streamed playlist: each page is read once, and caching
+    # it would only push hot profile and listing entries out of the LRU.
+    reset_token = _CACHE_BYPASS.set(True)
+    try:
+        yield
+    finally:
+        _CACHE_BYPASS.reset(reset_token)
+
+
+def invalidate_session_cache(session_id: str) -> int:
+    return RESPONSE_CACHE.invalidate_scopes(f"session:{session_id}:")
+
+
+def _response_cache_policy(path: str, access_token: str) -> tuple[tuple[str, str], float] | None:
+    bare_path = path.split("?", 1)[0]
+    if bare_path.startswith("/v1/tracks/"):
+        return ("global", path), settings.spotify_cache_track_ttl_seconds
+    if bare_path == "/v1/me":
+        return (_session_cache_scope(access_token), path), settings.spotify_cache_profile_ttl_seconds
+    if bare_path == "/v1/me/playlists" or _PLAYLIST_ITEMS_PATH_RE.match(bare_path):
+        return (_session_cache_scope(access_token), path), settings.spotify_cache_playlists_ttl_seconds
+    return None
+
+
+def cached_response_for(
+    method: str,
+    path: str,
+    access_token: str,
+) -> tuple[tuple[str, str] | None, float, CachedResponse | None]:
+    if method != "GET" or _CACHE_BYPASS.get():
+        return None, 0.0, None
+    policy = _response_cache_policy(path, access_token)
+    if policy is None:
+        return None, 0.0, None
+    cache_key, ttl_seconds = policy
+    return cache_key, ttl_seconds, RESPONSE_CACHE.get(cache_key)
+
+
+def complete_cached_request(
+    cache_key: tuple[str, str] | None,
+    ttl_seconds: float,
+    cached: CachedResponse | None,
+    status_code: int,
+    etag: str | None,
+    body: str,
+) -> Any:
+    if status_code == 304 and cache_key is not None and cached is not None:
+        RESPONSE_CACHE.touch(cache_key, ttl_seconds)
+        return cached.copy_payload()
+
+    payload = _parse_api_response(status_code, body)
+    if cache_key is not None:
+        RESPONSE_CACHE.put(cache_key, copy.deepcopy(payload), etag, ttl_seconds)
+    return payload
+
+
+def invalidate_after_mutation(method: str, path: str, access_token: str) -> None:
+    if method == "GET":
+        return
+
+    scope = _session_cache_scope(access_token)
+    bare_path = path.split("?", 1)[0]
+    RESPONSE_CACHE.invalidate(scope, bare_path)
+    if _PLAYLIST_ITEMS_PATH_RE.match(bare_path):
+        # Track counts shown in the playlist listing change with the items.
+        RESPONSE_CACHE.invalidate(scope, "/v1/me/playlists")
+
+
+def rate_limit_bucket() -> TokenBucket:
+    return bucket_for(
+        settings.spotify_client_id or "default",
+        rate_per_second=settings.spotify_rate_limit_per_second,
+        burst=settings.spotify_rate_limit_burst,
+    )
+
+
+def parse_retry_after(raw_value: str | None) -> float | None:
+    if not raw_value:
+        return None
+    try:
+        return max(0.0, float(raw_value))
+    except ValueError:
+        return None
+
+
+def retry_delay(method: str, attempt: int, status_code: int | None, retry_after: float | None) -> float | None:
+    if status_code == 429 and retry_after is not None:
+        # Every caller sharing the app client id has to back off, not only this one.
+        rate_limit_bucket().pause_for(retry_after)
+
+    if method != "GET" or attempt >= max(0, int(settings.spotify_max_retries)):
+        return None
+    if status_code is not None and status_code not in RETRYABLE_STATUS_CODES:
+        return None
+
+    if retry_after is not None:
+        if retry_after > settings.spotify_retry_max_delay_seconds:
+            return None
+        return retry_after
+    return jittered_backoff(
+        attempt,
+        settings.spotify_retry_base_delay_seconds,
+        settings.spotify_retry_max_delay_seconds,
+    )
+
+
+def build_refresh_request(refresh_token: str) -> tuple[dict[str, str], bytes]:
+    payload = urlencode(
+        {
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+            "client_id": settings.spotify_client_id,
+        }
+    ).encode("utf-8")
+    return {"Content-Type": "application/x-www-form-urlencoded"}, payload
+
+
+def parse_refresh_response(status_code: int, body: str) -> dict[str, Any]:
+    if status_code >= 400:
+        payload = _decode_error_payload(body)
+        message = _extract_error_message(payload, "Not authorized")
+        raise SpotifyClientError(status_code=401, message=message, auth_error=True)
+
+    token_data = _decode_json(body)
+    if not isinstance(token_data, dict):
+        raise SpotifyClientError(status_code=502, message="Spotify token endpoint returned invalid JSON")
+
+    access_token = token_data.get("access_token")
+    if not isinstance(access_token, str) or not access_token:
+        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+
+    return token_data
+
+
+def require_dict(payload: Any, message: str) -> dict[str, Any]:
+    if not isinstance(payload, dict):
+        raise SpotifyClientError(status_code=502, message=message)
+    return payload
+
+
+def track_path(track_id: str) -> str:
+    safe_track_id = track_id.strip()
+    if not safe_track_id:
+        raise SpotifyClientError(status_code=400, message="Track ID is required")
+    return f"/v1/tracks/{quote(safe_track_id)}"
+
+
+def unique_track_ids(track_ids: list[str]) -> list[str]:
+    return list(dict.fromkeys(track_id.strip() for track_id in track_ids if track_id.strip()))
+
+
+def track_id_batches(track_ids: list[str]) -> list[list[str]]:
+    return [
+        track_ids[start : start + TRACKS_BATCH_LIMIT]
+        for start in range(0, len(track_ids), TRACKS_BATCH_LIMIT)
+    ]
+
+
+def tracks_path(track_ids: list[str]) -> str:
+    return f"/v1/tracks?{urlencode({'ids': ','.join(track_ids)})}"
+
+
+def tracks_from_payload(payload: Any, track_ids: list[str]) -> dict[str, dict[str, Any]]:
+    tracks = require_dict(payload, "Spotify API returned invalid tracks data").get("tracks")
+    if not isinstance(tracks, list):
+        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid tracks data")
+
+    # Tracks come back in request order, with null entries for unknown IDs.
+    tracks_by_id: dict[str, dict[str, Any]] = {}
+    for track_id, track in zip(track_ids, tracks):
+        if not isinstance(track, dict):
+            continue
+        tracks_by_id[track_id] = track
+        RESPONSE_CACHE.put(
+            ("global", track_path(track_id)),
+            copy.deepcopy(track),
+            None,
+            settings.spotify_cache_track_ttl_seconds,
+        )
+    return tracks_by_id
+
+
+def cached_tracks(track_ids: list[str]) -> tuple[dict[str, dict[str, Any]], list[str]]:
+    tracks_by_id: dict[str, dict[str, Any]] = {}
+    missing_track_ids: list[str] = []
+    for track_id in track_ids:
+        cached = RESPONSE_CACHE.get(("global", track_path(track_id)))
+        if cached is not None and cached.is_fresh() and isinstance(cached.payload, dict):
+            tracks_by_id[track_id] = cached.copy_payload()
+        else:
+            missing_track_ids.append(track_id)
+    return tracks_by_id, missing_track_ids
+
+
+def my_playlists_path(limit: int, offset: int) -> str:
+    safe_limit = max(1, min(PLAYLISTS_PAGE_LIMIT, int(limit)))
+    safe_offset = max(0, int(offset))
+    query = urlencode({"limit": safe_limit, "offset": safe_offset})
+    return f"/v1/me/playlists?{query}"
+
+
+def saved_tracks_path(limit: int, offset: int) -> str:
+    safe_limit = max(1, min(SAVED_TRACKS_PAGE_LIMIT, int(limit)))
+    safe_offset = max(0, int(offset))
+    query = urlencode({"limit": safe_limit, "offset": safe_offset})
+    return f"/v1/me/tracks?{query}"
+
+
+def playlist_items_path(playlist_id: str, limit: int, offset: int) -> str:
+    safe_playlist_id = playlist_id.strip()
+    if not safe_playlist_id:
+        raise SpotifyClientError(status_code=400, message="Playlist ID is required")
+
+    safe_limit = max(1, min(PLAYLIST_ITEMS_PAGE_LIMIT, int(limit)))
+    safe_offset = max(0, int(offset))
+    query = urlencode({"limit": safe_limit, "offset": safe_offset})
+    return f"/v1/playlists/{safe_playlist_id}/items?{query}"
+
+
+def create_playlist_payload(name: str, description: str | None, public: bool) -> dict[str, Any]:
+    safe_name = name.strip()
+    if not safe_name:
+        raise SpotifyClientError(status_code=400, message="Playlist name is required")
+
+    payload: dict[str, Any] = {"name": safe_name, "public": bool(public)}
+    if description is not None:
+        payload["description"] = description
+    return payload
+
+
+def search_path(query: str, limit: int, offset: int) -> str:
+    safe_query = query.strip()
+    if not safe_query:
+        raise SpotifyClientError(status_code=400, message="Search query is required")
+
+    safe_limit = max(1, min(SEARCH_PAGE_LIMIT, int(limit)))
+    safe_offset = max(0, int(offset))
+    search_query = urlencode(
+        {
+            "q": safe_query,
+            "type": "track",
+            "limit": safe_limit,
+            "offset": safe_offset,
+        }
+    )
+    return f"/v1/search?{search_query}"
+
+
+def page_windows(limit: int, offset: int, page_limit: int) -> list[tuple[int, int]]:
+    safe_limit = max(1, min(COALESCED_PAGE_MAX_LIMIT, int(limit)))
+    safe_offset = max(0, int(offset))
+    return [
+        (min(page_limit, safe_limit - start), safe_offset + start)
+        for start in range(0, safe_limit, page_limit)
+    ]
+
+
+def windows_before_total(windows: list[tuple[int, int]], total: Any) -> list[tuple[int, int]]:
+    # Without a usable total there is no way to tell which windows are past the end; keep them all.
+    if not isinstance(total, int) or isinstance(total, bool):
+        return windows
+    return [window for window in windows if window[1] < total]
+
+
+def merge_pages(pages: list[dict[str, Any]], windows: list[tuple[int, int]]) -> dict[str, Any]:
+    # Pages may stop before the last window when the collection is shorter than the request.
+    # Windows past the end of the collection come back short or empty; stop at the first one.
+    items: list[Any] = []
+    last_page = pages[0]
+    for page, (window_limit, _) in zip(pages, windows):
+        page_items = page.get("items") or []
+        items.extend(page_items)
+        last_page = page
+        if len(page_items) < window_limit:
+            break
+
+    merged = dict(pages[0])
+    merged.update(
+        items=items,
+        limit=sum(window_limit for window_limit, _ in windows),
+        offset=windows[0][1],
+        total=max(int(page.get("total") or 0) for page in pages),
+    )
+    if "next" in merged:
+        merged["next"] = last_page.get("next")
+    return merged
+
+
+def add_items_request(
+    playlist_id: str,
+    uris: list[str],
+    position: int | None = None,
+) -> tuple[str, dict[str, Any]]:
+    safe_playlist_id = playlist_id.strip()
+    if not safe_playlist_id:
+        raise SpotifyClientError(status_code=400, message="Playlist ID is required")
+
+    safe_uris = [uri.strip() for uri in uris if isinstance(uri, str) and uri.strip()]
+    if not safe_uris:
+        raise SpotifyClientError(status_code=400, message="At least one track URI is required")
+    if len(safe_uris) > PLAYLIST_ADD_ITEMS_LIMIT:
+        raise SpotifyClientError(
+            status_code=400,
+            message=f"At most {PLAYLIST_ADD_ITEMS_LIMIT} track URIs can be added per request",
+        )
+
+    json_payload: dict[str, Any] = {"uris": safe_uris}
+    if position is not None:
+        json_payload["position"] = max(0, int(position))
+    return f"/v1/playlists/{safe_playlist_id}/items", json_payload
+
+
+def _spotify_uri_to_url(uri: str) -> str | None:
+    parts = uri.split(":")
+    if len(parts) != 3 or parts[0] != "spotify":
+        return None
+
+    item_type = parts[1].strip()
+    item_id = parts[2].strip()
+    if not item_type or not item_id:
+        return None
+
+    if item_type == "user":
+        return f"https://open.spotify.com/user/{item_id}"
+
+    return f"https://open.spotify.com/{item_type}/{item_id}"
+
+
+def library_query_from_uris(uris: list[str]) -> str:
+    safe_uris = [uri.strip() for uri in uris if isinstance(uri, str) and uri.strip()]
+    if not safe_uris:
+        raise SpotifyClientError(status_code=400, message="At least one Spotify URI is required")
+    if len(safe_uris) > LIBRARY_URIS_LIMIT:
+        raise SpotifyClientError(
+            status_code=400,
+            message=f"At most {LIBRARY_URIS_LIMIT} Spotify URIs can be sent per library request",
+        )
+
+    # Keep URI-based contract and include URL form for compatibility with /me/library validation variants.
+    query_payload: dict[str, str] = {"uris": ",".join(safe_uris)}
+    urls = [_spotify_uri_to_url(uri) for uri in safe_uris]
+    safe_urls = [url for url in urls if isinstance(url, str) and url]
+    if safe_urls:
+        query_payload["urls"] = ",".join(safe_urls)
+
+    return urlencode(query_payload)
+
+
+def clear_session_tokens(session_id: str) -> None:
+    clear_tokens(session_id)
+
+
+def session_access_token(session_id: str) -> tuple[TokenRecord, str]:
+    token_record = get_tokens(session_id)
+    if not token_record:
+        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+
+    access_token = token_record.access_token
+    if not access_token:
+        clear_tokens(session_id)
+        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+
+    mark_session_active(session_id)
+    return token_record, access_token
+
+
+def session_refresh_token(session_id: str, token_record: TokenRecord) -> str:
+    refresh_token = token_record.refresh_token
+    if not refresh_token:
+        clear_tokens(session_id)
+        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+    return refresh_token
+
+
+def store_refreshed_tokens(
+    session_id: str,
+    token_record: TokenRecord,
+    refresh_token: str,
+    refreshed_tokens: dict[str, Any],
+) -> str:
+    merged_tokens = dict(refreshed_tokens)
+    if token_record.scope and not merged_tokens.get("scope"):
+        merged_tokens["scope"] = token_record.scope
+    if not isinstance(merged_tokens.get("refresh_token"), str) or not merged_tokens.get("refresh_token"):
+        merged_tokens["refresh_token"] = refresh_token
+    store_tokens(session_id=session_id, token_data=merged_tokens)
+
+    refreshed_access_token = merged_tokens.get("access_token")
+    if not isinstance(refreshed_access_token, str) or not refreshed_access_token:
+        clear_tokens(session_id)
+        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+    return refreshed_access_token
+
+
+def refreshed_by_peer(session_id: str, stale_access_token: str) -> tuple[TokenRecord, str | None]:
+    # Another caller may have refreshed while we waited; reuse its token instead of refreshing again.
+    # Read past the worker-local cache: a peer worker may have rotated the refresh token already.
+    forget_cached_tokens(session_id)
+    token_record = get_tokens(session_id)
+    if not token_record:
+        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+
+    current_access_token = token_record.access_token
+    if current_access_token and current_access_token != stale_access_token:
+        return token_record, current_access_token
+    return token_record, None
+
+
+def expires_soon(token_record: TokenRecord) -> bool:
+    if not token_record.refresh_token or token_record.expires_at is None:
+        return False
+    return time.time() >= token_record.expires_at - max(0.0, float(settings.token_refresh_skew_seconds))
@@ -1,54 +1,76 @@
-import json
-from typing import Any, Callable
-from urllib.error import HTTPError, URLError
-from urllib.parse import quote, urlencode
-from urllib.request import Request, urlopen
+import time
+from typing import Any, Callable, TypeVar
 
-from app.core.config import settings
-from app.services.spotify_oauth import clear_tokens, get_tokens, store_tokens
-
-SPOTIFY_API_BASE_URL = "https://api.spotify.com"
-
-
-class SpotifyClientError(Exception):
-    def __init__(self, status_code: int, message: str, auth_error: bool = False) -> None:
-        super().__init__(message)
-        self.status_code = status_code
-        self.message = message
-        self.auth_error = auth_error
-
-
-def _extract_error_message(payload: Any, fallback: str) -> str:
-    if isinstance(payload, dict):
-        nested_error = payload.get("error")
-        if isinstance(nested_error, dict):
-            nested_message = nested_error.get("message")
-            if isinstance(nested_message, str) and nested_message:
-                return nested_message
-
-        description = payload.get("error_description")
-        if isinstance(description, str) and description:
-            return description
-
-        if isinstance(nested_error, str) and nested_error:
-            return nested_error
-
-        detail = payload.get("detail")
-        if isinstance(detail, str) and detail:
-            return detail
+import httpx
 
-        message = payload.get("message")
-        if isinstance(message, str) and message:
-            return message
-
-    return fallback
-
-
-def _decode_json(response_body: str) -> Any:
-    try:
-        return json.loads(response_body)
-    except json.JSONDecodeError as exc:
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid JSON") from exc
+from app.core.config import settings
+from app.services.http_pool import get_http_client
+from app.services.single_flight import SingleFlight
+from app.services.spotify_api import (
+    RETRYABLE_STATUS_CODES,
+    SpotifyClientError,
+    add_items_request,
+    build_api_request,
+    build_refresh_request,
+    cached_response_for,
+    cached_tracks,
+    clear_session_tokens,
+    complete_cached_request,
+    create_playlist_payload,
+    expires_soon,
+    invalidate_after_mutation,
+    library_query_from_uris,
+    my_playlists_path,
+    parse_refresh_response,
+    parse_retry_after,
+    playlist_items_path,
+    rate_limit_bucket,
+    refreshed_by_peer,
+    require_dict,
+    retry_delay,
+    search_path,
+    session_access_token,
+    session_cache,
+    session_refresh_token,
+    session_scope,
+    store_refreshed_tokens,
+    track_id_batches,
+    track_path,
+    tracks_from_payload,
+    tracks_path,
+    unique_track_ids,
+)
+from app.services.spotify_oauth import forget_cached_tokens
+from app.services.token_store import TokenRecord
+
+T = TypeVar("T")
+
+_SESSION_REFRESH_FLIGHTS = SingleFlight()
+
+
+def _send_api_request(method: str, url: str, headers: dict[str, str], data: bytes | None) -> httpx.Response:
+    attempt = 0
+    while True:
+        wait_seconds = rate_limit_bucket().reserve()
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+        try:
+            response = get_http_client(url).request(method, url, headers=headers, content=data)
+        except httpx.HTTPError as exc:
+            delay = retry_delay(method, attempt, None, None)
+            if delay is None:
+                raise SpotifyClientError(status_code=502, message="Spotify API unavailable") from exc
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = retry_delay(method, attempt, response.status_code, retry_after)
+            if delay is None:
+                return response
+
+        time.sleep(delay)
+        attempt += 1
 
 
 def _spotify_request_json(
@@ -57,114 +79,60 @@ def _spotify_request_json(
     method: str = "GET",
     json_payload: dict[str, Any] | None = None,
 ) -> Any:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    data: bytes | None = None
-    if json_payload is not None:
-        headers["Content-Type"] = "application/json"
-        data = json.dumps(json_payload).encode("utf-8")
-
-    request = Request(
-        f"{SPOTIFY_API_BASE_URL}{path}",
-        headers=headers,
-        data=data,
-        method=method,
+    cache_key, ttl_seconds, cached = cached_response_for(method, path, access_token)
+    if cached is not None and cached.is_fresh():
+        return cached.copy_payload()
+
+    url, headers, data = build_api_request(path, access_token, json_payload)
+    if cached is not None and cached.etag:
+        headers["If-None-Match"] = cached.etag
+
+    response = _send_api_request(method, url, headers, data)
+    payload = complete_cached_request(
+        cache_key,
+        ttl_seconds,
+        cached,
+        response.status_code,
+        response.headers.get("ETag"),
+        response.text,
     )
-
-    try:
-        with urlopen(request, timeout=15) as response:
-            body = response.read().decode("utf-8")
-    except HTTPError as exc:
-        error_body = exc.read().decode("utf-8", errors="replace")
-        payload = None
-        if error_body:
-            try:
-                payload = json.loads(error_body)
-            except json.JSONDecodeError:
-                payload = None
-
-        if exc.code == 401:
-            message = _extract_error_message(payload, "Unauthorized Spotify token")
-            raise SpotifyClientError(status_code=exc.code, message=message, auth_error=True) from exc
-
-        message = _extract_error_message(payload, "Spotify API request failed")
-        raise SpotifyClientError(status_code=exc.code, message=message) from exc
-    except URLError as exc:
-        raise SpotifyClientError(status_code=502, message="Spotify API unavailable") from exc
-
-    if not body:
-        return {}
-
-    return _decode_json(body)
+    invalidate_after_mutation(method, path, access_token)
+    return payload
 
 
 def _refresh_access_token(refresh_token: str) -> dict[str, Any]:
-    payload = urlencode(
-        {
-            "grant_type": "refresh_token",
-            "refresh_token": refresh_token,
-            "client_id": settings.spotify_client_id,
-        }
-    ).encode("utf-8")
-    request = Request(
-        settings.spotify_token_url,
-        data=payload,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        method="POST",
-    )
+    headers, payload = build_refresh_request(refresh_token)
+    token_url = settings.spotify_token_url
 
     try:
-        with urlopen(request, timeout=15) as response:
-            body = response.read().decode("utf-8")
-    except HTTPError as exc:
-        error_body = exc.read().decode("utf-8", errors="replace")
-        payload = None
-        if error_body:
-            try:
-                payload = json.loads(error_body)
-            except json.JSONDecodeError:
-                payload = None
-        message = _extract_error_message(payload, "Not authorized")
-        raise SpotifyClientError(status_code=401, message=message, auth_error=True) from exc
-    except URLError as exc:
+        response = get_http_client(token_url).post(token_url, headers=headers, content=payload)
+    except httpx.HTTPError as exc:
         raise SpotifyClientError(status_code=502, message="Spotify token endpoint unavailable") from exc
 
-    token_data = _decode_json(body)
-    if not isinstance(token_data, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify token endpoint returned invalid JSON")
-
-    access_token = token_data.get("access_token")
-    if not isinstance(access_token, str) or not access_token:
-        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
-
-    return token_data
+    return parse_refresh_response(response.status_code, response.text)
 
 
 def get_current_user(access_token: str) -> dict[str, Any]:
     profile = _spotify_request_json("/v1/me", access_token)
-    if not isinstance(profile, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid profile data")
-    return profile
+    return require_dict(profile, "Spotify API returned invalid profile data")
 
 
 def get_track(access_token: str, track_id: str) -> dict[str, Any]:
-    safe_track_id = track_id.strip()
-    if not safe_track_id:
-        raise SpotifyClientError(status_code=400, message="Track ID is required")
+    payload = _spotify_request_json(track_path(track_id), access_token)
+    return require_dict(payload, "Spotify API returned invalid track data")
 
-    payload = _spotify_request_json(f"/v1/tracks/{quote(safe_track_id)}", access_token)
-    if not isinstance(payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid track data")
-    return payload
+
+def get_tracks(access_token: str, track_ids: list[str]) -> dict[str, dict[str, Any]]:
+    tracks_by_id, missing_track_ids = cached_tracks(unique_track_ids(track_ids))
+    for batch in track_id_batches(missing_track_ids):
+        payload = _spotify_request_json(tracks_path(batch), access_token)
+        tracks_by_id.update(tracks_from_payload(payload, batch))
+    return tracks_by_id
 
 
 def get_my_playlists(access_token: str, limit: int = 10, offset: int = 0) -> dict[str, Any]:
-    safe_limit = max(1, min(10, int(limit)))
-    safe_offset = max(0, int(offset))
-    query = urlencode({"limit": safe_limit, "offset": safe_offset})
-    payload = _spotify_request_json(f"/v1/me/playlists?{query}", access_token)
-    if not isinstance(payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid playlists data")
-    return payload
+    payload = _spotify_request_json(my_playlists_path(limit, offset), access_token)
+    return require_dict(payload, "Spotify API returned invalid playlists data")
 
 
 def get_playlist_items(
@@ -173,17 +141,8 @@ def get_playlist_items(
     limit: int = 25,
     offset: int = 0,
 ) -> dict[str, Any]:
-    safe_playlist_id = playlist_id.strip()
-    if not safe_playlist_id:
-        raise SpotifyClientError(status_code=400, message="Playlist ID is required")
-
-    safe_limit = max(1, min(50, int(limit)))
-    safe_offset = max(0, int(offset))
-    query = urlencode({"limit": safe_limit, "offset": safe_offset})
-    payload = _spotify_request_json(f"/v1/playlists/{safe_playlist_id}/items?{query}", access_token)
-    if not isinstance(payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid playlist items data")
-    return payload
+    payload = _spotify_request_json(playlist_items_path(playlist_id, limit, offset), access_token)
+    return require_dict(payload, "Spotify API returned invalid playlist items data")
 
 
 def create_my_playlist(
@@ -192,23 +151,13 @@ def create_my_playlist(
     description: str | None = None,
     public: bool = False,
 ) -> dict[str, Any]:
-    safe_name = name.strip()
-    if not safe_name:
-        raise SpotifyClientError(status_code=400, message="Playlist name is required")
-
-    payload: dict[str, Any] = {"name": safe_name, "public": bool(public)}
-    if description is not None:
-        payload["description"] = description
-
     response_payload = _spotify_request_json(
         "/v1/me/playlists",
         access_token,
         method="POST",
-        json_payload=payload,
+        json_payload=create_playlist_payload(name, description, public),
     )
-    if not isinstance(response_payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid playlist data")
-    return response_payload
+    return require_dict(response_payload, "Spotify API returned invalid playlist data")
 
 
 def search_tracks(
@@ -217,122 +166,95 @@ def search_tracks(
     limit: int = 10,
     offset: int = 0,
 ) -> dict[str, Any]:
-    safe_query = query.strip()
-    if not safe_query:
-        raise SpotifyClientError(status_code=400, message="Search query is required")
-
-    safe_limit = max(1, min(10, int(limit)))
-    safe_offset = max(0, int(offset))
-    search_query = urlencode(
-        {
-            "q": safe_query,
-            "type": "track",
-            "limit": safe_limit,
-            "offset": safe_offset,
-        }
-    )
-    payload = _spotify_request_json(f"/v1/search?{search_query}", access_token)
-    if not isinstance(payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid search data")
-    return payload
+    payload = _spotify_request_json(search_path(query, limit, offset), access_token)
+    return require_dict(payload, "Spotify API returned invalid search data")
 
 
 def add_items_to_playlist(
     access_token: str,
     playlist_id: str,
     uris: list[str],
+    position: int | None = None,
 ) -> dict[str, Any]:
-    safe_playlist_id = playlist_id.strip()
-    if not safe_playlist_id:
-        raise SpotifyClientError(status_code=400, message="Playlist ID is required")
-
-    safe_uris = [uri.strip() for uri in uris if isinstance(uri, str) and uri.strip()]
-    if not safe_uris:
-        raise SpotifyClientError(status_code=400, message="At least one track URI is required")
-
+    path, json_payload = add_items_request(playlist_id, uris, position)
     payload = _spotify_request_json(
-        f"/v1/playlists/{safe_playlist_id}/items",
+        path,
         access_token,
         method="POST",
-        json_payload={"uris": safe_uris},
+        json_payload=json_payload,
     )
-    if not isinstance(payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid add-items data")
-    return payload
-
-
-def _spotify_uri_to_url(uri: str) -> str | None:
-    parts = uri.split(":")
-    if len(parts) != 3 or parts[0] != "spotify":
-        return None
-
-    item_type = parts[1].strip()
-    item_id = parts[2].strip()
-    if not item_type or not item_id:
-        return None
-
-    if item_type == "user":
-        return f"https://open.spotify.com/user/{item_id}"
-
-    return f"https://open.spotify.com/{item_type}/{item_id}"
-
-
-def _library_query_from_uris(uris: list[str]) -> str:
-    safe_uris = [uri.strip() for uri in uris if isinstance(uri, str) and uri.strip()]
-    if not safe_uris:
-        raise SpotifyClientError(status_code=400, message="At least one Spotify URI is required")
-
-    # Keep URI-based contract and include URL form for compatibility with /me/library validation variants.
-    query_payload: dict[str, str] = {"uris": ",".join(safe_uris)}
-    urls = [_spotify_uri_to_url(uri) for uri in safe_uris]
-    safe_urls = [url for url in urls if isinstance(url, str) and url]
-    if safe_urls:
-        query_payload["urls"] = ",".join(safe_urls)
-
-    return urlencode(query_payload)
+    return require_dict(payload, "Spotify API returned invalid add-items data")
 
 
 def save_to_my_library(
     access_token: str,
     uris: list[str],
 ) -> dict[str, Any]:
-    query = _library_query_from_uris(uris)
+    query = library_query_from_uris(uris)
 
     payload = _spotify_request_json(
         f"/v1/me/library?{query}",
         access_token,
         method="PUT",
     )
-    if not isinstance(payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid library save data")
-    return payload
+    return require_dict(payload, "Spotify API returned invalid library save data")
 
 
 def remove_from_my_library(
     access_token: str,
     uris: list[str],
 ) -> dict[str, Any]:
-    query = _library_query_from_uris(uris)
+    query = library_query_from_uris(uris)
 
     payload = _spotify_request_json(
         f"/v1/me/library?{query}",
         access_token,
         method="DELETE",
     )
-    if not isinstance(payload, dict):
-        raise SpotifyClientError(status_code=502, message="Spotify API returned invalid library remove data")
-    return payload
+    return require_dict(payload, "Spotify API returned invalid library remove data")
+
+
+def _refresh_session_access_token(session_id: str, stale_access_token: str) -> str:
+    token_record, current_access_token = refreshed_by_peer(session_id, stale_access_token)
+    if current_access_token:
+        return current_access_token
+
+    refresh_token = session_refresh_token(session_id, token_record)
+    try:
+        refreshed_tokens = _refresh_access_token(refresh_token)
+    except SpotifyClientError:
+        forget_cached_tokens(session_id)
+        raise
+    return store_refreshed_tokens(session_id, token_record, refresh_token, refreshed_tokens)
 
 
-def _request_for_session(session_id: str, request_fn: Callable[[str], dict[str, Any]]) -> dict[str, Any]:
-    token_data = get_tokens(session_id)
-    if not token_data:
-        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+def _refresh_ahead_of_expiry(session_id: str, token_record: TokenRecord, access_token: str) -> str:
+    if not expires_soon(token_record):
+        return access_token
 
-    access_token = token_data.get("access_token")
-    if not isinstance(access_token, str) or not access_token:
-        clear_tokens(session_id)
-        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+    try:
+        return _SESSION_REFRESH_FLIGHTS.do(
+            session_id,
+            lambda: _refresh_session_access_token(session_id, access_token),
+        )
+    except SpotifyClientError:
+        # The current token is still inside its skew window; fall back to the 401 path if it lapses.
+        return access_token
+
+
+def _request_for_session(session_id: str, request_fn: Callable[[str], T]) -> T:
+    token_record, access_token = session_access_token(session_id)
+    with session_cache(session_scope(session_id, token_record)):
+        return _request_for_session_scoped(session_id, token_record, access_token, request_fn)
+
+
+def _request_for_session_scoped(
+    session_id: str,
+    token_record: TokenRecord,
+    access_token: str,
+    request_fn: Callable[[str], T],
+) -> T:
+    access_token = _refresh_ahead_of_expiry(session_id, token_record, access_token)
 
     try:
         return request_fn(access_token)
@@ -340,27 +262,16 @@ def _request_for_session(session_id: str, request_fn: Callable[[str], dict[str,
         if exc.status_code != 401:
             raise
 
-    refresh_token = token_data.get("refresh_token")
-    if not isinstance(refresh_token, str) or not refresh_token:
-        clear_tokens(session_id)
-        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
-
-    refreshed_tokens = _refresh_access_token(refresh_token)
-    merged_tokens = {**token_data, **refreshed_tokens}
-    if not isinstance(merged_tokens.get("refresh_token"), str) or not merged_tokens.get("refresh_token"):
-        merged_tokens["refresh_token"] = refresh_token
-    store_tokens(session_id=session_id, token_data=merged_tokens)
-
-    refreshed_access_token = merged_tokens.get("access_token")
-    if not isinstance(refreshed_access_token, str) or not refreshed_access_token:
-        clear_tokens(session_id)
-        raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True)
+    refreshed_access_token = _SESSION_REFRESH_FLIGHTS.do(
+        session_id,
+        lambda: _refresh_session_access_token(session_id, access_token),
+    )
 
     try:
         return request_fn(refreshed_access_token)
     except SpotifyClientError as exc:
         if exc.status_code == 401:
-            clear_tokens(session_id)
+            clear_session_tokens(session_id)
             raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True) from exc
         raise
 
@@ -376,6 +287,13 @@ def get_track_for_session(session_id: str, track_id: str) -> dict[str, Any]:
     )
 
 
+def get_tracks_for_session(session_id: str, track_ids: list[str]) -> dict[str, dict[str, Any]]:
+    return _request_for_session(
+        session_id,
+        lambda access_token: get_tracks(access_token=access_token, track_ids=track_ids),
+    )
+
+
 def get_my_playlists_for_session(session_id: str, limit: int = 10, offset: int = 0) -> dict[str, Any]:
     return _request_for_session(
         session_id,
@@ -438,6 +356,7 @@ def add_items_to_playlist_for_session(
     session_id: str,
     playlist_id: str,
     uris: list[str],
+    position: int | None = None,
 ) -> dict[str, Any]:
     return _request_for_session(
         session_id,
@@ -445,6 +364,7 @@ def add_items_to_playlist_for_session(
             access_token=access_token,
             playlist_id=playlist_id,
             uris=uris,
+            position=position,
         ),
     )
 
@@ -467,3 +387,4 @@ def remove_from_my_library_for_session(
         session_id,
         lambda access_token: remove_from_my_library(access_token=access_token, uris=uris),
     )
+
@@ -0,0 +1,625 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+import httpx
+
+from app.core.config import settings
+from app.services.http_pool import get_async_http_client
+from app.services.single_flight import AsyncSingleFlight
+from app.services.spotify_api import (
+    LIBRARY_URIS_LIMIT,
+    PLAYLIST_ADD_ITEMS_LIMIT,
+    PLAYLIST_ITEMS_PAGE_LIMIT,
+    PLAYLISTS_PAGE_LIMIT,
+    RETRYABLE_STATUS_CODES,
+    SEARCH_PAGE_LIMIT,
+    SpotifyClientError,
+    add_items_request,
+    build_api_request,
+    bypass_response_cache,
+    build_refresh_request,
+    cached_response_for,
+    cached_tracks,
+    clear_session_tokens,
+    complete_cached_request,
+    create_playlist_payload,
+    expires_soon,
+    invalidate_after_mutation,
+    library_query_from_uris,
+    merge_pages,
+    my_playlists_path,
+    page_windows,
+    parse_refresh_response,
+    parse_retry_after,
+    playlist_items_path,
+    rate_limit_bucket,
+    refreshed_by_peer,
+    require_dict,
+    retry_delay,
+    saved_tracks_path,
+    search_path,
+    session_access_token,
+    session_cache,
+    session_refresh_token,
+    session_scope,
+    store_refreshed_tokens,
+    track_id_batches,
+    track_path,
+    tracks_from_payload,
+    tracks_path,
+    unique_track_ids,
+    windows_before_total,
+)
+from app.services.spotify_oauth import (
+    claim_refresh_lease,
+    forget_cached_tokens,
+    get_tokens,
+    hold_refresh_lease,
+    run_token_store_io,
+    sessions_expiring_before,
+)
+from app.services.token_store import TokenRecord
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_SESSION_REFRESH_FLIGHTS = AsyncSingleFlight()
+
+
+async def _send_api_request(method: str, url: str, headers: dict[str, str], data: bytes | None) -> httpx.Response:
+    attempt = 0
+    while True:
+        wait_seconds = rate_limit_bucket().reserve()
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+
+        try:
+            response = await get_async_http_client(url).request(method, url, headers=headers, content=data)
+        except httpx.HTTPError as exc:
+            delay = retry_delay(method, attempt, None, None)
+            if delay is None:
+                raise SpotifyClientError(status_code=502, message="Spotify API unavailable") from exc
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = retry_delay(method, attempt, response.status_code, retry_after)
+            if delay is None:
+                return response
+
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def _spotify_request_json(
+    path: str,
+    access_token: str,
+    method: str = "GET",
+    json_payload: dict[str, Any] | None = None,
+) -> Any:
+    cache_key, ttl_seconds, cached = cached_response_for(method, path, access_token)
+    if cached is not None and cached.is_fresh():
+        return cached.copy_payload()
+
+    url, headers, data = build_api_request(path, access_token, json_payload)
+    if cached is not None and cached.etag:
+        headers["If-None-Match"] = cached.etag
+
+    response = await _send_api_request(method, url, headers, data)
+    payload = complete_cached_request(
+        cache_key,
+        ttl_seconds,
+        cached,
+        response.status_code,
+        response.headers.get("ETag"),
+        response.text,
+    )
+    invalidate_after_mutation(method, path, access_token)
+    return payload
+
+
+async def _refresh_access_token(refresh_token: str) -> dict[str, Any]:
+    headers, payload = build_refresh_request(refresh_token)
+    token_url = settings.spotify_token_url
+
+    try:
+        response = await get_async_http_client(token_url).post(token_url, headers=headers, content=payload)
+    except httpx.HTTPError as exc:
+        raise SpotifyClientError(status_code=502, message="Spotify token endpoint unavailable") from exc
+
+    return parse_refresh_response(response.status_code, response.text)
+
+
+async def get_current_user(access_token: str) -> dict[str, Any]:
+    profile = await _spotify_request_json("/v1/me", access_token)
+    return require_dict(profile, "Spotify API returned invalid profile data")
+
+
+async def get_track(access_token: str, track_id: str) -> dict[str, Any]:
+    payload = await _spotify_request_json(track_path(track_id), access_token)
+    return require_dict(payload, "Spotify API returned invalid track data")
+
+
+async def get_tracks(access_token: str, track_ids: list[str]) -> dict[str, dict[str, Any]]:
+    tracks_by_id, missing_track_ids = cached_tracks(unique_track_ids(track_ids))
+    for batch in track_id_batches(missing_track_ids):
+        payload = await _spotify_request_json(tracks_path(batch), access_token)
+        tracks_by_id.update(tracks_from_payload(payload, batch))
+    return tracks_by_id
+
+
+async def get_my_playlists(access_token: str, limit: int = 10, offset: int = 0) -> dict[str, Any]:
+    payload = await _spotify_request_json(my_playlists_path(limit, offset), access_token)
+    return require_dict(payload, "Spotify API returned invalid playlists data")
+
+
+async def get_saved_tracks(access_token: str, limit: int = 20, offset: int = 0) -> dict[str, Any]:
+    payload = await _spotify_request_json(saved_tracks_path(limit, offset), access_token)
+    return require_dict(payload, "Spotify API returned invalid saved tracks data")
+
+
+async def get_playlist_items(
+    access_token: str,
+    playlist_id: str,
+    limit: int = 25,
+    offset: int = 0,
+) -> dict[str, Any]:
+    payload = await _spotify_request_json(playlist_items_path(playlist_id, limit, offset), access_token)
+    return require_dict(payload, "Spotify API returned invalid playlist items data")
+
+
+async def create_my_playlist(
+    access_token: str,
+    name: str,
+    description: str | None = None,
+    public: bool = False,
+) -> dict[str, Any]:
+    response_payload = await _spotify_request_json(
+        "/v1/me/playlists",
+        access_token,
+        method="POST",
+        json_payload=create_playlist_payload(name, description, public),
+    )
+    return require_dict(response_payload, "Spotify API returned invalid playlist data")
+
+
+async def search_tracks(
+    access_token: str,
+    query: str,
+    limit: int = 10,
+    offset: int = 0,
+) -> dict[str, Any]:
+    payload = await _spotify_request_json(search_path(query, limit, offset), access_token)
+    return require_dict(payload, "Spotify API returned invalid search data")
+
+
+async def add_items_to_playlist(
+    access_token: str,
+    playlist_id: str,
+    uris: list[str],
+    position: int | None = None,
+) -> dict[str, Any]:
+    path, json_payload = add_items_request(playlist_id, uris, position)
+    payload = await _spotify_request_json(
+        path,
+        access_token,
+        method="POST",
+        json_payload=json_payload,
+    )
+    return require_dict(payload, "Spotify API returned invalid add-items data")
+
+
+async def save_to_my_library(
+    access_token: str,
+    uris: list[str],
+) -> dict[str, Any]:
+    query = library_query_from_uris(uris)
+
+    payload = await _spotify_request_json(
+        f"/v1/me/library?{query}",
+        access_token,
+        method="PUT",
+    )
+    return require_dict(payload, "Spotify API returned invalid library save data")
+
+
+async def remove_from_my_library(
+    access_token: str,
+    uris: list[str],
+) -> dict[str, Any]:
+    query = library_query_from_uris(uris)
+
+    payload = await _spotify_request_json(
+        f"/v1/me/library?{query}",
+        access_token,
+        method="DELETE",
+    )
+    return require_dict(payload, "Spotify API returned invalid library remove data")
+
+
+async def _refresh_session_access_token(session_id: str, stale_access_token: str) -> str:
+    token_record, current_access_token = await run_token_store_io(refreshed_by_peer, session_id, stale_access_token)
+    if current_access_token:
+        return current_access_token
+
+    refresh_token = await run_token_store_io(session_refresh_token, session_id, token_record)
+    try:
+        refreshed_tokens = await _refresh_access_token(refresh_token)
+    except SpotifyClientError:
+        forget_cached_tokens(session_id)
+        raise
+    return await run_token_store_io(store_refreshed_tokens, session_id, token_record, refresh_token, refreshed_tokens)
+
+
+async def _refresh_ahead_of_expiry(session_id: str, token_record: TokenRecord, access_token: str) -> str:
+    if not expires_soon(token_record):
+        return access_token
+
+    try:
+        return await _SESSION_REFRESH_FLIGHTS.do(
+            session_id,
+            lambda: _refresh_session_access_token(session_id, access_token),
+        )
+    except SpotifyClientError:
+        return access_token
+
+
+class SpotifySession:
+    # Request-scoped client: the session's token is looked up and refresh-checked once,
+    # then reused by every call (and every concurrent chunk/page) made through it.
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self._access_token: str | None = None
+        self._cache_scope = ""
+        self._token_lock = asyncio.Lock()
+
+    async def access_token(self) -> str:
+        if self._access_token is None:
+            # Concurrent chunks and page windows all land here first; only one of them does the lookup.
+            async with self._token_lock:
+                if self._access_token is None:
+                    token_record, access_token = await run_token_store_io(session_access_token, self.session_id)
+                    self._cache_scope = session_scope(self.session_id, token_record)
+                    self._access_token = await _refresh_ahead_of_expiry(
+                        self.session_id, token_record, access_token
+                    )
+        return self._access_token
+
+    async def request(self, request_fn: Callable[[str], Awaitable[T]]) -> T:
+        await self.access_token()
+        with session_cache(self._cache_scope):
+            return await self._request(request_fn)
+
+    async def _request(self, request_fn: Callable[[str], Awaitable[T]]) -> T:
+        access_token = await self.access_token()
+        try:
+            return await request_fn(access_token)
+        except SpotifyClientError as exc:
+            if exc.status_code != 401:
+                raise
+
+        refreshed_access_token = await _SESSION_REFRESH_FLIGHTS.do(
+            self.session_id,
+            lambda: _refresh_session_access_token(self.session_id, access_token),
+        )
+        self._access_token = refreshed_access_token
+
+        try:
+            return await request_fn(refreshed_access_token)
+        except SpotifyClientError as exc:
+            if exc.status_code == 401:
+                self._access_token = None
+                await run_token_store_io(clear_session_tokens, self.session_id)
+                raise SpotifyClientError(status_code=401, message="Not authorized", auth_error=True) from exc
+            raise
+
+    async def get_current_user(self) -> dict[str, Any]:
+        return await self.request(get_current_user)
+
+    async def get_track(self, track_id: str) -> dict[str, Any]:
+        return await self.request(lambda access_token: get_track(access_token=access_token, track_id=track_id))
+
+    async def get_tracks(self, track_ids: list[str]) -> dict[str, dict[str, Any]]:
+        return await self.request(lambda access_token: get_tracks(access_token=access_token, track_ids=track_ids))
+
+    async def _coalesced_pages(
+        self,
+        limit: int,
+        offset: int,
+        page_limit: int,
+        fetch_page: Callable[[int, int], Awaitable[dict[str, Any]]],
+        total_of: Callable[[dict[str, Any]], Any] = lambda page: page.get("total"),
+    ) -> tuple[list[dict[str, Any]], list[tuple[int, int]]]:
+        # Spotify caps these page sizes, so a larger logical page is split into upstream windows.
+        # The first window tells us the collection's total; only windows starting before it are
+        # then fetched, concurrently, over the session's one resolved token.
+        windows = page_windows(limit, offset, page_limit)
+        first_page = await fetch_page(*windows[0])
+        remaining = windows_before_total(windows[1:], total_of(first_page))
+        if not remaining:
+            return [first_page], windows
+
+        semaphore = asyncio.Semaphore(max(1, int(settings.spotify_fanout_concurrency)))
+
+        async def run_window(window: tuple[int, int]) -> dict[str, Any]:
+            async with semaphore:
+                return await fetch_page(*window)
+
+        return [first_page, *await asyncio.gather(*(run_window(window) for window in remaining))], windows
+
+    async def get_my_playlists(self, limit: int = 10, offset: int = 0) -> dict[str, Any]:
+        pages, windows = await self._coalesced_pages(
+            limit,
+            offset,
+            PLAYLISTS_PAGE_LIMIT,
+            lambda page_limit, page_offset: self.request(
+                lambda access_token: get_my_playlists(access_token=access_token, limit=page_limit, offset=page_offset)
+            ),
+        )
+        return pages[0] if len(windows) == 1 else merge_pages(pages, windows)
+
+    async def get_saved_tracks(self, limit: int = 20, offset: int = 0) -> dict[str, Any]:
+        return await self.request(
+            lambda access_token: get_saved_tracks(access_token=access_token, limit=limit, offset=offset)
+        )
+
+    async def get_playlist_items(self, playlist_id: str, limit: int = 25, offset: int = 0) -> dict[str, Any]:
+        return await self.request(
+            lambda access_token: get_playlist_items(
+                access_token=access_token,
+                playlist_id=playlist_id,
+                limit=limit,
+                offset=offset,
+            )
+        )
+
+    async def iter_playlist_items(
+        self,
+        playlist_id: str,
+        first_page: dict[str, Any],
+        concurrency: int | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        for item in first_page.get("items") or []:
+            yield item
+
+        page_size = max(1, int(first_page.get("limit") or PLAYLIST_ITEMS_PAGE_LIMIT))
+        total = max(0, int(first_page.get("total") or 0))
+        offsets = iter(range(int(first_page.get("offset") or 0) + page_size, total, page_size))
+        window = max(1, int(concurrency or settings.spotify_fanout_concurrency))
+
+        def fetch_page(offset: int) -> asyncio.Task[dict[str, Any]]:
+            # The task copies the current context, so the bypass covers only this page fetch.
+            with bypass_response_cache():
+                return asyncio.create_task(self.get_playlist_items(playlist_id, limit=page_size, offset=offset))
+
+        # Keep at most `window` page fetches in flight and yield pages strictly in offset order.
+        pending: deque[asyncio.Task[dict[str, Any]]] = deque(fetch_page(offset) for offset in islice(offsets, window))
+        try:
+            while pending:
+                page = await pending.popleft()
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.append(fetch_page(next_offset))
+                for item in page.get("items") or []:
+                    yield item
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def create_my_playlist(
+        self,
+        name: str,
+        description: str | None = None,
+        public: bool = False,
+    ) -> dict[str, Any]:
+        return await self.request(
+            lambda access_token: create_my_playlist(
+                access_token=access_token,
+                name=name,
+                description=description,
+                public=public,
+            )
+        )
+
+    async def search_tracks(self, query: str, limit: int = 10, offset: int = 0) -> dict[str, Any]:
+        pages, windows = await self._coalesced_pages(
+            limit,
+            offset,
+            SEARCH_PAGE_LIMIT,
+            lambda page_limit, page_offset: self.request(
+                lambda access_token: search_tracks(
+                    access_token=access_token,
+                    query=query,
+                    limit=page_limit,
+                    offset=page_offset,
+                )
+            ),
+            lambda page: (page.get("tracks") or {}).get("total"),
+        )
+        if len(windows) == 1:
+            return pages[0]
+        return {"tracks": merge_pages([page.get("tracks") or {} for page in pages], windows)}
+
+    async def add_items_to_playlist(
+        self,
+        playlist_id: str,
+        uris: list[str],
+        position: int | None = None,
+    ) -> dict[str, Any]:
+        return await self.request(
+            lambda access_token: add_items_to_playlist(
+                access_token=access_token,
+                playlist_id=playlist_id,
+                uris=uris,
+                position=position,
+            )
+        )
+
+    async def add_items_to_playlist_in_chunks(
+        self,
+        playlist_id: str,
+        uris: list[str],
+        position: int | None = None,
+    ) -> dict[str, Any]:
+        safe_uris = [uri.strip() for uri in uris if isinstance(uri, str) and uri.strip()]
+        if not safe_uris:
+            raise SpotifyClientError(status_code=400, message="At least one track URI is required")
+
+        chunks = [
+            safe_uris[start : start + PLAYLIST_ADD_ITEMS_LIMIT]
+            for start in range(0, len(safe_uris), PLAYLIST_ADD_ITEMS_LIMIT)
+        ]
+        results: list[dict[str, Any]] = []
+        snapshot_id: str | None = None
+        added = 0
+        failed = False
+        # Chunks go out back to back on the pooled connection; each must land before the next to keep order.
+        for index, chunk in enumerate(chunks):
+            offset = index * PLAYLIST_ADD_ITEMS_LIMIT
+            result: dict[str, Any] = {"index": index, "offset": offset, "count": len(chunk)}
+            if failed:
+                results.append({**result, "status": "skipped"})
+                continue
+
+            try:
+                payload = await self.add_items_to_playlist(
+                    playlist_id,
+                    chunk,
+                    position=None if position is None else position + offset,
+                )
+            except SpotifyClientError as exc:
+                if index == 0:
+                    raise
+                failed = True
+                results.append({**result, "status": "error", "status_code": exc.status_code, "message": exc.message})
+                continue
+
+            chunk_snapshot_id = payload.get("snapshot_id")
+            if isinstance(chunk_snapshot_id, str) and chunk_snapshot_id:
+                snapshot_id = chunk_snapshot_id
+            added += len(chunk)
+            results.append({**result, "status": "ok", "snapshot_id": chunk_snapshot_id})
+
+        return {
+            "snapshot_id": snapshot_id,
+            "total": len(safe_uris),
+            "added": added,
+            "chunks": results,
+        }
+
+    async def save_to_my_library(self, uris: list[str]) -> dict[str, Any]:
+        return await self.request(lambda access_token: save_to_my_library(access_token=access_token, uris=uris))
+
+    async def remove_from_my_library(self, uris: list[str]) -> dict[str, Any]:
+        return await self.request(lambda access_token: remove_from_my_library(access_token=access_token, uris=uris))
+
+    async def _mutate_library_in_chunks(
+        self,
+        uris: list[str],
+        mutate_fn: Callable[[str, list[str]], Awaitable[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        safe_uris = list(dict.fromkeys(uri.strip() for uri in uris if isinstance(uri, str) and uri.strip()))
+        if not safe_uris:
+            raise SpotifyClientError(status_code=400, message="At least one Spotify URI is required")
+
+        chunks = [
+            safe_uris[start : start + LIBRARY_URIS_LIMIT]
+            for start in range(0, len(safe_uris), LIBRARY_URIS_LIMIT)
+        ]
+        # Library saves are order-independent, so chunks are dispatched concurrently.
+        semaphore = asyncio.Semaphore(max(1, int(settings.spotify_fanout_concurrency)))
+
+        async def run_chunk(chunk: list[str]) -> SpotifyClientError | None:
+            async with semaphore:
+                try:
+                    await self.request(lambda access_token: mutate_fn(access_token, chunk))
+                except SpotifyClientError as exc:
+                    return exc
+            return None
+
+        errors = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        if all(error is not None for error in errors):
+            raise errors[0]
+
+        chunk_results: list[dict[str, Any]] = []
+        failed_uris: list[str] = []
+        for index, (chunk, error) in enumerate(zip(chunks, errors)):
+            result: dict[str, Any] = {"index": index, "count": len(chunk), "status": "ok"}
+            if error is not None:
+                failed_uris.extend(chunk)
+                result.update(
+                    status="error",
+                    status_code=401 if error.auth_error else error.status_code,
+                    message=error.message,
+                )
+            chunk_results.append(result)
+
+        return {
+            "total": len(safe_uris),
+            "succeeded": len(safe_uris) - len(failed_uris),
+            "failed": len(failed_uris),
+            "failed_uris": failed_uris,
+            "chunks": chunk_results,
+        }
+
+    async def save_to_my_library_in_chunks(self, uris: list[str]) -> dict[str, Any]:
+        return await self._mutate_library_in_chunks(
+            uris,
+            lambda access_token, chunk: save_to_my_library(access_token=access_token, uris=chunk),
+        )
+
+    async def remove_from_my_library_in_chunks(self, uris: list[str]) -> dict[str, Any]:
+        return await self._mutate_library_in_chunks(
+            uris,
+            lambda access_token, chunk: remove_from_my_library(access_token=access_token, uris=chunk),
+        )
+
+
+async def refresh_expiring_sessions() -> int:
+    now = time.time()
+    interval = max(1.0, float(settings.token_refresher_interval_seconds))
+    skew = max(0.0, float(settings.token_refresh_skew_seconds))
+    active_since = now - max(0.0, float(settings.token_refresher_active_window_seconds))
+    # Anything that would cross the skew window before the next pass is renewed now.
+    lease_seconds = max(1.0, float(settings.token_refresh_lease_seconds))
+    backoff_seconds = max(lease_seconds, float(settings.token_refresh_failure_backoff_seconds))
+    session_ids = await run_token_store_io(sessions_expiring_before, now + skew + interval, active_since)
+
+    refreshed = 0
+    for session_id in session_ids:
+        # Every worker runs this pass; the lease makes sure only one of them spends the refresh token.
+        if not await run_token_store_io(claim_refresh_lease, session_id, lease_seconds):
+            continue
+        token_record = await run_token_store_io(get_tokens, session_id)
+        if not token_record or not token_record.access_token:
+            continue
+        access_token = token_record.access_token
+        try:
+            await _SESSION_REFRESH_FLIGHTS.do(
+                session_id,
+                lambda: _refresh_session_access_token(session_id, access_token),
+            )
+        except SpotifyClientError:
+            await run_token_store_io(hold_refresh_lease, session_id, backoff_seconds)
+            continue
+        refreshed += 1
+    return refreshed
+
+
+async def run_token_refresher(stop_event: asyncio.Event) -> None:
+    while not stop_event.is_set():
+        try:
+            await refresh_expiring_sessions()
+        except Exception:
+            LOGGER.exception("Background token refresh pass failed")
+
+        interval = max(1.0, float(settings.token_refresher_interval_seconds))
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            continue
@@ -1,16 +1,43 @@
+import asyncio
 import base64
 import hashlib
 import json
 import secrets
 import time
-from typing import Any
+import weakref
+from typing import Any, Callable, TypeVar
 from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 
+import httpx
+
+from app.core.config import settings
+from app.services.http_pool import get_async_http_client
+from app.services.token_store import TokenRecord, TokenStore, create_token_store
+
 PENDING_AUTH_TTL_SECONDS = 600
-PENDING_AUTH: dict[str, dict[str, Any]] = {}
-TOKENS_BY_SESSION: dict[str, dict[str, Any]] = {}
+# last_used_at only feeds the background refresher, so coarse writes are enough.
+SESSION_ACTIVITY_WRITE_INTERVAL_SECONDS = 60
+PENDING_AUTH_NAMESPACE = "pending_auth"
+TOKENS_NAMESPACE = "tokens"
+REFRESH_LEASE_NAMESPACE = "refresh_lease"
+T = TypeVar("T")
+_CODE_EXCHANGE_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+TOKEN_STORE: TokenStore = create_token_store(
+    settings.token_store_url,
+    cache_ttl_seconds=settings.token_store_cache_ttl_seconds,
+    max_entries=settings.token_store_max_entries,
+)
+
+
+async def run_token_store_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Shared backends block on sqlite3/socket I/O, which must not stall the event loop.
+    if TOKEN_STORE.blocking_io:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
 
 
 def generate_session_id() -> str:
@@ -54,15 +81,20 @@ def build_authorize_url(
 
 
 def store_pending_auth(state: str, session_id: str, verifier: str) -> None:
-    PENDING_AUTH[state] = {
-        "session_id": session_id,
-        "verifier": verifier,
-        "created_at": time.time(),
-    }
+    TOKEN_STORE.put(
+        PENDING_AUTH_NAMESPACE,
+        state,
+        {
+            "session_id": session_id,
+            "verifier": verifier,
+            "created_at": time.time(),
+        },
+        ttl_seconds=PENDING_AUTH_TTL_SECONDS,
+    )
 
 
 def pop_pending_auth(state: str) -> dict[str, Any] | None:
-    return PENDING_AUTH.pop(state, None)
+    return TOKEN_STORE.pop(PENDING_AUTH_NAMESPACE, state)
 
 
 def is_pending_auth_expired(record: dict[str, Any]) -> bool:
@@ -70,13 +102,12 @@ def is_pending_auth_expired(record: dict[str, Any]) -> bool:
     return (time.time() - created_at) > PENDING_AUTH_TTL_SECONDS
 
 
-def exchange_code_for_tokens(
-    token_url: str,
+def _build_code_exchange_request(
     client_id: str,
     code: str,
     redirect_uri: str,
     code_verifier: str,
-) -> dict[str, Any]:
+) -> tuple[dict[str, str], bytes]:
     payload = urlencode(
         {
             "grant_type": "authorization_code",
@@ -86,13 +117,25 @@ def exchange_code_for_tokens(
             "code_verifier": code_verifier,
         }
     ).encode("utf-8")
+    return {"Content-Type": "application/x-www-form-urlencoded"}, payload
+
+
+def _parse_code_exchange_response(body: str) -> dict[str, Any]:
+    token_data = json.loads(body)
+    if "access_token" not in token_data:
+        raise ValueError("Token exchange failed: access_token missing in response")
+    return token_data
 
-    request = Request(
-        token_url,
-        data=payload,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        method="POST",
-    )
+
+def exchange_code_for_tokens(
+    token_url: str,
+    client_id: str,
+    code: str,
+    redirect_uri: str,
+    code_verifier: str,
+) -> dict[str, Any]:
+    headers, payload = _build_code_exchange_request(client_id, code, redirect_uri, code_verifier)
+    request = Request(token_url, data=payload, headers=headers, method="POST")
 
     try:
         with urlopen(request, timeout=15) as response:
@@ -103,28 +146,122 @@ def exchange_code_for_tokens(
     except URLError as exc:
         raise ValueError("Token exchange failed: Spotify token endpoint unavailable") from exc
 
-    token_data = json.loads(body)
-    if "access_token" not in token_data:
-        raise ValueError("Token exchange failed: access_token missing in response")
-    return token_data
+    return _parse_code_exchange_response(body)
 
 
-def store_tokens(session_id: str, token_data: dict[str, Any]) -> None:
-    TOKENS_BY_SESSION[session_id] = {
-        "token_data": token_data,
-        "stored_at": time.time(),
-    }
+def _code_exchange_semaphore() -> asyncio.Semaphore:
+    # Semaphores bind to the loop they first wait on, so keep one per loop.
+    loop = asyncio.get_running_loop()
+    semaphore = _CODE_EXCHANGE_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, int(settings.oauth_exchange_concurrency)))
+        _CODE_EXCHANGE_SEMAPHORES[loop] = semaphore
+    return semaphore
 
 
-def get_tokens(session_id: str) -> dict[str, Any] | None:
-    record = TOKENS_BY_SESSION.get(session_id)
-    if not record:
+async def exchange_code_for_tokens_async(
+    token_url: str,
+    client_id: str,
+    code: str,
+    redirect_uri: str,
+    code_verifier: str,
+) -> dict[str, Any]:
+    headers, payload = _build_code_exchange_request(client_id, code, redirect_uri, code_verifier)
+
+    async with _code_exchange_semaphore():
+        try:
+            response = await get_async_http_client(token_url).post(token_url, headers=headers, content=payload)
+        except httpx.HTTPError as exc:
+            raise ValueError("Token exchange failed: Spotify token endpoint unavailable") from exc
+
+    if response.status_code >= 400:
+        raise ValueError(f"Token exchange failed: {response.text}")
+    try:
+        return _parse_code_exchange_response(response.text)
+    except json.JSONDecodeError as exc:
+        raise ValueError("Token exchange failed: invalid JSON in response") from exc
+
+
+def _token_expires_at(token_data: dict[str, Any], stored_at: float) -> float | None:
+    raw_expires_in = token_data.get("expires_in")
+    try:
+        expires_in = float(raw_expires_in)
+    except (TypeError, ValueError):
         return None
-    token_data = record.get("token_data")
-    if not isinstance(token_data, dict):
+    if expires_in <= 0:
         return None
-    return token_data
+    return stored_at + expires_in
+
+
+def _optional_str(value: Any) -> str | None:
+    return value if isinstance(value, str) and value else None
+
+
+def _session_record(session_id: str) -> TokenRecord | None:
+    record = TOKEN_STORE.get(TOKENS_NAMESPACE, session_id)
+    return record if isinstance(record, TokenRecord) else None
+
+
+def store_tokens(session_id: str, token_data: dict[str, Any], new_login: bool = False) -> None:
+    stored_at = time.time()
+    previous = _session_record(session_id)
+    logged_in_at = previous.logged_in_at if previous and not new_login else stored_at
+    TOKEN_STORE.put(
+        TOKENS_NAMESPACE,
+        session_id,
+        TokenRecord(
+            access_token=_optional_str(token_data.get("access_token")) or "",
+            refresh_token=_optional_str(token_data.get("refresh_token")),
+            expires_at=_token_expires_at(token_data, stored_at),
+            scope=_optional_str(token_data.get("scope")),
+            stored_at=stored_at,
+            last_used_at=previous.last_used_at if previous else stored_at,
+            logged_in_at=logged_in_at,
+        ),
+        ttl_seconds=settings.session_ttl_seconds,
+    )
+
+
+def get_tokens(session_id: str) -> TokenRecord | None:
+    return _session_record(session_id)
+
+
+def mark_session_active(session_id: str) -> None:
+    record = _session_record(session_id)
+    if not record:
+        return
+    now = time.time()
+    if now - record.last_used_at < SESSION_ACTIVITY_WRITE_INTERVAL_SECONDS:
+        return
+    record.last_used_at = now
+    # Each activity write also pushes the idle expiry further out.
+    TOKEN_STORE.put(TOKENS_NAMESPACE, session_id, record, ttl_seconds=settings.session_ttl_seconds)
+
+
+def sessions_expiring_before(deadline: float, active_since: float) -> list[str]:
+    session_ids: list[str] = []
+    # Answered from the store's expiry index, so a pass reads only the sessions that are due.
+    for session_id, record in TOKEN_STORE.items_expiring_before(TOKENS_NAMESPACE, deadline):
+        if not isinstance(record, TokenRecord):
+            continue
+        if record.last_used_at < active_since:
+            continue
+        session_ids.append(session_id)
+    return session_ids
+
+
+def forget_cached_tokens(session_id: str) -> None:
+    TOKEN_STORE.invalidate_cached(TOKENS_NAMESPACE, session_id)
+
+
+def claim_refresh_lease(session_id: str, ttl_seconds: float) -> bool:
+    return TOKEN_STORE.claim(REFRESH_LEASE_NAMESPACE, session_id, {"claimed_at": time.time()}, ttl_seconds)
+
+
+def hold_refresh_lease(session_id: str, ttl_seconds: float) -> None:
+    # Extends the lease past a failed refresh so no worker retries the session until it lapses.
+    TOKEN_STORE.put(REFRESH_LEASE_NAMESPACE, session_id, {"failed_at": time.time()}, ttl_seconds=ttl_seconds)
 
 
 def clear_tokens(session_id: str) -> None:
-    TOKENS_BY_SESSION.pop(session_id, None)
+    TOKEN_STORE.delete(TOKENS_NAMESPACE, session_id)
@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional; gzip alone still covers every browser
+    brotli = None
+
+WEB_URL_PREFIX = "/web/"
+INDEX_FILE_NAME = "index.html"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+MIN_COMPRESS_BYTES = 512
+_ASSET_REFERENCE_RE = re.compile(r"""(["'])/web/([^"'?#]+)\1""")
+
+
+class StaticAsset:
+    __slots__ = ("content_type", "etag", "variants", "immutable")
+
+    def __init__(self, content_type: str, etag: str, variants: dict[str, bytes], immutable: bool) -> None:
+        self.content_type = content_type
+        self.etag = etag
+        self.variants = variants
+        self.immutable = immutable
+
+    @property
+    def cache_control(self) -> str:
+        return IMMUTABLE_CACHE_CONTROL if self.immutable else REVALIDATE_CACHE_CONTROL
+
+
+def _content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in {"application/javascript", "application/json"}:
+        return f"{content_type}; charset=utf-8"
+    return content_type
+
+
+def _hashed_name(name: str, digest: str) -> str:
+    path = Path(name)
+    return str(path.with_name(f"{path.stem}.{digest[:12]}{path.suffix}"))
+
+
+def _compressed_variants(body: bytes) -> dict[str, bytes]:
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return variants
+
+    # mtime=0 keeps the gzip bytes, and so the ETag, stable across restarts.
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(gzipped) < len(body):
+        variants["gzip"] = gzipped
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            variants["br"] = compressed
+    return variants
+
+
+def _asset(name: str, body: bytes, immutable: bool) -> StaticAsset:
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return StaticAsset(_content_type(name), etag, _compressed_variants(body), immutable)
+
+
+def build_asset_bundle(web_dir: Path) -> dict[str, StaticAsset]:
+    # Keys are URL paths. Hashed names are cached forever; original names and the
+    # index revalidate, so stale bookmarks and old HTML keep working.
+    assets: dict[str, StaticAsset] = {}
+    hashed_names: dict[str, str] = {}
+    for path in sorted(web_dir.rglob("*")):
+        if not path.is_file() or path.name == INDEX_FILE_NAME:
+            continue
+        name = path.relative_to(web_dir).as_posix()
+        body = path.read_bytes()
+        hashed_name = _hashed_name(name, hashlib.sha256(body).hexdigest())
+        hashed_names[name] = hashed_name
+        assets[WEB_URL_PREFIX + hashed_name] = _asset(name, body, immutable=True)
+        assets[WEB_URL_PREFIX + name] = _asset(name, body, immutable=False)
+
+    index_path = web_dir / INDEX_FILE_NAME
+    if index_path.is_file():
+
+        def rewrite(match: re.Match[str]) -> str:
+            quote, name = match.group(1), match.group(2)
+            return f"{quote}{WEB_URL_PREFIX}{hashed_names.get(name, name)}{quote}"
+
+        index_html = _ASSET_REFERENCE_RE.sub(rewrite, index_path.read_text(encoding="utf-8"))
+        assets["/"] = _asset(INDEX_FILE_NAME, index_html.encode("utf-8"), immutable=False)
+    return assets
+
+
+def negotiate_encoding(accept_encoding: str | None, available: dict[str, bytes]) -> str:
+    accepted: dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
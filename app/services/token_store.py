@@ -0,0 +1,703 @@
+import asyncio
+import heapq
+import json
+import logging
+import socket
+import sys
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote, urlsplit
+
+TOKEN_STORE_URL_DEFAULT = "memory://"
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+REDIS_SOCKET_TIMEOUT_SECONDS = 5.0
+REDIS_SCAN_COUNT = 500
+REDIS_EXPIRY_INDEX = "__token_expiry__"
+LOGGER = logging.getLogger(__name__)
+
+
+class TokenStoreError(RuntimeError):
+    pass
+
+
+class TokenRecord:
+    # One per session, so keep it small: only the fields we read, no per-instance __dict__.
+    __slots__ = ("access_token", "refresh_token", "expires_at", "scope", "stored_at", "last_used_at", "logged_in_at")
+
+    def __init__(
+        self,
+        access_token: str,
+        refresh_token: str | None = None,
+        expires_at: float | None = None,
+        scope: str | None = None,
+        stored_at: float = 0.0,
+        last_used_at: float = 0.0,
+        logged_in_at: float = 0.0,
+    ) -> None:
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        # Most sessions share the same scope string; intern it so they share one copy too.
+        self.scope = sys.intern(scope) if scope else None
+        self.stored_at = stored_at
+        self.last_used_at = last_used_at
+        # Set by the code exchange and kept across refreshes, so it identifies one sign-in.
+        self.logged_in_at = logged_in_at
+
+    def to_list(self) -> list[Any]:
+        return [
+            self.access_token,
+            self.refresh_token,
+            self.expires_at,
+            self.scope,
+            self.stored_at,
+            self.last_used_at,
+            self.logged_in_at,
+        ]
+
+    @classmethod
+    def from_list(cls, values: list[Any]) -> "TokenRecord":
+        return cls(*values)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TokenRecord) and self.to_list() == other.to_list()
+
+    def __repr__(self) -> str:
+        return f"TokenRecord(expires_at={self.expires_at!r}, scope={self.scope!r}, stored_at={self.stored_at!r})"
+
+
+StoreRecord = dict[str, Any] | TokenRecord
+
+
+def _dump_record(record: StoreRecord) -> str:
+    payload = {"token_record": record.to_list()} if isinstance(record, TokenRecord) else record
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def _token_expiry(record: StoreRecord) -> float | None:
+    # Backends index this so the refresher can ask for sessions by access-token expiry.
+    return record.expires_at if isinstance(record, TokenRecord) else None
+
+
+def _load_record(raw: str) -> StoreRecord:
+    payload = json.loads(raw)
+    if isinstance(payload, dict) and len(payload) == 1 and isinstance(payload.get("token_record"), list):
+        return TokenRecord.from_list(payload["token_record"])
+    return payload
+
+
+class TokenStore(ABC):
+    # Records are TokenRecords or JSON-compatible dicts, grouped by namespace ("tokens", "pending_auth").
+    # Async callers push blocking backends (sqlite3, sockets) to a worker thread.
+    blocking_io = True
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> StoreRecord | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float | None = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def pop(self, namespace: str, key: str) -> StoreRecord | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float) -> bool:
+        # Atomic put-if-absent; an expired record counts as absent. Used for cross-worker leases.
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> None:
+        self.pop(namespace, key)
+
+    @abstractmethod
+    def items(self, namespace: str) -> Iterator[tuple[str, StoreRecord]]:
+        raise NotImplementedError
+
+    def items_expiring_before(self, namespace: str, deadline: float) -> Iterator[tuple[str, StoreRecord]]:
+        # TokenRecords whose access token expires by `deadline`. Shared backends answer from an index.
+        records: list[tuple[str, StoreRecord]] = []
+        for key, record in self.items(namespace):
+            token_expiry = _token_expiry(record)
+            if token_expiry is not None and token_expiry <= deadline:
+                records.append((key, record))
+        return iter(records)
+
+    def sweep_expired(self, now: float | None = None) -> int:
+        return 0
+
+    def invalidate_cached(self, namespace: str, key: str) -> None:
+        # Only read-through caches hold copies; everything else already reads its source of truth.
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+    def close(self) -> None:
+        return None
+
+
+def _deadline(ttl_seconds: float | None) -> float | None:
+    if ttl_seconds is None:
+        return None
+    return time.time() + max(0.0, float(ttl_seconds))
+
+
+class MemoryTokenStore(TokenStore):
+    # Process-local only; fine for a single worker and for tests. Expiry is tracked in a
+    # min-heap with lazy deletion, and max_entries caps each namespace with its own LRU, so a
+    # burst of abandoned logins (pending_auth) can never evict signed-in sessions (tokens).
+    blocking_io = False
+
+    def __init__(self, max_entries: int | None = None) -> None:
+        self.max_entries = max(1, int(max_entries)) if max_entries is not None else None
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.RLock()
+        self._records: dict[str, OrderedDict[str, tuple[StoreRecord, float | None]]] = {}
+        self._expiry_heap: list[tuple[float, str, str]] = []
+
+    def _is_live(self, expires_at: float | None, now: float) -> bool:
+        return expires_at is None or expires_at > now
+
+    def _size(self) -> int:
+        return sum(len(records) for records in self._records.values())
+
+    def get(self, namespace: str, key: str) -> StoreRecord | None:
+        with self._lock:
+            records = self._records.get(namespace)
+            entry = records.get(key) if records is not None else None
+            if entry is None:
+                return None
+            record, expires_at = entry
+            if not self._is_live(expires_at, time.time()):
+                del records[key]
+                self.expired += 1
+                return None
+            records.move_to_end(key)
+            return record
+
+    def put(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float | None = None) -> None:
+        expires_at = _deadline(ttl_seconds)
+        with self._lock:
+            records = self._records.setdefault(namespace, OrderedDict())
+            records[key] = (record, expires_at)
+            records.move_to_end(key)
+            if expires_at is not None:
+                heapq.heappush(self._expiry_heap, (expires_at, namespace, key))
+            if self.max_entries is not None:
+                while len(records) > self.max_entries:
+                    records.popitem(last=False)
+                    self.evicted += 1
+            # Renewals leave stale heap entries behind; rebuild once they dominate.
+            if len(self._expiry_heap) > 2 * self._size() + 64:
+                self._expiry_heap = [
+                    (entry_expires_at, entry_namespace, entry_key)
+                    for entry_namespace, entries in self._records.items()
+                    for entry_key, (_, entry_expires_at) in entries.items()
+                    if entry_expires_at is not None
+                ]
+                heapq.heapify(self._expiry_heap)
+
+    def claim(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float) -> bool:
+        with self._lock:
+            records = self._records.get(namespace)
+            entry = records.get(key) if records is not None else None
+            if entry is not None and self._is_live(entry[1], time.time()):
+                return False
+            self.put(namespace, key, record, ttl_seconds)
+        return True
+
+    def pop(self, namespace: str, key: str) -> StoreRecord | None:
+        with self._lock:
+            records = self._records.get(namespace)
+            entry = records.pop(key, None) if records is not None else None
+        if entry is None:
+            return None
+        record, expires_at = entry
+        if not self._is_live(expires_at, time.time()):
+            return None
+        return record
+
+    def items(self, namespace: str) -> Iterator[tuple[str, StoreRecord]]:
+        now = time.time()
+        with self._lock:
+            snapshot = [
+                (key, record)
+                for key, (record, expires_at) in self._records.get(namespace, {}).items()
+                if self._is_live(expires_at, now)
+            ]
+        return iter(snapshot)
+
+    def sweep_expired(self, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                heap_expires_at, namespace, key = heapq.heappop(self._expiry_heap)
+                records = self._records.get(namespace)
+                entry = records.get(key) if records is not None else None
+                # Skip heap entries superseded by a later put or already removed.
+                if entry is None or entry[1] != heap_expires_at:
+                    continue
+                del records[key]
+                removed += 1
+            self.expired += removed
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            by_namespace = {namespace: len(records) for namespace, records in self._records.items() if records}
+            return {
+                "backend": "memory",
+                "entries": sum(by_namespace.values()),
+                "entries_by_namespace": by_namespace,
+                "max_entries": self.max_entries,
+                "expiry_heap_size": len(self._expiry_heap),
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size()
+
+
+class SQLiteTokenStore(TokenStore):
+    # One connection per thread; WAL lets every worker process read while one writes.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if path != ":memory:":
+            Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections_lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS token_store (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                record TEXT NOT NULL,
+                expires_at REAL,
+                token_expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(token_store)")}
+        if "token_expires_at" not in columns:
+            # Stores created before the refresher queried by deadline; old rows index on their next write.
+            conn.execute("ALTER TABLE token_store ADD COLUMN token_expires_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS token_store_expires_at ON token_store (expires_at)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS token_store_token_expires_at ON token_store (namespace, token_expires_at)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, namespace: str, key: str) -> StoreRecord | None:
+        row = self._connection().execute(
+            "SELECT record FROM token_store WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return _load_record(row[0]) if row else None
+
+    def put(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float | None = None) -> None:
+        self._connection().execute(
+            """
+            INSERT INTO token_store (namespace, key, record, expires_at, token_expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(namespace, key) DO UPDATE SET
+                record = excluded.record,
+                expires_at = excluded.expires_at,
+                token_expires_at = excluded.token_expires_at
+            """,
+            (namespace, key, _dump_record(record), _deadline(ttl_seconds), _token_expiry(record)),
+        )
+
+    def claim(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float) -> bool:
+        now = time.time()
+        # The upsert only overwrites an expired row, so exactly one worker's statement changes anything.
+        cursor = self._connection().execute(
+            """
+            INSERT INTO token_store (namespace, key, record, expires_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(namespace, key) DO UPDATE SET
+                record = excluded.record,
+                expires_at = excluded.expires_at
+            WHERE token_store.expires_at IS NOT NULL AND token_store.expires_at <= ?
+            """,
+            (namespace, key, _dump_record(record), now + max(0.0, float(ttl_seconds)), now),
+        )
+        return cursor.rowcount == 1
+
+    def pop(self, namespace: str, key: str) -> StoreRecord | None:
+        # RETURNING makes the read-and-delete atomic, so only one worker can consume a pending auth.
+        row = self._connection().execute(
+            "DELETE FROM token_store WHERE namespace = ? AND key = ? RETURNING record, expires_at",
+            (namespace, key),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return _load_record(row[0])
+
+    def items(self, namespace: str) -> Iterator[tuple[str, StoreRecord]]:
+        rows = self._connection().execute(
+            "SELECT key, record FROM token_store WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time()),
+        ).fetchall()
+        return iter([(key, _load_record(record)) for key, record in rows])
+
+    def items_expiring_before(self, namespace: str, deadline: float) -> Iterator[tuple[str, StoreRecord]]:
+        rows = self._connection().execute(
+            """
+            SELECT key, record FROM token_store
+            WHERE namespace = ? AND token_expires_at <= ? AND (expires_at IS NULL OR expires_at > ?)
+            """,
+            (namespace, deadline, time.time()),
+        ).fetchall()
+        return iter([(key, _load_record(record)) for key, record in rows])
+
+    def sweep_expired(self, now: float | None = None) -> int:
+        cursor = self._connection().execute(
+            "DELETE FROM token_store WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time() if now is None else now,),
+        )
+        return cursor.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        rows = self._connection().execute(
+            "SELECT namespace, COUNT(*) FROM token_store GROUP BY namespace"
+        ).fetchall()
+        by_namespace = {namespace: count for namespace, count in rows}
+        return {
+            "backend": "sqlite",
+            "entries": sum(by_namespace.values()),
+            "entries_by_namespace": by_namespace,
+        }
+
+    def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class RedisTokenStore(TokenStore):
+    # Speaks RESP directly over a socket, so no client library is required.
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        password: str | None = None,
+        key_prefix: str = "spotify_project:",
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.key_prefix = key_prefix
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._reader: Any = None
+
+    def _connect(self) -> None:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=REDIS_SOCKET_TIMEOUT_SECONDS)
+        except OSError as exc:
+            raise TokenStoreError(f"Token store unavailable at {self.host}:{self.port}") from exc
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", str(self.db))
+
+    def _disconnect(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._reader = None
+
+    def _roundtrip(self, *args: str) -> Any:
+        assert self._sock is not None
+        parts = [f"*{len(args)}\r\n".encode("ascii")]
+        for arg in args:
+            encoded = arg.encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(encoded), encoded))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Token store connection closed")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode("utf-8")
+        if prefix == b"-":
+            raise TokenStoreError(body.decode("utf-8", errors="replace"))
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if prefix == b"*":
+            length = int(body)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise TokenStoreError(f"Unexpected token store reply: {line!r}")
+
+    def _command(self, *args: str) -> Any:
+        with self._lock:
+            # One reconnect covers servers that dropped an idle connection.
+            for attempt in range(2):
+                if self._sock is None:
+                    self._connect()
+                try:
+                    return self._roundtrip(*args)
+                except (OSError, ConnectionError) as exc:
+                    self._disconnect()
+                    if attempt:
+                        raise TokenStoreError("Token store request failed") from exc
+        return None
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.key_prefix}{namespace}:{key}"
+
+    def _expiry_index_key(self, namespace: str) -> str:
+        # Sorted set of keys scored by access-token expiry; lives outside the namespace's key pattern.
+        return f"{self.key_prefix}{REDIS_EXPIRY_INDEX}:{namespace}"
+
+    def get(self, namespace: str, key: str) -> StoreRecord | None:
+        raw = self._command("GET", self._key(namespace, key))
+        return _load_record(raw) if raw is not None else None
+
+    def put(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float | None = None) -> None:
+        args = ["SET", self._key(namespace, key), _dump_record(record)]
+        if ttl_seconds is not None:
+            args.extend(["PX", str(max(1, int(float(ttl_seconds) * 1000)))])
+        self._command(*args)
+        token_expiry = _token_expiry(record)
+        if token_expiry is not None:
+            self._command("ZADD", self._expiry_index_key(namespace), repr(float(token_expiry)), key)
+
+    def claim(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float) -> bool:
+        ttl_ms = str(max(1, int(float(ttl_seconds) * 1000)))
+        return self._command("SET", self._key(namespace, key), _dump_record(record), "NX", "PX", ttl_ms) == "OK"
+
+    def pop(self, namespace: str, key: str) -> StoreRecord | None:
+        raw = self._command("GETDEL", self._key(namespace, key))
+        self._command("ZREM", self._expiry_index_key(namespace), key)
+        return _load_record(raw) if raw is not None else None
+
+    def items(self, namespace: str) -> Iterator[tuple[str, StoreRecord]]:
+        prefix = self._key(namespace, "")
+        keys = self._scan_keys(f"{prefix}*")
+
+        records: list[tuple[str, StoreRecord]] = []
+        if keys:
+            for full_key, raw in zip(keys, self._command("MGET", *keys)):
+                if raw is not None:
+                    records.append((full_key[len(prefix) :], _load_record(raw)))
+        return iter(records)
+
+    def items_expiring_before(self, namespace: str, deadline: float) -> Iterator[tuple[str, StoreRecord]]:
+        index_key = self._expiry_index_key(namespace)
+        keys = self._command("ZRANGEBYSCORE", index_key, "-inf", repr(float(deadline)))
+        records: list[tuple[str, StoreRecord]] = []
+        if not keys:
+            return iter(records)
+        lapsed: list[str] = []
+        for key, raw in zip(keys, self._command("MGET", *(self._key(namespace, key) for key in keys))):
+            if raw is None:
+                # The session itself expired (PX); drop it from the index lazily.
+                lapsed.append(key)
+            else:
+                records.append((key, _load_record(raw)))
+        if lapsed:
+            self._command("ZREM", index_key, *lapsed)
+        return iter(records)
+
+    def _scan_keys(self, pattern: str) -> list[str]:
+        cursor = "0"
+        keys: list[str] = []
+        while True:
+            cursor, batch = self._command("SCAN", cursor, "MATCH", pattern, "COUNT", str(REDIS_SCAN_COUNT))
+            keys.extend(batch)
+            if cursor == "0":
+                return keys
+
+    def stats(self) -> dict[str, Any]:
+        # Redis expires keys itself (PX), so there is nothing to sweep here. The database may be
+        # shared with other apps, so only keys under our prefix are counted (DBSIZE would count all).
+        by_namespace: dict[str, int] = {}
+        for full_key in self._scan_keys(f"{self.key_prefix}*"):
+            namespace = full_key[len(self.key_prefix) :].split(":", 1)[0]
+            if namespace == REDIS_EXPIRY_INDEX:
+                continue
+            by_namespace[namespace] = by_namespace.get(namespace, 0) + 1
+        return {"backend": "redis", "entries": sum(by_namespace.values()), "entries_by_namespace": by_namespace}
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+
+class CachedTokenStore(TokenStore):
+    # Read-through cache in front of a shared backend. Entries are trusted for ttl_seconds,
+    # which bounds how long a token refreshed by another worker can look stale here.
+    def __init__(self, backend: TokenStore, ttl_seconds: float) -> None:
+        self.backend = backend
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], tuple[StoreRecord | None, float]] = {}
+
+    def _remember(self, namespace: str, key: str, record: StoreRecord | None) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[(namespace, key)] = (record, time.monotonic() + self.ttl_seconds)
+
+    def _forget(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def get(self, namespace: str, key: str) -> StoreRecord | None:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        record = self.backend.get(namespace, key)
+        self._remember(namespace, key, record)
+        return record
+
+    def put(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float | None = None) -> None:
+        self.backend.put(namespace, key, record, ttl_seconds)
+        if ttl_seconds is None or ttl_seconds > self.ttl_seconds:
+            self._remember(namespace, key, record)
+        else:
+            self._forget(namespace, key)
+
+    def claim(self, namespace: str, key: str, record: StoreRecord, ttl_seconds: float) -> bool:
+        # Leases must be decided by the shared backend, never by this worker's copy.
+        self._forget(namespace, key)
+        return self.backend.claim(namespace, key, record, ttl_seconds)
+
+    def pop(self, namespace: str, key: str) -> StoreRecord | None:
+        self._forget(namespace, key)
+        return self.backend.pop(namespace, key)
+
+    def items(self, namespace: str) -> Iterator[tuple[str, StoreRecord]]:
+        return self.backend.items(namespace)
+
+    def items_expiring_before(self, namespace: str, deadline: float) -> Iterator[tuple[str, StoreRecord]]:
+        return self.backend.items_expiring_before(namespace, deadline)
+
+    def sweep_expired(self, now: float | None = None) -> int:
+        monotonic_now = time.monotonic()
+        with self._lock:
+            self._entries = {
+                cache_key: entry for cache_key, entry in self._entries.items() if entry[1] > monotonic_now
+            }
+        return self.backend.sweep_expired(now)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            cache_stats = {"cache_entries": len(self._entries), "cache_hits": self.hits, "cache_misses": self.misses}
+        return {**self.backend.stats(), **cache_stats}
+
+    def invalidate_cached(self, namespace: str, key: str) -> None:
+        self._forget(namespace, key)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        self.clear_cache()
+        self.backend.close()
+
+
+def _sqlite_path_from_url(url: str) -> str:
+    raw_path = unquote(url[len("sqlite:///") :]).strip() or "./tokens.db"
+    # sqlite:///C:/path/db.sqlite can be parsed as /C:/path/db.sqlite.
+    if raw_path.startswith("/") and len(raw_path) >= 3 and raw_path[2] == ":" and raw_path[1].isalpha():
+        raw_path = raw_path[1:]
+    return raw_path
+
+
+def create_token_store(url: str, cache_ttl_seconds: float = 0.0, max_entries: int | None = None) -> TokenStore:
+    raw_url = url.strip() or TOKEN_STORE_URL_DEFAULT
+    if raw_url.startswith("memory://"):
+        # Nothing to read through to; the backend already lives in-process.
+        return MemoryTokenStore(max_entries=max_entries)
+
+    if raw_url.startswith("sqlite:///"):
+        backend: TokenStore = SQLiteTokenStore(_sqlite_path_from_url(raw_url))
+    elif raw_url.startswith("redis://"):
+        parts = urlsplit(raw_url)
+        db_path = parts.path.strip("/")
+        backend = RedisTokenStore(
+            host=parts.hostname or "127.0.0.1",
+            port=parts.port or 6379,
+            db=int(db_path) if db_path.isdigit() else 0,
+            password=unquote(parts.password) if parts.password else None,
+        )
+    else:
+        raise ValueError("TOKEN_STORE_URL must use memory://, sqlite:/// or redis://")
+
+    if cache_ttl_seconds > 0:
+        return CachedTokenStore(backend, ttl_seconds=cache_ttl_seconds)
+    return backend
+
+
+async def run_token_store_sweeper(store: TokenStore, interval_seconds: float, stop_event: asyncio.Event) -> None:
+    while not stop_event.is_set():
+        try:
+            removed = await asyncio.to_thread(store.sweep_expired)
+            if removed:
+                LOGGER.debug("Swept %d expired token store entries", removed)
+        except Exception:
+            LOGGER.exception("Token store sweep failed")
+
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=max(1.0, float(interval_seconds)))
+        except asyncio.TimeoutError:
+            continue
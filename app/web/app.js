@@ -29,7 +29,7 @@ const searchTracksPageSummaryElement = document.getElementById("search-tracks-pa
 
 const STEP_DISCONNECTED = "disconnected";
 const STEP_CONNECTED = "connected";
-const PLAYLISTS_PAGE_LIMIT = 10;
+const PLAYLISTS_PAGE_LIMIT = 50;
 const PLAYLIST_ITEMS_PAGE_LIMIT = 25;
 const SEARCH_TRACKS_PAGE_LIMIT = 10;
 const PLAYLIST_ITEMS_NOT_AVAILABLE_MESSAGE =
@@ -696,6 +696,10 @@ async function apiMe() {
   return apiFetch("/api/me", { method: "GET" });
 }
 
+async function apiDashboard() {
+  return apiFetch("/api/me/dashboard", { method: "GET" });
+}
+
 async function apiGetMyPlaylists({ limit = PLAYLISTS_PAGE_LIMIT, offset = 0 } = {}) {
   const safeLimit = clampPlaylistLimit(limit);
   const safeOffset = clampPlaylistOffset(offset);
@@ -1043,6 +1047,16 @@ async function loadSelectedPlaylistItems(playlist) {
   }
 }
 
+function applyPlaylistsPayload(payload) {
+  playlistState.items = payload && Array.isArray(payload.items) ? payload.items : [];
+  playlistState.limit = clampPlaylistLimit(payload && payload.limit);
+  playlistState.offset = clampPlaylistOffset(payload && payload.offset);
+  playlistState.total = Math.max(0, toInteger(payload && payload.total, 0));
+  playlistState.loading = false;
+  playlistState.error = "";
+  renderPlaylists();
+}
+
 async function loadMyPlaylists(offset = 0, { clearHighlight = false } = {}) {
   const requestedOffset = clampPlaylistOffset(offset);
   const requestSequence = playlistRequestSequence + 1;
@@ -1067,13 +1081,7 @@ async function loadMyPlaylists(offset = 0, { clearHighlight = false } = {}) {
       return;
     }
 
-    playlistState.items = payload && Array.isArray(payload.items) ? payload.items : [];
-    playlistState.limit = clampPlaylistLimit(payload && payload.limit);
-    playlistState.offset = clampPlaylistOffset(payload && payload.offset);
-    playlistState.total = Math.max(0, toInteger(payload && payload.total, 0));
-    playlistState.loading = false;
-    playlistState.error = "";
-    renderPlaylists();
+    applyPlaylistsPayload(payload);
   } catch (error) {
     if (requestSequence !== playlistRequestSequence) {
       return;
@@ -1091,18 +1099,32 @@ async function loadMyPlaylists(offset = 0, { clearHighlight = false } = {}) {
 }
 
 async function refreshConnectionStatus() {
+  let dashboard;
   try {
-    const profile = await apiMe();
-    const displayName =
-      profile && typeof profile.display_name === "string" && profile.display_name
-        ? profile.display_name
-        : "Spotify user";
-    renderStep(STEP_CONNECTED, { displayName });
-    await loadMyPlaylists(0, { clearHighlight: true });
+    // One round trip: the server fetches profile, playlists and library concurrently.
+    dashboard = await apiDashboard();
   } catch (error) {
     renderStep(STEP_DISCONNECTED);
     resetPlaylistState();
+    return;
   }
+
+  const profile = dashboard && dashboard.profile;
+  const displayName =
+    profile && typeof profile.display_name === "string" && profile.display_name
+      ? profile.display_name
+      : "Spotify user";
+  renderStep(STEP_CONNECTED, { displayName });
+  if (!dashboard || !dashboard.playlists) {
+    // Playlists failed server-side without signing the user out; load them on their own.
+    await loadMyPlaylists(0, { clearHighlight: true });
+    return;
+  }
+
+  playlistRequestSequence += 1;
+  clearPlaylistHighlight();
+  resetPlaylistItemsState();
+  applyPlaylistsPayload(dashboard.playlists);
 }
 
 async function connectSpotify() {
@@ -1227,6 +1249,7 @@ async function initializeApp() {
 }
 
 window.apiMe = apiMe;
+window.apiDashboard = apiDashboard;
 window.apiGetMyPlaylists = apiGetMyPlaylists;
 window.apiGetPlaylistItems = apiGetPlaylistItems;
 window.apiCreateMyPlaylist = apiCreateMyPlaylist;
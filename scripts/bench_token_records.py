@@ -0,0 +1,85 @@
+import argparse
+import gc
+import secrets
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from app.services.token_store import TokenRecord
+
+SCOPE = (
+    "user-read-private user-read-email playlist-modify-private "
+    "playlist-modify-public user-library-read user-library-modify"
+)
+
+
+def _token_response(index: int) -> dict[str, Any]:
+    # Spotify access tokens are ~300 characters and refresh tokens ~130.
+    return {
+        "access_token": f"{index:08d}" + secrets.token_urlsafe(219),
+        "token_type": "Bearer",
+        "scope": SCOPE,
+        "expires_in": 3600,
+        "refresh_token": f"{index:08d}" + secrets.token_urlsafe(92),
+    }
+
+
+def _dict_layout(token_data: dict[str, Any], now: float) -> Any:
+    return {
+        "token_data": token_data,
+        "stored_at": now,
+        "expires_at": now + 3600,
+        "last_used_at": now,
+    }
+
+
+def _record_layout(token_data: dict[str, Any], now: float) -> Any:
+    return TokenRecord(
+        access_token=token_data["access_token"],
+        refresh_token=token_data["refresh_token"],
+        expires_at=now + float(token_data["expires_in"]),
+        scope=token_data["scope"],
+        stored_at=now,
+        last_used_at=now,
+    )
+
+
+def _measure(sessions: int, build: Callable[[dict[str, Any], float], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    now = time.time()
+    store: dict[str, Any] = {}
+    for index in range(sessions):
+        store[f"session-{index:08d}"] = build(_token_response(index), now)
+    gc.collect()
+    used, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return used
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare per-session memory of token record layouts.")
+    parser.add_argument("--sessions", type=int, default=1_000_000, help="Number of sessions to hold in memory.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    sessions = max(1, args.sessions)
+
+    results = {
+        "dict": _measure(sessions, _dict_layout),
+        "TokenRecord": _measure(sessions, _record_layout),
+    }
+    baseline = results["dict"]
+    for name, used in results.items():
+        print(
+            f"{name:<12} sessions={sessions} total={used / 2**20:.1f}MiB "
+            f"per_session={used / sessions:.0f}B vs_dict={used / baseline:.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,14 @@
+import asyncio
+
+import httpx
+import pytest
 from fastapi.testclient import TestClient
 
 import app.api.routes.auth_spotify as auth_route
+import app.services.spotify_oauth as spotify_oauth
 from app.core.config import Settings
 from app.main import app
+from app.services.token_store import MemoryTokenStore
 
 client = TestClient(app)
 
@@ -52,3 +58,91 @@ def test_api_logout_alias_clears_session_cookie() -> None:
     assert response.status_code == 204
     set_cookie_header = response.headers.get("set-cookie", "")
     assert "spotify_session_id=" in set_cookie_header
+
+
+def test_callback_exchanges_code_without_blocking(monkeypatch) -> None:
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", MemoryTokenStore())
+    spotify_oauth.store_pending_auth(state="state-123", session_id="session-123", verifier="verifier-123")
+    state: dict[str, object] = {}
+
+    async def fake_exchange_code_for_tokens_async(**kwargs) -> dict:
+        state.update(kwargs)
+        return {"access_token": "access-123", "refresh_token": "refresh-123", "expires_in": 3600}
+
+    monkeypatch.setattr(auth_route, "exchange_code_for_tokens_async", fake_exchange_code_for_tokens_async)
+
+    response = client.get(
+        "/auth/spotify/callback?code=abc123&state=state-123",
+        cookies={auth_route.SESSION_COOKIE_NAME: "session-123", auth_route.STATE_COOKIE_NAME: "state-123"},
+        follow_redirects=False,
+    )
+
+    assert response.status_code == 302
+    assert response.headers["location"] == "/"
+    assert state["code"] == "abc123"
+    assert state["code_verifier"] == "verifier-123"
+    assert spotify_oauth.get_tokens("session-123").access_token == "access-123"
+
+
+def test_exchange_code_for_tokens_async_limits_concurrency(monkeypatch) -> None:
+    state = {"active": 0, "max_active": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        assert b"grant_type=authorization_code" in request.content
+        return httpx.Response(200, json={"access_token": "access-123"})
+
+    async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(spotify_oauth, "get_async_http_client", lambda url: async_client)
+    monkeypatch.setattr(
+        spotify_oauth,
+        "settings",
+        Settings(
+            spotify_client_id="client-123",
+            spotify_redirect_uri="http://127.0.0.1:8000/auth/spotify/callback",
+            spotify_scopes="user-read-private",
+            spotify_authorize_url="https://accounts.spotify.com/authorize",
+            spotify_token_url="https://accounts.spotify.com/api/token",
+            oauth_exchange_concurrency=2,
+        ),
+    )
+
+    async def exchange_many() -> list[dict]:
+        return await asyncio.gather(
+            *(
+                spotify_oauth.exchange_code_for_tokens_async(
+                    token_url="https://accounts.spotify.com/api/token",
+                    client_id="client-123",
+                    code=f"code-{index}",
+                    redirect_uri="http://127.0.0.1:8000/auth/spotify/callback",
+                    code_verifier="verifier-123",
+                )
+                for index in range(6)
+            )
+        )
+
+    results = asyncio.run(exchange_many())
+
+    assert results == [{"access_token": "access-123"}] * 6
+    assert state["max_active"] == 2
+
+
+def test_exchange_code_for_tokens_async_raises_on_error_response(monkeypatch) -> None:
+    async_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(400, json={"error": "invalid_grant"}))
+    )
+    monkeypatch.setattr(spotify_oauth, "get_async_http_client", lambda url: async_client)
+
+    with pytest.raises(ValueError, match="invalid_grant"):
+        asyncio.run(
+            spotify_oauth.exchange_code_for_tokens_async(
+                token_url="https://accounts.spotify.com/api/token",
+                client_id="client-123",
+                code="bad-code",
+                redirect_uri="http://127.0.0.1:8000/auth/spotify/callback",
+                code_verifier="verifier-123",
+            )
+        )
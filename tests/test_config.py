@@ -1,6 +1,10 @@
+import os
+
+import pytest
 from fastapi.testclient import TestClient
 
 import app.api.routes.config as config_route
+import app.core.config as config_module
 from app.core.config import Settings
 from app.main import app
 
@@ -71,3 +75,78 @@ def test_api_config_uses_default_scopes_when_missing(monkeypatch) -> None:
         "user-read-private user-read-email playlist-modify-private "
         "playlist-modify-public user-library-read user-library-modify"
     )
+
+
+@pytest.fixture
+def env_file(monkeypatch, tmp_path):
+    path = tmp_path / ".env"
+    monkeypatch.setattr(config_module, "ENV_FILE_PATH", path)
+    yield path
+    monkeypatch.undo()
+    config_module.reload_settings()
+
+
+def test_settings_reload_when_env_file_changes(monkeypatch, env_file) -> None:
+    env_file.write_text("SPOTIFY_CLIENT_ID=client-123\nHTTP_TIMEOUT_SECONDS=7.5\nSPOTIFY_MAX_RETRIES=oops\n")
+    monkeypatch.setattr(config_module, "CONFIG_RELOAD_CHECK_SECONDS", 0.0)
+    for key in ("SPOTIFY_CLIENT_ID", "CLIENT_ID", "HTTP_TIMEOUT_SECONDS", "SPOTIFY_MAX_RETRIES"):
+        monkeypatch.delenv(key, raising=False)
+    config_module.reload_settings()
+
+    first = config_module.get_settings()
+    assert first.spotify_client_id == "client-123"
+    assert first.http_timeout_seconds == 7.5
+    assert first.spotify_max_retries == 3
+    assert config_module.get_settings() is first
+
+    env_file.write_text("CLIENT_ID=client-456\nHTTP_TIMEOUT_SECONDS=9\n")
+    stat = env_file.stat()
+    os.utime(env_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert config_module.settings.spotify_client_id == "client-456"
+    assert config_module.settings.http_timeout_seconds == 9.0
+
+    monkeypatch.setenv("HTTP_TIMEOUT_SECONDS", "11")
+    assert config_module.reload_settings().http_timeout_seconds == 11.0
+
+
+def test_env_file_is_parsed_once_per_change(monkeypatch, env_file) -> None:
+    env_file.write_text("# comment\nSPOTIFY_SCOPES='user-read-private'  # inline\nSPOTIFY_SCOPES=ignored\n")
+    monkeypatch.delenv("SPOTIFY_SCOPES", raising=False)
+    calls = {"parse": 0}
+    parse_env_file = config_module._parse_env_file
+
+    def counting_parse_env_file(path):
+        calls["parse"] += 1
+        return parse_env_file(path)
+
+    monkeypatch.setattr(config_module, "_parse_env_file", counting_parse_env_file)
+    config_module.reload_settings()
+
+    settings = config_module.load_settings()
+
+    assert settings.spotify_scopes == "user-read-private"
+    assert calls["parse"] == 1
+
+
+def test_api_config_serves_cached_bytes_and_revalidates(monkeypatch) -> None:
+    monkeypatch.setattr(config_route, "settings", Settings(spotify_client_id="client-123"))
+    config_route._encoded_public_config.cache_clear()
+
+    first = client.get("/api/config")
+    second = client.get("/api/config")
+    revalidated = client.get("/api/config", headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == config_route.CONFIG_CACHE_CONTROL
+    assert first.headers["etag"] == second.headers["etag"]
+    assert config_route._encoded_public_config.cache_info().misses == 1
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+    monkeypatch.setattr(config_route, "settings", Settings(spotify_client_id="client-456"))
+    changed = client.get("/api/config", headers={"If-None-Match": first.headers["etag"]})
+
+    assert changed.status_code == 200
+    assert changed.json()["spotify_client_id"] == "client-456"
+    assert changed.headers["etag"] != first.headers["etag"]
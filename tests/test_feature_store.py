@@ -1,10 +1,21 @@
 import json
 import sqlite3
+import threading
+import time
 from urllib.error import URLError
 
+import pytest
+
 import app.services.feature_store as feature_store
 
 
+@pytest.fixture(autouse=True)
+def _close_feature_store_connections():
+    yield
+    feature_store.close_db_connections()
+    feature_store.L1_CACHE.clear()
+
+
 class _FakeResponse:
     def __init__(self, payload: dict) -> None:
         self._payload = payload
@@ -117,6 +128,8 @@ def test_get_track_features_returns_stale_cache_when_refresh_fails(monkeypatch,
             (feature_store._epoch_seconds() - 1, mbid),
         )
         conn.commit()
+    # The in-process tier would otherwise keep serving the row until its own TTL lapses.
+    feature_store.L1_CACHE.clear()
 
     stale = feature_store.get_track_features(mbid)
     assert stale == initial
@@ -126,3 +139,309 @@ def test_get_track_features_returns_stale_cache_when_refresh_fails(monkeypatch,
 
     assert row is not None
     assert int(row[0]) > feature_store._epoch_seconds()
+
+
+def test_get_isrcs_from_spotify_tracks_batches_misses(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    batches: list[list[str]] = []
+
+    def fake_get_tracks(access_token: str, track_ids: list[str]) -> dict:
+        assert access_token == "access-123"
+        batches.append(list(track_ids))
+        return {
+            track_id: {"id": track_id, "external_ids": {"isrc": f"us{track_id}"}}
+            for track_id in track_ids
+            if track_id != "t7"
+        }
+
+    monkeypatch.setattr(feature_store, "get_tracks", fake_get_tracks)
+    track_ids = [f"t{index}" for index in range(120)]
+
+    first = feature_store.get_isrcs_from_spotify_tracks(track_ids, "access-123")
+    second = feature_store.get_isrcs_from_spotify_tracks(track_ids + ["t7"], "access-123")
+
+    assert [len(batch) for batch in batches] == [50, 50, 20]
+    assert first["t0"] == "UST0"
+    assert first["t7"] is None
+    assert second == first
+
+
+def test_db_connection_is_reused_per_thread_with_wal(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    connects: list[str] = []
+    real_connect = sqlite3.connect
+
+    def counting_connect(*args, **kwargs):
+        connects.append(threading.current_thread().name)
+        return real_connect(*args, **kwargs)
+
+    monkeypatch.setattr(feature_store.sqlite3, "connect", counting_connect)
+
+    with feature_store._db_connection() as first:
+        journal_mode = first.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = first.execute("PRAGMA synchronous").fetchone()[0]
+    with feature_store._db_connection() as second:
+        pass
+
+    other_thread_conns: list[sqlite3.Connection] = []
+
+    def use_connection() -> None:
+        with feature_store._db_connection() as conn:
+            other_thread_conns.append(conn)
+
+    worker = threading.Thread(target=use_connection)
+    worker.start()
+    worker.join()
+
+    assert first is second
+    assert journal_mode == "wal"
+    assert synchronous == 1
+    assert len(connects) == 2
+    assert other_thread_conns[0] is not first
+
+
+def test_db_connection_is_closed_when_its_thread_exits(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    other_thread_conns: list[sqlite3.Connection] = []
+
+    def use_connection() -> None:
+        with feature_store._db_connection() as conn:
+            other_thread_conns.append(conn)
+
+    worker = threading.Thread(target=use_connection)
+    worker.start()
+    worker.join()
+    del worker
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        other_thread_conns[0].execute("SELECT 1")
+    assert len(feature_store._DB_THREAD_CONNECTIONS) == 0
+
+
+def test_track_features_hits_are_served_from_l1(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    mbid = "123e4567-e89b-12d3-a456-426614174000"
+    monkeypatch.setattr(
+        feature_store,
+        "urlopen",
+        lambda request, timeout=15: _FakeResponse({"id": mbid, "title": "Song A", "tags": [{"name": "indie"}]}),
+    )
+    first = feature_store.get_track_features(mbid)
+
+    def fail_decode(row):
+        raise AssertionError("L1 hit should not decode the SQLite row")
+
+    monkeypatch.setattr(feature_store, "_decode_track_features_row", fail_decode)
+    second = feature_store.get_track_features(mbid)
+
+    assert second == first
+    assert feature_store.L1_CACHE.hits == 1
+    assert feature_store.L1_CACHE.misses == 1
+
+
+def test_track_features_from_l1_cannot_be_edited_by_callers(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    mbid = "123e4567-e89b-12d3-a456-426614174000"
+    monkeypatch.setattr(
+        feature_store,
+        "urlopen",
+        lambda request, timeout=15: _FakeResponse({"id": mbid, "title": "Song A", "tags": [{"name": "indie"}]}),
+    )
+    first = feature_store.get_track_features(mbid)
+    expected = json.loads(json.dumps(first))
+    first["tags"].append({"name": "edited on the miss"})
+    second = feature_store.get_track_features(mbid)
+    second["metadata"]["title"] = "edited on the hit"
+
+    assert feature_store.get_track_features(mbid) == expected
+    assert expected["metadata"]["title"] == "Song A"
+
+
+def test_l1_entries_do_not_outlive_the_row(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    now = feature_store._epoch_seconds()
+
+    feature_store._l1_put("isrc_to_mbid", "USABC1234567", "mbid-1", now - 1)
+    feature_store._l1_put("isrc_to_mbid", "USABC7654321", "mbid-2", now + 60)
+
+    assert feature_store._l1_get("isrc_to_mbid", "USABC1234567") == (False, None)
+    assert feature_store._l1_get("isrc_to_mbid", "USABC7654321") == (True, "mbid-2")
+
+
+def test_resolve_features_batch_reads_each_stage_in_bulk(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    mbid = "123e4567-e89b-12d3-a456-426614174000"
+    upstream: list[str] = []
+
+    def fake_get_tracks(access_token: str, track_ids: list[str]) -> dict:
+        upstream.append("spotify")
+        isrcs = {"t1": "usaaa0000001", "t2": "usbbb0000002"}
+        return {track_id: {"id": track_id, "external_ids": {"isrc": isrcs.get(track_id)}} for track_id in track_ids}
+
+    def fake_urlopen(request, timeout=15):
+        upstream.append(request.full_url)
+        if "/isrc/USAAA0000001" in request.full_url:
+            return _FakeResponse({"recordings": [{"id": mbid, "score": 100}]})
+        if "/isrc/" in request.full_url:
+            return _FakeResponse({"recordings": []})
+        return _FakeResponse({"id": mbid, "title": "Song A", "tags": [{"name": "indie", "count": 3}]})
+
+    monkeypatch.setattr(feature_store, "get_tracks", fake_get_tracks)
+    monkeypatch.setattr(feature_store, "urlopen", fake_urlopen)
+
+    first = feature_store.resolve_features_batch(["t1", "t2", "t3"], "access-123")
+
+    assert len(upstream) == 4
+    assert first["t1"]["isrc"] == "USAAA0000001"
+    assert first["t1"]["mbid"] == mbid
+    assert first["t1"]["features"]["metadata"]["title"] == "Song A"
+    assert first["t2"] == {"isrc": "USBBB0000002", "mbid": None, "features": None}
+    assert first["t3"] == {"isrc": None, "mbid": None, "features": None}
+
+    feature_store.L1_CACHE.clear()
+    statements: list[str] = []
+    with feature_store._db_connection() as conn:
+        conn.set_trace_callback(statements.append)
+    second = feature_store.resolve_features_batch(["t1", "t2", "t3"], "access-123")
+
+    assert second == first
+    assert len(upstream) == 4
+    assert sum(statement.lstrip().startswith("SELECT") for statement in statements) == 3
+
+
+def test_musicbrainz_worker_dedupes_keys_and_runs_interactive_first() -> None:
+    worker = feature_store._MusicBrainzWorker()
+    gate = threading.Event()
+    order: list[str] = []
+
+    def job(name: str):
+        def run() -> str:
+            order.append(name)
+            return name
+
+        return run
+
+    worker.submit("gate", lambda: gate.wait(timeout=1), feature_store.MUSICBRAINZ_PRIORITY_INTERACTIVE)
+    warm = worker.submit("warm", job("warm"), feature_store.MUSICBRAINZ_PRIORITY_WARM)
+    first = worker.submit("isrc", job("isrc"), feature_store.MUSICBRAINZ_PRIORITY_WARM)
+    joined = worker.submit("isrc", job("duplicate"), feature_store.MUSICBRAINZ_PRIORITY_INTERACTIVE)
+    gate.set()
+
+    assert joined is first
+    assert first.result(timeout=1) == "isrc"
+    assert warm.result(timeout=1) == "warm"
+    assert order == ["isrc", "warm"]
+    assert worker.pending() == 0
+
+
+def test_warm_mbids_from_isrcs_caches_in_the_background(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    state = {"calls": 0}
+
+    def fake_urlopen(request, timeout=15):
+        state["calls"] += 1
+        return _FakeResponse({"recordings": [{"id": "00000000-0000-0000-0000-000000000001", "score": 100}]})
+
+    monkeypatch.setattr(feature_store, "urlopen", fake_urlopen)
+
+    assert feature_store.warm_mbids_from_isrcs(["usabc1234567", "USABC1234567"]) == 1
+
+    deadline = time.monotonic() + 2
+    while not feature_store._l1_get("isrc_to_mbid", "USABC1234567")[0] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert feature_store.mbid_from_isrc("USABC1234567") == "00000000-0000-0000-0000-000000000001"
+    assert feature_store.warm_mbids_from_isrcs(["USABC1234567"]) == 0
+    assert state["calls"] == 1
+
+
+def test_batch_mbid_lookup_gives_up_at_deadline_and_caches_late_results(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    submitted: list[int] = []
+    real_submit = feature_store._submit_mbid_fetch
+
+    def recording_submit(isrc: str, priority: int = feature_store.MUSICBRAINZ_PRIORITY_INTERACTIVE):
+        submitted.append(priority)
+        return real_submit(isrc, priority)
+
+    def slow_urlopen(request, timeout=15):
+        time.sleep(0.3)
+        return _FakeResponse({"recordings": [{"id": "00000000-0000-0000-0000-000000000001", "score": 100}]})
+
+    monkeypatch.setattr(feature_store, "urlopen", slow_urlopen)
+    monkeypatch.setattr(feature_store, "_submit_mbid_fetch", recording_submit)
+    monkeypatch.setattr(feature_store, "MUSICBRAINZ_BATCH_TIMEOUT_SECONDS", 0.05)
+
+    started = time.monotonic()
+    assert feature_store._mbids_from_isrcs(["USABC1234567"]) == {"USABC1234567": None}
+    assert time.monotonic() - started < 0.25
+    assert submitted == [feature_store.MUSICBRAINZ_PRIORITY_BATCH]
+    assert (
+        feature_store.MUSICBRAINZ_PRIORITY_INTERACTIVE
+        < feature_store.MUSICBRAINZ_PRIORITY_BATCH
+        < feature_store.MUSICBRAINZ_PRIORITY_WARM
+    )
+
+    deadline = time.monotonic() + 2
+    while not feature_store._l1_get("isrc_to_mbid", "USABC1234567")[0] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert feature_store._mbids_from_isrcs(["USABC1234567"]) == {
+        "USABC1234567": "00000000-0000-0000-0000-000000000001"
+    }
+
+
+def test_concurrent_mbid_misses_share_one_fetch_and_write(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    state = {"calls": 0, "writes": 0}
+    real_upsert = feature_store._upsert_isrc_to_mbid
+
+    def slow_urlopen(request, timeout=15):
+        state["calls"] += 1
+        time.sleep(0.05)
+        return _FakeResponse({"recordings": [{"id": "00000000-0000-0000-0000-000000000001", "score": 100}]})
+
+    def counting_upsert(*args, **kwargs) -> None:
+        state["writes"] += 1
+        real_upsert(*args, **kwargs)
+
+    monkeypatch.setattr(feature_store, "urlopen", slow_urlopen)
+    monkeypatch.setattr(feature_store, "_upsert_isrc_to_mbid", counting_upsert)
+    results: list[str | None] = []
+    threads = [
+        threading.Thread(target=lambda: results.append(feature_store.mbid_from_isrc("USABC1234567")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["00000000-0000-0000-0000-000000000001"] * 5
+    assert state == {"calls": 1, "writes": 1}
+
+
+def test_concurrent_spotify_track_misses_share_one_fetch(monkeypatch, tmp_path) -> None:
+    _configure_env(monkeypatch, tmp_path)
+    state = {"calls": 0}
+
+    def slow_get_track(access_token: str, track_id: str) -> dict:
+        state["calls"] += 1
+        time.sleep(0.05)
+        return {"id": track_id, "external_ids": {"isrc": "usabc1234567"}}
+
+    monkeypatch.setattr(feature_store, "get_track", slow_get_track)
+    results: list[str | None] = []
+    threads = [
+        threading.Thread(
+            target=lambda token=token: results.append(feature_store.get_isrc_from_spotify_track("track-123", token))
+        )
+        for token in ("access-1", "access-2", "access-3")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["USABC1234567"] * 3
+    assert state["calls"] == 1
@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 
+import app.services.spotify_oauth as spotify_oauth
 from app.main import app
+from app.services.token_store import MemoryTokenStore
 
 client = TestClient(app)
 
@@ -10,3 +12,19 @@ def test_health_route_returns_ok() -> None:
 
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_health_metrics_reports_token_store_size(monkeypatch) -> None:
+    store = MemoryTokenStore(max_entries=10)
+    store.put("tokens", "session-1", {"token_data": {}})
+    store.put("pending_auth", "state-1", {"verifier": "v"}, ttl_seconds=600)
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", store)
+
+    response = client.get("/health/metrics")
+
+    assert response.status_code == 200
+    token_store = response.json()["token_store"]
+    assert token_store["entries"] == 2
+    assert token_store["entries_by_namespace"] == {"tokens": 1, "pending_auth": 1}
+    assert token_store["max_entries"] == 10
+    assert "hits" in response.json()["response_cache"]
@@ -0,0 +1,18 @@
+import app.services.http_pool as http_pool
+
+
+def test_get_http_client_reuses_pool_per_host() -> None:
+    http_pool.close_http_clients()
+
+    first = http_pool.get_http_client("https://api.spotify.com/v1/me")
+    second = http_pool.get_http_client("https://api.spotify.com/v1/me/playlists?limit=10")
+    other_host = http_pool.get_http_client("https://accounts.spotify.com/api/token")
+
+    assert first is second
+    assert other_host is not first
+
+    http_pool.close_http_clients()
+
+    assert first.is_closed
+    assert http_pool.get_http_client("https://api.spotify.com/v1/me") is not first
+    http_pool.close_http_clients()
@@ -1,42 +1,55 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from urllib.parse import parse_qs, urlparse
 
-import app.api.routes.me as me_route
+import app.services.spotify_api as spotify_api
 import app.services.spotify_client as spotify_client
+import app.services.spotify_client_async as spotify_client_async
+import app.services.spotify_oauth as spotify_oauth
+from app.api.dependencies import SESSION_COOKIE_NAME, get_spotify_session
 from app.main import app
+from app.services.response_cache import ResponseCache
+from app.services.token_store import MemoryTokenStore, TokenRecord
 
 client = TestClient(app)
 
 
+def _override_spotify_session(monkeypatch, **methods) -> None:
+    session = SimpleNamespace(session_id="session-123", **methods)
+    monkeypatch.setitem(app.dependency_overrides, get_spotify_session, lambda: session)
+
+
 def test_api_me_returns_profile(monkeypatch) -> None:
-    monkeypatch.setattr(
-        me_route,
-        "get_current_user_for_session",
-        lambda session_id: {"display_name": "Test User"},
-    )
+    async def fake_get_current_user() -> dict:
+        return {"display_name": "Test User"}
 
-    response = client.get("/api/me", cookies={me_route.SESSION_COOKIE_NAME: "session-123"})
+    _override_spotify_session(monkeypatch, get_current_user=fake_get_current_user)
+
+    response = client.get("/api/me", cookies={SESSION_COOKIE_NAME: "session-123"})
 
     assert response.status_code == 200
     assert response.json() == {"display_name": "Test User"}
 
 
 def test_api_me_playlists_returns_payload(monkeypatch) -> None:
-    monkeypatch.setattr(
-        me_route,
-        "get_my_playlists_for_session",
-        lambda session_id, limit, offset: {
+    async def fake_get_my_playlists(limit: int, offset: int) -> dict:
+        return {
             "items": [{"name": "Road Trip", "owner": {"display_name": "Test User"}}],
             "limit": limit,
             "offset": offset,
             "total": 1,
-        },
-    )
+        }
+
+    _override_spotify_session(monkeypatch, get_my_playlists=fake_get_my_playlists)
 
     response = client.get(
         "/api/me/playlists?limit=10&offset=0",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
     )
 
     assert response.status_code == 200
@@ -48,31 +61,140 @@ def test_api_me_playlists_returns_payload(monkeypatch) -> None:
     }
 
 
-def test_api_me_playlists_rejects_limit_above_10() -> None:
+def test_api_me_dashboard_fetches_landing_data_concurrently(monkeypatch) -> None:
+    started: list[str] = []
+    all_started = asyncio.Event()
+
+    async def wait_for_siblings(name: str) -> None:
+        started.append(name)
+        if len(started) == 3:
+            all_started.set()
+        # Each call only finishes once every call has started, so a sequential fetch would hang.
+        await asyncio.wait_for(all_started.wait(), timeout=1)
+
+    async def fake_access_token() -> str:
+        return "access-123"
+
+    async def fake_get_current_user() -> dict:
+        await wait_for_siblings("profile")
+        return {"display_name": "Test User"}
+
+    async def fake_get_my_playlists(limit: int, offset: int) -> dict:
+        await wait_for_siblings("playlists")
+        return {"items": [], "limit": limit, "offset": offset, "total": 0}
+
+    async def fake_get_saved_tracks(limit: int, offset: int) -> dict:
+        await wait_for_siblings("library")
+        return {"items": [{}], "limit": limit, "offset": offset, "total": 42}
+
+    _override_spotify_session(
+        monkeypatch,
+        access_token=fake_access_token,
+        get_current_user=fake_get_current_user,
+        get_my_playlists=fake_get_my_playlists,
+        get_saved_tracks=fake_get_saved_tracks,
+    )
+
+    response = client.get("/api/me/dashboard", cookies={SESSION_COOKIE_NAME: "session-123"})
+
+    assert response.status_code == 200
+    assert sorted(started) == ["library", "playlists", "profile"]
+    assert response.json() == {
+        "profile": {"display_name": "Test User"},
+        "playlists": {"items": [], "limit": 50, "offset": 0, "total": 0},
+        "playlists_error": None,
+        "library": {"saved_tracks_total": 42},
+    }
+
+
+def test_api_me_dashboard_tolerates_library_failure(monkeypatch) -> None:
+    async def fake_access_token() -> str:
+        return "access-123"
+
+    async def fake_get_current_user() -> dict:
+        return {"display_name": "Test User"}
+
+    async def fake_get_my_playlists(limit: int, offset: int) -> dict:
+        return {"items": [], "limit": limit, "offset": offset, "total": 0}
+
+    async def fake_get_saved_tracks(limit: int, offset: int) -> dict:
+        raise spotify_client.SpotifyClientError(status_code=403, message="Insufficient client scope")
+
+    _override_spotify_session(
+        monkeypatch,
+        access_token=fake_access_token,
+        get_current_user=fake_get_current_user,
+        get_my_playlists=fake_get_my_playlists,
+        get_saved_tracks=fake_get_saved_tracks,
+    )
+
+    response = client.get("/api/me/dashboard", cookies={SESSION_COOKIE_NAME: "session-123"})
+
+    assert response.status_code == 200
+    assert response.json()["library"] is None
+    assert response.json()["profile"] == {"display_name": "Test User"}
+
+
+def test_api_me_dashboard_tolerates_playlists_failure(monkeypatch) -> None:
+    async def fake_access_token() -> str:
+        return "access-123"
+
+    async def fake_get_current_user() -> dict:
+        return {"display_name": "Test User"}
+
+    async def fake_get_my_playlists(limit: int, offset: int) -> dict:
+        raise spotify_client.SpotifyClientError(status_code=503, message="Service unavailable")
+
+    async def fake_get_saved_tracks(limit: int, offset: int) -> dict:
+        return {"items": [], "limit": limit, "offset": offset, "total": 3}
+
+    _override_spotify_session(
+        monkeypatch,
+        access_token=fake_access_token,
+        get_current_user=fake_get_current_user,
+        get_my_playlists=fake_get_my_playlists,
+        get_saved_tracks=fake_get_saved_tracks,
+    )
+
+    response = client.get("/api/me/dashboard", cookies={SESSION_COOKIE_NAME: "session-123"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "profile": {"display_name": "Test User"},
+        "playlists": None,
+        "playlists_error": {"status": 503, "message": "Service unavailable"},
+        "library": {"saved_tracks_total": 3},
+    }
+
+
+def test_api_me_playlists_rejects_limit_above_coalesced_max() -> None:
     response = client.get(
-        "/api/me/playlists?limit=11&offset=0",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        "/api/me/playlists?limit=201&offset=0",
+        cookies={SESSION_COOKIE_NAME: "session-123"},
     )
 
     assert response.status_code == 422
 
 
 def test_api_me_playlist_items_returns_payload(monkeypatch) -> None:
-    monkeypatch.setattr(
-        me_route,
-        "get_playlist_items_for_session",
-        lambda session_id, playlist_id, limit, offset: {
+    async def fake_get_playlist_items(
+        playlist_id: str,
+        limit: int,
+        offset: int,
+    ) -> dict:
+        return {
             "items": [{"track": {"name": "Song A", "type": "track"}}],
             "limit": limit,
             "offset": offset,
             "total": 1,
             "href": f"/v1/playlists/{playlist_id}/items",
-        },
-    )
+        }
+
+    _override_spotify_session(monkeypatch, get_playlist_items=fake_get_playlist_items)
 
     response = client.get(
         "/api/me/playlists/playlist-123/items?limit=25&offset=0",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
     )
 
     assert response.status_code == 200
@@ -86,18 +208,18 @@ def test_api_me_playlist_items_returns_payload(monkeypatch) -> None:
 
 
 def test_api_me_playlist_items_maps_non_auth_error_status(monkeypatch) -> None:
-    def raise_request_error(*args, **kwargs):
+    async def raise_request_error(*args, **kwargs):
         raise spotify_client.SpotifyClientError(
             status_code=403,
             message="Forbidden",
             auth_error=False,
         )
 
-    monkeypatch.setattr(me_route, "get_playlist_items_for_session", raise_request_error)
+    _override_spotify_session(monkeypatch, get_playlist_items=raise_request_error)
 
     response = client.get(
         "/api/me/playlists/playlist-123/items?limit=25&offset=0",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
     )
 
     assert response.status_code == 403
@@ -105,22 +227,21 @@ def test_api_me_playlist_items_maps_non_auth_error_status(monkeypatch) -> None:
 
 
 def test_api_search_returns_payload(monkeypatch) -> None:
-    monkeypatch.setattr(
-        me_route,
-        "search_tracks_for_session",
-        lambda session_id, query, limit, offset: {
+    async def fake_search_tracks(query: str, limit: int, offset: int) -> dict:
+        return {
             "tracks": {
                 "items": [{"name": "Song A", "uri": "spotify:track:abc"}],
                 "limit": limit,
                 "offset": offset,
                 "total": 1,
             }
-        },
-    )
+        }
+
+    _override_spotify_session(monkeypatch, search_tracks=fake_search_tracks)
 
     response = client.get(
         "/api/search?q=song&type=track&limit=10&offset=0",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
     )
 
     assert response.status_code == 200
@@ -137,37 +258,35 @@ def test_api_search_returns_payload(monkeypatch) -> None:
 def test_api_search_requires_type_track() -> None:
     response = client.get(
         "/api/search?q=song&type=artist&limit=10&offset=0",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
     )
 
     assert response.status_code == 422
 
 
-def test_api_search_rejects_limit_above_10() -> None:
+def test_api_search_rejects_limit_above_coalesced_max() -> None:
     response = client.get(
-        "/api/search?q=song&type=track&limit=11&offset=0",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        "/api/search?q=song&type=track&limit=201&offset=0",
+        cookies={SESSION_COOKIE_NAME: "session-123"},
     )
 
     assert response.status_code == 422
 
 
 def test_api_add_playlist_items_returns_payload(monkeypatch) -> None:
-    def fake_add_items_to_playlist_for_session(
-        session_id: str,
+    async def fake_add_items_to_playlist(
         playlist_id: str,
         uris: list[str],
     ) -> dict:
-        assert session_id == "session-123"
         assert playlist_id == "playlist-123"
         assert uris == ["spotify:track:abc", "spotify:track:def"]
         return {"snapshot_id": "snap-1"}
 
-    monkeypatch.setattr(me_route, "add_items_to_playlist_for_session", fake_add_items_to_playlist_for_session)
+    _override_spotify_session(monkeypatch, add_items_to_playlist=fake_add_items_to_playlist)
 
     response = client.post(
         "/api/playlists/playlist-123/items",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"uris": [" spotify:track:abc ", "spotify:track:def"]},
     )
 
@@ -188,7 +307,7 @@ def test_api_add_playlist_items_requires_session_cookie() -> None:
 def test_api_add_playlist_items_rejects_empty_uris() -> None:
     response = client.post(
         "/api/playlists/playlist-123/items",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"uris": ["   "]},
     )
 
@@ -197,18 +316,18 @@ def test_api_add_playlist_items_rejects_empty_uris() -> None:
 
 
 def test_api_add_playlist_items_maps_non_auth_error_status(monkeypatch) -> None:
-    def raise_request_error(*args, **kwargs):
+    async def raise_request_error(*args, **kwargs):
         raise spotify_client.SpotifyClientError(
             status_code=404,
             message="Playlist not found",
             auth_error=False,
         )
 
-    monkeypatch.setattr(me_route, "add_items_to_playlist_for_session", raise_request_error)
+    _override_spotify_session(monkeypatch, add_items_to_playlist=raise_request_error)
 
     response = client.post(
         "/api/playlists/playlist-123/items",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"uris": ["spotify:track:abc"]},
     )
 
@@ -217,16 +336,15 @@ def test_api_add_playlist_items_maps_non_auth_error_status(monkeypatch) -> None:
 
 
 def test_api_save_to_library_returns_payload(monkeypatch) -> None:
-    def fake_save_to_my_library_for_session(session_id: str, uris: list[str]) -> dict:
-        assert session_id == "session-123"
+    async def fake_save_to_my_library_in_chunks(uris: list[str]) -> dict:
         assert uris == ["spotify:track:abc", "spotify:episode:def"]
         return {"ok": True}
 
-    monkeypatch.setattr(me_route, "save_to_my_library_for_session", fake_save_to_my_library_for_session)
+    _override_spotify_session(monkeypatch, save_to_my_library_in_chunks=fake_save_to_my_library_in_chunks)
 
     response = client.put(
         "/api/library",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"uris": [" spotify:track:abc ", "spotify:episode:def"]},
     )
 
@@ -235,17 +353,16 @@ def test_api_save_to_library_returns_payload(monkeypatch) -> None:
 
 
 def test_api_remove_from_library_returns_payload(monkeypatch) -> None:
-    def fake_remove_from_my_library_for_session(session_id: str, uris: list[str]) -> dict:
-        assert session_id == "session-123"
+    async def fake_remove_from_my_library_in_chunks(uris: list[str]) -> dict:
         assert uris == ["spotify:track:abc"]
         return {"ok": True}
 
-    monkeypatch.setattr(me_route, "remove_from_my_library_for_session", fake_remove_from_my_library_for_session)
+    _override_spotify_session(monkeypatch, remove_from_my_library_in_chunks=fake_remove_from_my_library_in_chunks)
 
     response = client.request(
         "DELETE",
         "/api/library",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"uris": [" spotify:track:abc "]},
     )
 
@@ -263,7 +380,7 @@ def test_api_save_to_library_requires_session_cookie() -> None:
 def test_api_save_to_library_rejects_empty_uris() -> None:
     response = client.put(
         "/api/library",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"uris": ["   "]},
     )
 
@@ -272,18 +389,18 @@ def test_api_save_to_library_rejects_empty_uris() -> None:
 
 
 def test_api_save_to_library_maps_non_auth_error_status(monkeypatch) -> None:
-    def raise_request_error(*args, **kwargs):
+    async def raise_request_error(*args, **kwargs):
         raise spotify_client.SpotifyClientError(
             status_code=403,
             message="Insufficient client scope",
             auth_error=False,
         )
 
-    monkeypatch.setattr(me_route, "save_to_my_library_for_session", raise_request_error)
+    _override_spotify_session(monkeypatch, save_to_my_library_in_chunks=raise_request_error)
 
     response = client.put(
         "/api/library",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"uris": ["spotify:track:abc"]},
     )
 
@@ -293,11 +410,11 @@ def test_api_save_to_library_maps_non_auth_error_status(monkeypatch) -> None:
 
 def test_get_current_user_for_session_refreshes_and_retries(monkeypatch) -> None:
     session_id = "session-123"
-    initial_tokens = {"access_token": "expired-access", "refresh_token": "refresh-123"}
+    initial_tokens = TokenRecord(access_token="expired-access", refresh_token="refresh-123")
     state: dict[str, object] = {"calls": 0, "stored_tokens": None}
 
-    monkeypatch.setattr(spotify_client, "get_tokens", lambda value: initial_tokens if value == session_id else None)
-    monkeypatch.setattr(spotify_client, "clear_tokens", lambda _: None)
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda value: initial_tokens if value == session_id else None)
+    monkeypatch.setattr(spotify_api, "clear_tokens", lambda _: None)
 
     def fake_get_current_user(access_token: str) -> dict:
         state["calls"] = int(state["calls"]) + 1
@@ -320,7 +437,7 @@ def test_get_current_user_for_session_refreshes_and_retries(monkeypatch) -> None
     def fake_store_tokens(session_id: str, token_data: dict) -> None:
         state["stored_tokens"] = (session_id, token_data)
 
-    monkeypatch.setattr(spotify_client, "store_tokens", fake_store_tokens)
+    monkeypatch.setattr(spotify_api, "store_tokens", fake_store_tokens)
 
     profile = spotify_client.get_current_user_for_session(session_id)
 
@@ -334,11 +451,11 @@ def test_get_current_user_for_session_refreshes_and_retries(monkeypatch) -> None
 
 def test_get_my_playlists_for_session_refreshes_and_retries(monkeypatch) -> None:
     session_id = "session-123"
-    initial_tokens = {"access_token": "expired-access", "refresh_token": "refresh-123"}
+    initial_tokens = TokenRecord(access_token="expired-access", refresh_token="refresh-123")
     state: dict[str, object] = {"calls": 0, "stored_tokens": None}
 
-    monkeypatch.setattr(spotify_client, "get_tokens", lambda value: initial_tokens if value == session_id else None)
-    monkeypatch.setattr(spotify_client, "clear_tokens", lambda _: None)
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda value: initial_tokens if value == session_id else None)
+    monkeypatch.setattr(spotify_api, "clear_tokens", lambda _: None)
 
     def fake_get_my_playlists(access_token: str, limit: int = 10, offset: int = 0) -> dict:
         state["calls"] = int(state["calls"]) + 1
@@ -363,7 +480,7 @@ def test_get_my_playlists_for_session_refreshes_and_retries(monkeypatch) -> None
     def fake_store_tokens(session_id: str, token_data: dict) -> None:
         state["stored_tokens"] = (session_id, token_data)
 
-    monkeypatch.setattr(spotify_client, "store_tokens", fake_store_tokens)
+    monkeypatch.setattr(spotify_api, "store_tokens", fake_store_tokens)
 
     payload = spotify_client.get_my_playlists_for_session(session_id, limit=10, offset=20)
 
@@ -409,7 +526,7 @@ def test_get_playlist_items_uses_items_endpoint(monkeypatch) -> None:
 
 
 def test_get_current_user_for_session_fails_when_refresh_token_missing(monkeypatch) -> None:
-    monkeypatch.setattr(spotify_client, "get_tokens", lambda _: {"access_token": "expired-access"})
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="expired-access"))
     monkeypatch.setattr(
         spotify_client,
         "get_current_user",
@@ -423,7 +540,7 @@ def test_get_current_user_for_session_fails_when_refresh_token_missing(monkeypat
     )
     clear_state = {"called": False}
     monkeypatch.setattr(
-        spotify_client,
+        spotify_api,
         "clear_tokens",
         lambda _: clear_state.__setitem__("called", True),
     )
@@ -437,23 +554,21 @@ def test_get_current_user_for_session_fails_when_refresh_token_missing(monkeypat
 
 
 def test_api_create_my_playlist_returns_payload(monkeypatch) -> None:
-    def fake_create_my_playlist_for_session(
-        session_id: str,
+    async def fake_create_my_playlist(
         name: str,
         description: str | None,
         public: bool,
     ) -> dict:
-        assert session_id == "session-123"
         assert name == "Road Trip Mix"
         assert description == "Weekend drive"
         assert public is False
         return {"id": "playlist-1", "name": name}
 
-    monkeypatch.setattr(me_route, "create_my_playlist_for_session", fake_create_my_playlist_for_session)
+    _override_spotify_session(monkeypatch, create_my_playlist=fake_create_my_playlist)
 
     response = client.post(
         "/api/me/playlists",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"name": "  Road Trip Mix  ", "description": "  Weekend drive  ", "public": False},
     )
 
@@ -471,7 +586,7 @@ def test_api_create_my_playlist_requires_session_cookie() -> None:
 def test_api_create_my_playlist_rejects_empty_name() -> None:
     response = client.post(
         "/api/me/playlists",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"name": "   ", "description": "Notes"},
     )
 
@@ -480,18 +595,18 @@ def test_api_create_my_playlist_rejects_empty_name() -> None:
 
 
 def test_api_create_my_playlist_maps_auth_error_to_401(monkeypatch) -> None:
-    def raise_auth_error(*args, **kwargs):
+    async def raise_auth_error(*args, **kwargs):
         raise spotify_client.SpotifyClientError(
             status_code=403,
             message="Token expired",
             auth_error=True,
         )
 
-    monkeypatch.setattr(me_route, "create_my_playlist_for_session", raise_auth_error)
+    _override_spotify_session(monkeypatch, create_my_playlist=raise_auth_error)
 
     response = client.post(
         "/api/me/playlists",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"name": "Road Trip Mix"},
     )
 
@@ -500,18 +615,18 @@ def test_api_create_my_playlist_maps_auth_error_to_401(monkeypatch) -> None:
 
 
 def test_api_create_my_playlist_maps_non_auth_error_status(monkeypatch) -> None:
-    def raise_request_error(*args, **kwargs):
+    async def raise_request_error(*args, **kwargs):
         raise spotify_client.SpotifyClientError(
             status_code=400,
             message="Bad request",
             auth_error=False,
         )
 
-    monkeypatch.setattr(me_route, "create_my_playlist_for_session", raise_request_error)
+    _override_spotify_session(monkeypatch, create_my_playlist=raise_request_error)
 
     response = client.post(
         "/api/me/playlists",
-        cookies={me_route.SESSION_COOKIE_NAME: "session-123"},
+        cookies={SESSION_COOKIE_NAME: "session-123"},
         json={"name": "Road Trip Mix"},
     )
 
@@ -689,11 +804,11 @@ def test_remove_from_my_library_uses_me_library_endpoint(monkeypatch) -> None:
 
 def test_create_my_playlist_for_session_refreshes_and_retries(monkeypatch) -> None:
     session_id = "session-123"
-    initial_tokens = {"access_token": "expired-access", "refresh_token": "refresh-123"}
+    initial_tokens = TokenRecord(access_token="expired-access", refresh_token="refresh-123")
     state: dict[str, object] = {"calls": 0, "stored_tokens": None}
 
-    monkeypatch.setattr(spotify_client, "get_tokens", lambda value: initial_tokens if value == session_id else None)
-    monkeypatch.setattr(spotify_client, "clear_tokens", lambda _: None)
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda value: initial_tokens if value == session_id else None)
+    monkeypatch.setattr(spotify_api, "clear_tokens", lambda _: None)
 
     def fake_create_my_playlist(
         access_token: str,
@@ -724,7 +839,7 @@ def test_create_my_playlist_for_session_refreshes_and_retries(monkeypatch) -> No
     def fake_store_tokens(session_id: str, token_data: dict) -> None:
         state["stored_tokens"] = (session_id, token_data)
 
-    monkeypatch.setattr(spotify_client, "store_tokens", fake_store_tokens)
+    monkeypatch.setattr(spotify_api, "store_tokens", fake_store_tokens)
 
     payload = spotify_client.create_my_playlist_for_session(
         session_id=session_id,
@@ -743,11 +858,11 @@ def test_create_my_playlist_for_session_refreshes_and_retries(monkeypatch) -> No
 
 def test_create_my_playlist_for_session_does_not_refresh_on_403(monkeypatch) -> None:
     session_id = "session-123"
-    initial_tokens = {"access_token": "valid-access", "refresh_token": "refresh-123"}
+    initial_tokens = TokenRecord(access_token="valid-access", refresh_token="refresh-123")
     state: dict[str, bool] = {"refresh_called": False}
 
-    monkeypatch.setattr(spotify_client, "get_tokens", lambda value: initial_tokens if value == session_id else None)
-    monkeypatch.setattr(spotify_client, "clear_tokens", lambda _: None)
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda value: initial_tokens if value == session_id else None)
+    monkeypatch.setattr(spotify_api, "clear_tokens", lambda _: None)
 
     def fake_create_my_playlist(
         access_token: str,
@@ -780,3 +895,182 @@ def test_create_my_playlist_for_session_does_not_refresh_on_403(monkeypatch) ->
     assert exc_info.value.auth_error is False
     assert exc_info.value.message == "Insufficient client scope"
     assert state["refresh_called"] is False
+
+
+def test_spotify_request_json_maps_error_status_from_pooled_client(monkeypatch) -> None:
+    state: dict[str, object] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["url"] = str(request.url)
+        state["authorization"] = request.headers.get("Authorization")
+        return httpx.Response(404, json={"error": {"status": 404, "message": "Not found"}})
+
+    pooled_client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(spotify_client, "get_http_client", lambda url: pooled_client)
+
+    with pytest.raises(spotify_client.SpotifyClientError) as exc_info:
+        spotify_client._spotify_request_json("/v1/tracks/abc", "access-123")
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.message == "Not found"
+    assert exc_info.value.auth_error is False
+    assert state == {
+        "url": "https://api.spotify.com/v1/tracks/abc",
+        "authorization": "Bearer access-123",
+    }
+
+
+def test_request_for_session_refreshes_ahead_of_expiry(monkeypatch) -> None:
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", MemoryTokenStore())
+    spotify_oauth.store_tokens(
+        "session-123",
+        {"access_token": "old-access", "refresh_token": "refresh-123", "expires_in": 30},
+    )
+    state = {"refresh_calls": 0, "tokens_seen": []}
+
+    def fake_refresh_access_token(refresh_token: str) -> dict:
+        state["refresh_calls"] += 1
+        return {"access_token": "new-access", "expires_in": 3600}
+
+    def fake_get_current_user(access_token: str) -> dict:
+        state["tokens_seen"].append(access_token)
+        return {"display_name": "Test User"}
+
+    monkeypatch.setattr(spotify_client, "_refresh_access_token", fake_refresh_access_token)
+    monkeypatch.setattr(spotify_client, "get_current_user", fake_get_current_user)
+
+    first = spotify_client.get_current_user_for_session("session-123")
+    second = spotify_client.get_current_user_for_session("session-123")
+
+    assert first == second == {"display_name": "Test User"}
+    assert state == {"refresh_calls": 1, "tokens_seen": ["new-access", "new-access"]}
+    assert spotify_oauth.get_tokens("session-123").refresh_token == "refresh-123"
+
+
+def test_api_stream_playlist_items_fans_out_pages_in_order(monkeypatch) -> None:
+    calls: list[int] = []
+    token_lookups: list[str] = []
+
+    def fake_get_tokens(session_id: str) -> TokenRecord:
+        token_lookups.append(session_id)
+        return TokenRecord(access_token="access-123")
+
+    async def fake_get_playlist_items(
+        access_token: str,
+        playlist_id: str,
+        limit: int,
+        offset: int,
+    ) -> dict:
+        calls.append(offset)
+        await asyncio.sleep(0.001 * ((230 - offset) // 50))
+        items = [{"track": {"name": f"Song {index}"}} for index in range(offset, min(offset + limit, 230))]
+        return {"items": items, "limit": limit, "offset": offset, "total": 230}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", fake_get_tokens)
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "get_playlist_items", fake_get_playlist_items)
+
+    response = client.get(
+        "/api/me/playlists/playlist-123/items/stream",
+        cookies={SESSION_COOKIE_NAME: "session-123"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["x-total-count"] == "230"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["track"]["name"] for line in lines] == [f"Song {index}" for index in range(230)]
+    assert sorted(calls) == [0, 50, 100, 150, 200]
+    assert token_lookups == ["session-123"]
+
+
+def test_api_stream_playlist_items_reports_mid_stream_error(monkeypatch) -> None:
+    async def fake_get_playlist_items(
+        access_token: str,
+        playlist_id: str,
+        limit: int,
+        offset: int,
+    ) -> dict:
+        if offset > 0:
+            raise spotify_client.SpotifyClientError(status_code=502, message="Spotify API unavailable")
+        return {"items": [{"track": {"name": "Song 0"}}], "limit": 1, "offset": 0, "total": 2}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "get_playlist_items", fake_get_playlist_items)
+
+    response = client.get(
+        "/api/me/playlists/playlist-123/items/stream",
+        cookies={SESSION_COOKIE_NAME: "session-123"},
+    )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {"track": {"name": "Song 0"}},
+        {"error": {"status": 502, "message": "Spotify API unavailable"}},
+    ]
+
+
+def test_api_stream_playlist_items_bypasses_response_cache(monkeypatch) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        offset = int(request.url.params["offset"])
+        limit = int(request.url.params["limit"])
+        items = [{"track": {"name": f"Song {index}"}} for index in range(offset, min(offset + limit, 120))]
+        return httpx.Response(200, json={"items": items, "limit": limit, "offset": offset, "total": 120})
+
+    async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    cache = ResponseCache(max_entries=16)
+    monkeypatch.setattr(spotify_client_async, "get_async_http_client", lambda url: async_client)
+    monkeypatch.setattr(spotify_api, "RESPONSE_CACHE", cache)
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+
+    streamed = client.get(
+        "/api/me/playlists/playlist-123/items/stream",
+        cookies={SESSION_COOKIE_NAME: "session-123"},
+    )
+
+    assert len(streamed.text.splitlines()) == 120
+    assert len(cache) == 0
+
+    paged = client.get(
+        "/api/me/playlists/playlist-123/items?limit=25&offset=0",
+        cookies={SESSION_COOKIE_NAME: "session-123"},
+    )
+
+    assert paged.status_code == 200
+    assert len(cache) == 1
+
+
+def test_api_add_playlist_items_bulk_returns_chunk_report(monkeypatch) -> None:
+    async def fake_add_items_in_chunks(
+        playlist_id: str,
+        uris: list[str],
+        position: int | None,
+    ) -> dict:
+        assert playlist_id == "playlist-123"
+        assert len(uris) == 250
+        assert position is None
+        return {"snapshot_id": "snap-3", "total": 250, "added": 250, "chunks": []}
+
+    _override_spotify_session(monkeypatch, add_items_to_playlist_in_chunks=fake_add_items_in_chunks)
+
+    response = client.post(
+        "/api/playlists/playlist-123/items/bulk",
+        cookies={SESSION_COOKIE_NAME: "session-123"},
+        json={"uris": [f"spotify:track:{index}" for index in range(250)]},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"snapshot_id": "snap-3", "total": 250, "added": 250, "chunks": []}
+
+
+def test_add_items_to_playlist_rejects_more_than_100_uris() -> None:
+    with pytest.raises(spotify_client.SpotifyClientError) as exc_info:
+        spotify_client.add_items_to_playlist(
+            access_token="access-123",
+            playlist_id="playlist-123",
+            uris=[f"spotify:track:{index}" for index in range(101)],
+        )
+
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,87 @@
+import httpx
+import pytest
+
+import app.services.spotify_api as spotify_api
+import app.services.spotify_client as spotify_client
+from app.services.rate_limit import TokenBucket, reset_buckets
+from app.services.response_cache import ResponseCache
+
+
+@pytest.fixture(autouse=True)
+def _reset_shared_buckets():
+    reset_buckets()
+    yield
+    reset_buckets()
+
+
+def test_token_bucket_paces_after_burst() -> None:
+    bucket = TokenBucket(rate_per_second=10, burst=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert 0.05 < bucket.reserve() <= 0.1
+
+
+def test_token_bucket_pause_applies_to_all_callers() -> None:
+    bucket = TokenBucket(rate_per_second=100, burst=10)
+    bucket.pause_for(2)
+
+    assert 1.9 < bucket.reserve() <= 2.0
+
+
+def _install_transport(monkeypatch, handler) -> list[float]:
+    sleeps: list[float] = []
+    pooled_client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(spotify_client, "get_http_client", lambda url: pooled_client)
+    monkeypatch.setattr(spotify_api, "RESPONSE_CACHE", ResponseCache(max_entries=16))
+    monkeypatch.setattr(spotify_client.time, "sleep", lambda seconds: sleeps.append(seconds))
+    return sleeps
+
+
+def test_get_retries_429_honouring_retry_after(monkeypatch) -> None:
+    state = {"calls": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["calls"] += 1
+        if state["calls"] == 1:
+            return httpx.Response(429, headers={"Retry-After": "2"})
+        return httpx.Response(200, json={"display_name": "Test User"})
+
+    sleeps = _install_transport(monkeypatch, handler)
+
+    assert spotify_client.get_current_user("access-123") == {"display_name": "Test User"}
+    assert state["calls"] == 2
+    assert sleeps[0] == 2.0
+
+
+def test_get_gives_up_after_bounded_5xx_retries(monkeypatch) -> None:
+    state = {"calls": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["calls"] += 1
+        return httpx.Response(503, json={"error": {"status": 503, "message": "Service unavailable"}})
+
+    _install_transport(monkeypatch, handler)
+
+    with pytest.raises(spotify_client.SpotifyClientError) as exc_info:
+        spotify_client.search_tracks("access-123", "road trip")
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.message == "Service unavailable"
+    assert state["calls"] == spotify_client.settings.spotify_max_retries + 1
+
+
+def test_mutations_are_not_retried(monkeypatch) -> None:
+    state = {"calls": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["calls"] += 1
+        return httpx.Response(429, headers={"Retry-After": "1"})
+
+    _install_transport(monkeypatch, handler)
+
+    with pytest.raises(spotify_client.SpotifyClientError) as exc_info:
+        spotify_client.create_my_playlist("access-123", "Road Trip Mix")
+
+    assert exc_info.value.status_code == 429
+    assert state["calls"] == 1
@@ -0,0 +1,126 @@
+import httpx
+
+import app.services.spotify_api as spotify_api
+import app.services.spotify_client as spotify_client
+import app.services.spotify_oauth as spotify_oauth
+from app.services.response_cache import ResponseCache
+from app.services.token_store import MemoryTokenStore
+
+
+def test_response_cache_evicts_least_recently_used_entry() -> None:
+    cache = ResponseCache(max_entries=2)
+    cache.put(("s", "/a"), {"a": 1}, None, 60)
+    cache.put(("s", "/b"), {"b": 1}, None, 60)
+    assert cache.get(("s", "/a")) is not None
+
+    cache.put(("s", "/c"), {"c": 1}, None, 60)
+
+    assert cache.get(("s", "/b")) is None
+    assert cache.get(("s", "/a")).payload == {"a": 1}
+    assert len(cache) == 2
+
+
+def test_get_current_user_is_cached_and_revalidated_with_etag(monkeypatch) -> None:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"display_name": "Test User"}, headers={"ETag": '"v1"'})
+
+    pooled_client = httpx.Client(transport=httpx.MockTransport(handler))
+    cache = ResponseCache(max_entries=16)
+    monkeypatch.setattr(spotify_client, "get_http_client", lambda url: pooled_client)
+    monkeypatch.setattr(spotify_api, "RESPONSE_CACHE", cache)
+
+    assert spotify_client.get_current_user("access-123") == {"display_name": "Test User"}
+    assert spotify_client.get_current_user("access-123") == {"display_name": "Test User"}
+    assert len(requests) == 1
+
+    for entry in cache._entries.values():
+        entry.expires_at = 0.0
+
+    assert spotify_client.get_current_user("access-123") == {"display_name": "Test User"}
+    assert len(requests) == 2
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+    assert cache.hits == 1
+
+
+def test_playlist_mutations_invalidate_cached_pages(monkeypatch) -> None:
+    state = {"playlist_reads": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            state["playlist_reads"] += 1
+            return httpx.Response(200, json={"items": [], "total": state["playlist_reads"]})
+        return httpx.Response(201, json={"snapshot_id": "snap-1"})
+
+    pooled_client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(spotify_client, "get_http_client", lambda url: pooled_client)
+    monkeypatch.setattr(spotify_api, "RESPONSE_CACHE", ResponseCache(max_entries=16))
+
+    first = spotify_client.get_my_playlists("access-123")
+    cached = spotify_client.get_my_playlists("access-123")
+    other_session = spotify_client.get_my_playlists("access-456")
+    spotify_client.add_items_to_playlist("access-123", "playlist-1", ["spotify:track:abc"])
+    refetched = spotify_client.get_my_playlists("access-123")
+
+    assert first == cached == {"items": [], "total": 1}
+    assert other_session == {"items": [], "total": 2}
+    assert refetched == {"items": [], "total": 3}
+
+
+def test_get_tracks_chunks_ids_and_reuses_track_cache(monkeypatch) -> None:
+    requested: list[list[str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        track_ids = request.url.params["ids"].split(",")
+        requested.append(track_ids)
+        return httpx.Response(
+            200,
+            json={"tracks": [None if track_id == "t3" else {"id": track_id} for track_id in track_ids]},
+        )
+
+    pooled_client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(spotify_client, "get_http_client", lambda url: pooled_client)
+    monkeypatch.setattr(spotify_api, "RESPONSE_CACHE", ResponseCache(max_entries=512))
+
+    track_ids = [f"t{index}" for index in range(120)]
+    tracks = spotify_client.get_tracks("access-123", track_ids + ["t0"])
+
+    assert [len(batch) for batch in requested] == [50, 50, 20]
+    assert len(tracks) == 119
+    assert "t3" not in tracks
+    assert spotify_client.get_track("access-123", "t42") == {"id": "t42"}
+    assert spotify_client.get_tracks("access-123", ["t1", "t3"]) == {"t1": {"id": "t1"}}
+    assert requested[-1] == ["t3"]
+
+
+def test_session_cache_entries_survive_token_refresh_but_not_a_new_login(monkeypatch) -> None:
+    profile_reads: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        access_token = request.headers["Authorization"].removeprefix("Bearer ")
+        profile_reads.append(access_token)
+        return httpx.Response(200, json={"display_name": access_token.split("-")[0], "images": []})
+
+    pooled_client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(spotify_client, "get_http_client", lambda url: pooled_client)
+    monkeypatch.setattr(spotify_api, "RESPONSE_CACHE", ResponseCache(max_entries=16))
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", MemoryTokenStore())
+
+    spotify_oauth.store_tokens("session-1", {"access_token": "alice-1", "refresh_token": "r"}, new_login=True)
+    first = spotify_client.get_current_user_for_session("session-1")
+    first["images"].append("edited by the caller")
+    # A refreshed token for the same sign-in still hits the cached entry, unedited.
+    spotify_oauth.store_tokens("session-1", {"access_token": "alice-2"})
+    assert spotify_client.get_current_user_for_session("session-1") == {"display_name": "alice", "images": []}
+    assert profile_reads == ["alice-1"]
+
+    # Another account signing in on the same session cookie must not see alice's profile.
+    spotify_oauth.store_tokens("session-1", {"access_token": "bob-1", "refresh_token": "r"}, new_login=True)
+    assert spotify_client.get_current_user_for_session("session-1") == {"display_name": "bob", "images": []}
+    assert profile_reads == ["alice-1", "bob-1"]
+
+    assert spotify_api.invalidate_session_cache("session-1") == 2
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_single_flight_shares_result_between_concurrent_callers() -> None:
+    flights = SingleFlight()
+    state = {"calls": 0}
+    results: list[str] = []
+
+    def slow_refresh() -> str:
+        state["calls"] += 1
+        time.sleep(0.05)
+        return "new-access"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("session-123", slow_refresh)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["new-access"] * 5
+    assert state["calls"] == 1
+    assert flights.in_flight() == 0
+
+
+def test_single_flight_propagates_errors_and_allows_retry() -> None:
+    flights = SingleFlight()
+
+    def failing_call() -> str:
+        raise ValueError("refresh failed")
+
+    with pytest.raises(ValueError, match="refresh failed"):
+        flights.do("session-123", failing_call)
+
+    assert flights.do("session-123", lambda: "ok") == "ok"
+
+
+def test_async_single_flight_survives_leader_cancellation() -> None:
+    flights = AsyncSingleFlight()
+    state = {"calls": 0}
+
+    async def slow_refresh() -> str:
+        state["calls"] += 1
+        await asyncio.sleep(0.05)
+        return "new-access"
+
+    async def scenario() -> str:
+        leader = asyncio.create_task(flights.do("session-123", slow_refresh))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("session-123", slow_refresh))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "new-access"
+    assert state["calls"] == 1
+    assert flights.in_flight() == 0
+
+
+def test_async_single_flight_propagates_errors_and_allows_retry() -> None:
+    flights = AsyncSingleFlight()
+
+    async def failing_call() -> str:
+        raise ValueError("refresh failed")
+
+    async def succeeding_call() -> str:
+        return "ok"
+
+    with pytest.raises(ValueError, match="refresh failed"):
+        asyncio.run(flights.do("session-123", failing_call))
+
+    assert asyncio.run(flights.do("session-123", succeeding_call)) == "ok"
@@ -0,0 +1,449 @@
+import asyncio
+
+import httpx
+import pytest
+
+import app.services.spotify_api as spotify_api
+import app.services.spotify_client as spotify_client
+import app.services.spotify_client_async as spotify_client_async
+import app.services.spotify_oauth as spotify_oauth
+from app.services.token_store import CachedTokenStore, MemoryTokenStore, SQLiteTokenStore, TokenRecord
+
+
+def test_spotify_session_get_current_user_refreshes_and_retries(monkeypatch) -> None:
+    session_id = "session-123"
+    initial_tokens = TokenRecord(access_token="expired-access", refresh_token="refresh-123")
+    state: dict[str, object] = {"calls": 0, "stored_tokens": None}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda value: initial_tokens if value == session_id else None)
+    monkeypatch.setattr(spotify_api, "clear_tokens", lambda _: None)
+
+    async def fake_get_current_user(access_token: str) -> dict:
+        state["calls"] = int(state["calls"]) + 1
+        if state["calls"] == 1:
+            raise spotify_client.SpotifyClientError(
+                status_code=401,
+                message="Expired token",
+                auth_error=True,
+            )
+        assert access_token == "new-access"
+        return {"display_name": "Refreshed User"}
+
+    async def fake_refresh_access_token(refresh_token: str) -> dict:
+        assert refresh_token == "refresh-123"
+        return {"access_token": "new-access", "expires_in": 3600}
+
+    def fake_store_tokens(session_id: str, token_data: dict) -> None:
+        state["stored_tokens"] = (session_id, token_data)
+
+    monkeypatch.setattr(spotify_client_async, "get_current_user", fake_get_current_user)
+    monkeypatch.setattr(spotify_client_async, "_refresh_access_token", fake_refresh_access_token)
+    monkeypatch.setattr(spotify_api, "store_tokens", fake_store_tokens)
+
+    profile = asyncio.run(spotify_client_async.SpotifySession(session_id).get_current_user())
+
+    assert profile == {"display_name": "Refreshed User"}
+    assert state["calls"] == 2
+    assert state["stored_tokens"] == (
+        session_id,
+        {"access_token": "new-access", "refresh_token": "refresh-123", "expires_in": 3600},
+    )
+
+
+def test_search_tracks_uses_async_pooled_client(monkeypatch) -> None:
+    state: dict[str, object] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["method"] = request.method
+        state["url"] = str(request.url)
+        return httpx.Response(200, json={"tracks": {"items": [], "limit": 10, "offset": 0, "total": 0}})
+
+    async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(spotify_client_async, "get_async_http_client", lambda url: async_client)
+
+    payload = asyncio.run(spotify_client_async.search_tracks("access-123", "road trip"))
+
+    assert payload == {"tracks": {"items": [], "limit": 10, "offset": 0, "total": 0}}
+    assert state == {
+        "method": "GET",
+        "url": "https://api.spotify.com/v1/search?q=road+trip&type=track&limit=10&offset=0",
+    }
+
+
+def test_spotify_session_requires_tokens(monkeypatch) -> None:
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: None)
+
+    with pytest.raises(spotify_client.SpotifyClientError) as exc_info:
+        asyncio.run(spotify_client_async.SpotifySession("session-123").get_current_user())
+
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.auth_error is True
+
+
+def test_concurrent_401s_share_one_refresh(monkeypatch) -> None:
+    session_id = "session-123"
+    tokens = {"access_token": "expired-access", "refresh_token": "refresh-123"}
+    state = {"refresh_calls": 0}
+
+    def fake_store_tokens(session_id: str, token_data: dict) -> None:
+        tokens.clear()
+        tokens.update(token_data)
+
+    async def fake_refresh_access_token(refresh_token: str) -> dict:
+        state["refresh_calls"] += 1
+        await asyncio.sleep(0.01)
+        return {"access_token": "new-access"}
+
+    async def fake_get_current_user(access_token: str) -> dict:
+        await asyncio.sleep(0)
+        if access_token != "new-access":
+            raise spotify_client.SpotifyClientError(status_code=401, message="Expired token", auth_error=True)
+        return {"display_name": "Refreshed User"}
+
+    monkeypatch.setattr(
+        spotify_api,
+        "get_tokens",
+        lambda value: TokenRecord(tokens["access_token"], tokens.get("refresh_token")) if value == session_id else None,
+    )
+    monkeypatch.setattr(spotify_api, "store_tokens", fake_store_tokens)
+    monkeypatch.setattr(spotify_api, "clear_tokens", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "_refresh_access_token", fake_refresh_access_token)
+    monkeypatch.setattr(spotify_client_async, "get_current_user", fake_get_current_user)
+
+    async def run_concurrently() -> list[dict]:
+        return await asyncio.gather(
+            *(spotify_client_async.SpotifySession(session_id).get_current_user() for _ in range(5))
+        )
+
+    profiles = asyncio.run(run_concurrently())
+
+    assert profiles == [{"display_name": "Refreshed User"}] * 5
+    assert state["refresh_calls"] == 1
+    assert tokens["refresh_token"] == "refresh-123"
+
+
+def test_refresh_expiring_sessions_renews_only_active_sessions(monkeypatch) -> None:
+    store = MemoryTokenStore()
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", store)
+    spotify_oauth.store_tokens("active", {"access_token": "a-old", "refresh_token": "a-refresh", "expires_in": 10})
+    spotify_oauth.store_tokens("idle", {"access_token": "i-old", "refresh_token": "i-refresh", "expires_in": 10})
+    spotify_oauth.store_tokens("fresh", {"access_token": "f-old", "refresh_token": "f-refresh", "expires_in": 3600})
+    store.get("tokens", "idle").last_used_at = 0
+    refreshed_with: list[str] = []
+
+    async def fake_refresh_access_token(refresh_token: str) -> dict:
+        refreshed_with.append(refresh_token)
+        return {"access_token": "new-access", "expires_in": 3600}
+
+    monkeypatch.setattr(spotify_client_async, "_refresh_access_token", fake_refresh_access_token)
+
+    refreshed = asyncio.run(spotify_client_async.refresh_expiring_sessions())
+
+    assert refreshed == 1
+    assert refreshed_with == ["a-refresh"]
+    assert spotify_oauth.get_tokens("active").access_token == "new-access"
+    assert spotify_oauth.get_tokens("idle").access_token == "i-old"
+
+
+def test_refresh_expiring_sessions_skips_leased_and_recently_failed_sessions(monkeypatch, tmp_path) -> None:
+    path = str(tmp_path / "tokens.db")
+    this_worker = SQLiteTokenStore(path)
+    peer_worker = SQLiteTokenStore(path)
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", this_worker)
+    spotify_oauth.store_tokens("leased", {"access_token": "l-old", "refresh_token": "l-refresh", "expires_in": 10})
+    spotify_oauth.store_tokens("failing", {"access_token": "f-old", "refresh_token": "f-refresh", "expires_in": 10})
+    assert peer_worker.claim("refresh_lease", "leased", {"owner": "peer"}, ttl_seconds=30)
+    refreshed_with: list[str] = []
+
+    async def failing_refresh_access_token(refresh_token: str) -> dict:
+        refreshed_with.append(refresh_token)
+        raise spotify_client.SpotifyClientError(status_code=400, message="invalid_grant")
+
+    monkeypatch.setattr(spotify_client_async, "_refresh_access_token", failing_refresh_access_token)
+
+    assert asyncio.run(spotify_client_async.refresh_expiring_sessions()) == 0
+    assert asyncio.run(spotify_client_async.refresh_expiring_sessions()) == 0
+
+    # The peer owns "leased"; "failing" is backed off after its first failure instead of retried every pass.
+    assert refreshed_with == ["f-refresh"]
+    this_worker.close()
+    peer_worker.close()
+
+
+def test_add_items_in_chunks_keeps_order_and_reports_partial_failure(monkeypatch) -> None:
+    calls: list[tuple[int, int | None, str]] = []
+
+    async def fake_add_items_to_playlist(
+        access_token: str,
+        playlist_id: str,
+        uris: list[str],
+        position: int | None = None,
+    ) -> dict:
+        calls.append((len(uris), position, uris[0]))
+        if len(calls) == 3:
+            raise spotify_client.SpotifyClientError(status_code=500, message="Server error")
+        return {"snapshot_id": f"snap-{len(calls)}"}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_client_async, "add_items_to_playlist", fake_add_items_to_playlist)
+    uris = [f"spotify:track:{index}" for index in range(350)]
+
+    result = asyncio.run(
+        spotify_client_async.SpotifySession("session-123").add_items_to_playlist_in_chunks(
+            "playlist-123",
+            uris,
+            position=5,
+        )
+    )
+
+    assert calls == [
+        (100, 5, "spotify:track:0"),
+        (100, 105, "spotify:track:100"),
+        (100, 205, "spotify:track:200"),
+    ]
+    assert result["snapshot_id"] == "snap-2"
+    assert result["total"] == 350
+    assert result["added"] == 200
+    assert [chunk["status"] for chunk in result["chunks"]] == ["ok", "ok", "error", "skipped"]
+    assert result["chunks"][2]["message"] == "Server error"
+    assert result["chunks"][3]["count"] == 50
+
+
+def test_library_save_in_chunks_reports_partial_failure(monkeypatch) -> None:
+    chunks: list[list[str]] = []
+
+    async def fake_save_to_my_library(access_token: str, uris: list[str]) -> dict:
+        chunks.append(uris)
+        if uris[0] == "spotify:track:40":
+            raise spotify_client.SpotifyClientError(status_code=400, message="Bad URI")
+        return {}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_client_async, "save_to_my_library", fake_save_to_my_library)
+    uris = [f"spotify:track:{index}" for index in range(100)]
+
+    result = asyncio.run(spotify_client_async.SpotifySession("session-123").save_to_my_library_in_chunks(uris))
+
+    assert sorted(len(chunk) for chunk in chunks) == [20, 40, 40]
+    assert result["total"] == 100
+    assert result["succeeded"] == 60
+    assert result["failed_uris"] == uris[40:80]
+    assert [chunk["status"] for chunk in result["chunks"]] == ["ok", "error", "ok"]
+    assert result["chunks"][1]["message"] == "Bad URI"
+
+
+def test_spotify_session_concurrent_chunks_share_one_token_lookup(monkeypatch, tmp_path) -> None:
+    lookups: list[str] = []
+    # A blocking backend sends the lookup to a thread, which is what lets concurrent chunks race it.
+    store = SQLiteTokenStore(str(tmp_path / "tokens.db"))
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", store)
+
+    def counting_get_tokens(session_id: str) -> TokenRecord:
+        lookups.append(session_id)
+        return TokenRecord(access_token="access-123")
+
+    async def fake_save_to_my_library(access_token: str, uris: list[str]) -> dict:
+        await asyncio.sleep(0)
+        return {}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", counting_get_tokens)
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "save_to_my_library", fake_save_to_my_library)
+    uris = [f"spotify:track:{index}" for index in range(400)]
+
+    result = asyncio.run(spotify_client_async.SpotifySession("session-123").save_to_my_library_in_chunks(uris))
+
+    assert result["succeeded"] == 400
+    assert lookups == ["session-123"]
+    store.close()
+
+
+def test_library_save_in_chunks_raises_when_every_chunk_fails(monkeypatch) -> None:
+    async def fake_save_to_my_library(access_token: str, uris: list[str]) -> dict:
+        raise spotify_client.SpotifyClientError(status_code=403, message="Insufficient client scope")
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_client_async, "save_to_my_library", fake_save_to_my_library)
+
+    with pytest.raises(spotify_client.SpotifyClientError) as exc_info:
+        asyncio.run(
+            spotify_client_async.SpotifySession("session-123").save_to_my_library_in_chunks(["spotify:track:abc"])
+        )
+
+    assert exc_info.value.status_code == 403
+
+
+def test_spotify_session_resolves_token_once_and_keeps_refreshed_token(monkeypatch) -> None:
+    state = {"lookups": 0, "refresh_calls": 0, "tokens_seen": []}
+    tokens = {"access_token": "old-access"}
+
+    def fake_get_tokens(session_id: str) -> TokenRecord:
+        state["lookups"] += 1
+        return TokenRecord(access_token=tokens["access_token"], refresh_token="refresh-123")
+
+    def fake_store_tokens(session_id: str, token_data: dict) -> None:
+        tokens["access_token"] = token_data["access_token"]
+
+    async def fake_refresh_access_token(refresh_token: str) -> dict:
+        state["refresh_calls"] += 1
+        return {"access_token": "new-access"}
+
+    async def fake_get_current_user(access_token: str) -> dict:
+        state["tokens_seen"].append(access_token)
+        if access_token != "new-access":
+            raise spotify_client.SpotifyClientError(status_code=401, message="Expired token", auth_error=True)
+        return {"display_name": "Test User"}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", fake_get_tokens)
+    monkeypatch.setattr(spotify_api, "store_tokens", fake_store_tokens)
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "_refresh_access_token", fake_refresh_access_token)
+    monkeypatch.setattr(spotify_client_async, "get_current_user", fake_get_current_user)
+
+    async def run_requests() -> list[dict]:
+        session = spotify_client_async.SpotifySession("session-123")
+        return [await session.get_current_user() for _ in range(3)]
+
+    assert asyncio.run(run_requests()) == [{"display_name": "Test User"}] * 3
+    assert state["refresh_calls"] == 1
+    assert state["tokens_seen"] == ["old-access", "new-access", "new-access", "new-access"]
+    # One lookup to resolve the session, one inside the refresh to check for a peer refresh.
+    assert state["lookups"] == 2
+
+
+
+def test_spotify_session_coalesces_large_playlist_pages_concurrently(monkeypatch) -> None:
+    calls: list[tuple[int, int]] = []
+    in_flight = {"current": 0, "peak": 0}
+
+    async def fake_get_my_playlists(access_token: str, limit: int = 10, offset: int = 0) -> dict:
+        calls.append((limit, offset))
+        in_flight["current"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+        await asyncio.sleep(0.01)
+        in_flight["current"] -= 1
+        items = [{"name": f"playlist-{index}"} for index in range(offset, min(offset + limit, 23))]
+        return {"items": items, "limit": limit, "offset": offset, "total": 23, "next": None}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "get_my_playlists", fake_get_my_playlists)
+
+    session = spotify_client_async.SpotifySession("session-123")
+    page = asyncio.run(session.get_my_playlists(limit=35, offset=0))
+
+    # The first window reports 23 items, so the window at offset 30 is never requested.
+    assert calls[0] == (10, 0)
+    assert sorted(calls[1:]) == [(10, 10), (10, 20)]
+    assert in_flight["peak"] == 2
+    assert [item["name"] for item in page["items"]] == [f"playlist-{index}" for index in range(23)]
+    assert (page["limit"], page["offset"], page["total"]) == (35, 0, 23)
+
+
+def test_spotify_session_small_search_stays_a_single_upstream_call(monkeypatch) -> None:
+    calls: list[tuple[int, int]] = []
+
+    async def fake_search_tracks(access_token: str, query: str, limit: int = 10, offset: int = 0) -> dict:
+        calls.append((limit, offset))
+        return {"tracks": {"items": [], "limit": limit, "offset": offset, "total": 0}}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "search_tracks", fake_search_tracks)
+
+    session = spotify_client_async.SpotifySession("session-123")
+    payload = asyncio.run(session.search_tracks("road trip", limit=7, offset=20))
+
+    assert calls == [(7, 20)]
+    assert payload == {"tracks": {"items": [], "limit": 7, "offset": 20, "total": 0}}
+
+
+def test_spotify_session_large_search_stops_at_first_window_total(monkeypatch) -> None:
+    calls: list[tuple[int, int]] = []
+
+    async def fake_search_tracks(access_token: str, query: str, limit: int = 10, offset: int = 0) -> dict:
+        calls.append((limit, offset))
+        items = [{"id": f"t{index}"} for index in range(offset, min(offset + limit, 4))]
+        return {"tracks": {"items": items, "limit": limit, "offset": offset, "total": 4, "next": None}}
+
+    monkeypatch.setattr(spotify_api, "get_tokens", lambda _: TokenRecord(access_token="access-123"))
+    monkeypatch.setattr(spotify_api, "mark_session_active", lambda _: None)
+    monkeypatch.setattr(spotify_client_async, "search_tracks", fake_search_tracks)
+
+    session = spotify_client_async.SpotifySession("session-123")
+    payload = asyncio.run(session.search_tracks("rare", limit=200, offset=0))
+
+    assert calls == [(10, 0)]
+    assert [item["id"] for item in payload["tracks"]["items"]] == ["t0", "t1", "t2", "t3"]
+    assert (payload["tracks"]["limit"], payload["tracks"]["total"]) == (200, 4)
+
+
+def test_refresh_reads_past_worker_cache_to_see_peer_rotation(monkeypatch, tmp_path) -> None:
+    path = str(tmp_path / "tokens.db")
+    this_worker = CachedTokenStore(SQLiteTokenStore(path), ttl_seconds=60)
+    peer_worker = SQLiteTokenStore(path)
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", this_worker)
+    spotify_oauth.store_tokens("session-1", {"access_token": "old-access", "refresh_token": "old-refresh"})
+    assert spotify_oauth.get_tokens("session-1").access_token == "old-access"
+
+    # The peer refreshes and rotates the refresh token; this worker's cache still holds the old record.
+    peer_worker.put("tokens", "session-1", TokenRecord("peer-access", "peer-refresh"))
+    refreshed_with: list[str] = []
+
+    async def fake_refresh_access_token(refresh_token: str) -> dict:
+        refreshed_with.append(refresh_token)
+        return {"access_token": "unexpected"}
+
+    monkeypatch.setattr(spotify_client_async, "_refresh_access_token", fake_refresh_access_token)
+
+    access_token = asyncio.run(spotify_client_async._refresh_session_access_token("session-1", "old-access"))
+
+    assert access_token == "peer-access"
+    assert refreshed_with == []
+    assert spotify_oauth.get_tokens("session-1").refresh_token == "peer-refresh"
+    this_worker.close()
+    peer_worker.close()
+
+
+def test_failed_refresh_drops_the_cached_session(monkeypatch, tmp_path) -> None:
+    path = str(tmp_path / "tokens.db")
+    this_worker = CachedTokenStore(SQLiteTokenStore(path), ttl_seconds=60)
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", this_worker)
+    spotify_oauth.store_tokens("session-1", {"access_token": "old-access", "refresh_token": "old-refresh"})
+
+    async def failing_refresh_access_token(refresh_token: str) -> dict:
+        raise spotify_client.SpotifyClientError(status_code=400, message="invalid_grant")
+
+    monkeypatch.setattr(spotify_client_async, "_refresh_access_token", failing_refresh_access_token)
+
+    with pytest.raises(spotify_client.SpotifyClientError):
+        asyncio.run(spotify_client_async._refresh_session_access_token("session-1", "old-access"))
+
+    assert ("tokens", "session-1") not in this_worker._entries
+    this_worker.close()
+
+
+def test_blocking_token_store_io_runs_off_the_event_loop(monkeypatch, tmp_path) -> None:
+    import threading
+
+    read_threads: list[int] = []
+
+    class RecordingStore(SQLiteTokenStore):
+        def get(self, namespace: str, key: str):
+            read_threads.append(threading.get_ident())
+            return super().get(namespace, key)
+
+    store = RecordingStore(str(tmp_path / "tokens.db"))
+    monkeypatch.setattr(spotify_oauth, "TOKEN_STORE", store)
+    spotify_oauth.store_tokens("session-1", {"access_token": "access-1", "refresh_token": "refresh-1"})
+    read_threads.clear()
+
+    async def resolve() -> tuple[str, int]:
+        session = spotify_client_async.SpotifySession("session-1")
+        return await session.access_token(), threading.get_ident()
+
+    access_token, loop_thread = asyncio.run(resolve())
+
+    assert access_token == "access-1"
+    assert read_threads and loop_thread not in read_threads
+    store.close()
@@ -0,0 +1,357 @@
+import asyncio
+import fnmatch
+import socketserver
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services.token_store import (
+    CachedTokenStore,
+    MemoryTokenStore,
+    RedisTokenStore,
+    SQLiteTokenStore,
+    TokenRecord,
+    TokenStore,
+    create_token_store,
+    run_token_store_sweeper,
+)
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    # Just enough of the Redis protocol for RedisTokenStore.
+    def _read_command(self) -> list[str] | None:
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+        return args
+
+    def _bulk(self, value: str | None) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        encoded = value.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(encoded), encoded)
+
+    def _live(self, key: str) -> str | None:
+        entry = self.server.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.server.data[key]
+            return None
+        return value
+
+    def handle(self) -> None:
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            if name == "SET":
+                options = [arg.upper() for arg in args[3:]]
+                expires_at = time.time() + int(args[3 + options.index("PX") + 1]) / 1000 if "PX" in options else None
+                if "NX" in options and self._live(args[1]) is not None:
+                    reply = self._bulk(None)
+                else:
+                    self.server.data[args[1]] = (args[2], expires_at)
+                    reply = b"+OK\r\n"
+            elif name == "GET":
+                reply = self._bulk(self._live(args[1]))
+            elif name == "GETDEL":
+                reply = self._bulk(self._live(args[1]))
+                self.server.data.pop(args[1], None)
+            elif name == "MGET":
+                values = [self._bulk(self._live(key)) for key in args[1:]]
+                reply = b"*%d\r\n" % len(values) + b"".join(values)
+            elif name == "ZADD":
+                self.server.zsets.setdefault(args[1], {})[args[3]] = float(args[2])
+                reply = b":1\r\n"
+            elif name == "ZREM":
+                members = self.server.zsets.get(args[1], {})
+                removed = [members.pop(member) for member in args[2:] if member in members]
+                reply = b":%d\r\n" % len(removed)
+            elif name == "ZRANGEBYSCORE":
+                members = self.server.zsets.get(args[1], {})
+                low, high = float(args[2]), float(args[3])
+                ranked = sorted(members.items(), key=lambda item: item[1])
+                keys = [member for member, score in ranked if low <= score <= high]
+                reply = b"*%d\r\n" % len(keys) + b"".join(map(self._bulk, keys))
+            elif name == "SCAN":
+                names = list(self.server.data) + [key for key, members in self.server.zsets.items() if members]
+                keys = [key for key in names if fnmatch.fnmatchcase(key, args[3])]
+                reply = b"*2\r\n" + self._bulk("0") + b"*%d\r\n" % len(keys) + b"".join(map(self._bulk, keys))
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def redis_store():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.data = {}
+    server.zsets = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    store = RedisTokenStore(host="127.0.0.1", port=server.server_address[1])
+    yield store
+    store.close()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def token_store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTokenStore()
+    if request.param == "sqlite":
+        store = SQLiteTokenStore(str(tmp_path / "tokens.db"))
+        request.addfinalizer(store.close)
+        return store
+    return request.getfixturevalue("redis_store")
+
+
+def test_token_store_round_trips_records(token_store) -> None:
+    record = {"token_data": {"access_token": "access-123"}, "expires_at": 123.5}
+    token_store.put("tokens", "session-1", record)
+    token_store.put("tokens", "session-2", {"token_data": {}})
+    token_store.put("pending_auth", "state-1", {"verifier": "v"})
+
+    assert token_store.get("tokens", "session-1") == record
+    assert token_store.get("tokens", "missing") is None
+    assert sorted(key for key, _ in token_store.items("tokens")) == ["session-1", "session-2"]
+
+    assert token_store.pop("pending_auth", "state-1") == {"verifier": "v"}
+    assert token_store.pop("pending_auth", "state-1") is None
+
+    token_store.delete("tokens", "session-2")
+    assert [key for key, _ in token_store.items("tokens")] == ["session-1"]
+
+
+def test_token_store_round_trips_token_records(token_store) -> None:
+    record = TokenRecord(
+        access_token="access-123",
+        refresh_token="refresh-123",
+        expires_at=1700003600.0,
+        scope="user-read-private",
+        stored_at=1700000000.0,
+        last_used_at=1700000100.0,
+    )
+    token_store.put("tokens", "session-1", record)
+
+    loaded = token_store.get("tokens", "session-1")
+
+    assert isinstance(loaded, TokenRecord)
+    assert loaded == record
+    assert not hasattr(loaded, "__dict__")
+
+
+def test_token_store_lists_tokens_expiring_before_a_deadline(token_store) -> None:
+    def record(expires_at: float | None) -> TokenRecord:
+        return TokenRecord("access", "refresh", expires_at, None, 1700000000.0, 1700000000.0)
+
+    token_store.put("tokens", "due", record(1000.0))
+    token_store.put("tokens", "due-at-deadline", record(2000.0))
+    token_store.put("tokens", "later", record(3000.0))
+    token_store.put("tokens", "no-expiry", record(None))
+    token_store.put("tokens", "legacy", {"token_data": {}})
+    token_store.put("tokens", "lapsed", record(500.0), ttl_seconds=0.05)
+    token_store.put("refresh_leases", "due", record(1000.0))
+    token_store.put("tokens", "refreshed", record(1500.0))
+    token_store.put("tokens", "refreshed", record(5000.0))
+    token_store.put("tokens", "logged-out", record(1500.0))
+    token_store.delete("tokens", "logged-out")
+    time.sleep(0.1)
+
+    due = dict(token_store.items_expiring_before("tokens", 2000.0))
+
+    assert sorted(due) == ["due", "due-at-deadline"]
+    assert due["due"] == record(1000.0)
+
+
+def test_sqlite_token_store_adds_expiry_column_to_existing_databases(tmp_path) -> None:
+    path = tmp_path / "tokens.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE token_store (namespace TEXT NOT NULL, key TEXT NOT NULL, record TEXT NOT NULL, "
+        "expires_at REAL, PRIMARY KEY (namespace, key))"
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteTokenStore(str(path))
+    store.put("tokens", "session-1", TokenRecord("access", "refresh", 1000.0, None, 1.0, 1.0))
+
+    assert [key for key, _ in store.items_expiring_before("tokens", 2000.0)] == ["session-1"]
+    store.close()
+
+
+def test_token_store_honours_ttl(token_store) -> None:
+    token_store.put("pending_auth", "state-1", {"verifier": "v"}, ttl_seconds=0.05)
+    assert token_store.get("pending_auth", "state-1") == {"verifier": "v"}
+
+    time.sleep(0.1)
+
+    assert token_store.get("pending_auth", "state-1") is None
+    assert list(token_store.items("pending_auth")) == []
+
+
+def test_token_store_claim_is_exclusive_until_it_expires(token_store) -> None:
+    assert token_store.claim("refresh_lease", "session-1", {"owner": "a"}, ttl_seconds=0.05)
+    assert not token_store.claim("refresh_lease", "session-1", {"owner": "b"}, ttl_seconds=0.05)
+    assert token_store.get("refresh_lease", "session-1") == {"owner": "a"}
+
+    time.sleep(0.1)
+
+    assert token_store.claim("refresh_lease", "session-1", {"owner": "b"}, ttl_seconds=5)
+    assert token_store.get("refresh_lease", "session-1") == {"owner": "b"}
+
+
+def test_memory_token_store_sweeps_expired_entries_from_heap() -> None:
+    store = MemoryTokenStore()
+    store.put("pending_auth", "abandoned", {"verifier": "v"}, ttl_seconds=10)
+    store.put("tokens", "renewed", {"v": 1}, ttl_seconds=10)
+    store.put("tokens", "renewed", {"v": 2}, ttl_seconds=1000)
+    store.put("tokens", "forever", {"v": 3})
+
+    assert store.sweep_expired(now=time.time() + 100) == 1
+    assert store.get("pending_auth", "abandoned") is None
+    assert store.get("tokens", "renewed") == {"v": 2}
+    assert store.get("tokens", "forever") == {"v": 3}
+    assert store.stats()["expired"] == 1
+    assert store.stats()["expiry_heap_size"] == 1
+
+
+def test_memory_token_store_evicts_least_recently_used() -> None:
+    store = MemoryTokenStore(max_entries=2)
+    store.put("tokens", "a", {"v": "a"})
+    store.put("tokens", "b", {"v": "b"})
+    store.get("tokens", "a")
+    store.put("tokens", "c", {"v": "c"})
+
+    assert store.get("tokens", "b") is None
+    assert store.get("tokens", "a") == {"v": "a"}
+    assert len(store) == 2
+    assert store.stats()["evicted"] == 1
+
+
+def test_memory_token_store_evicts_within_each_namespace() -> None:
+    store = MemoryTokenStore(max_entries=2)
+    store.put("tokens", "session-1", {"v": 1})
+    store.put("tokens", "session-2", {"v": 2})
+    for index in range(5):
+        store.put("pending_auth", f"state-{index}", {"verifier": "v"})
+
+    assert store.get("tokens", "session-1") == {"v": 1}
+    assert store.get("tokens", "session-2") == {"v": 2}
+    assert sorted(key for key, _ in store.items("pending_auth")) == ["state-3", "state-4"]
+    assert store.stats()["entries_by_namespace"] == {"tokens": 2, "pending_auth": 2}
+
+
+def test_redis_token_store_stats_count_only_its_own_keys(redis_store) -> None:
+    redis_store.put("tokens", "session-1", {"v": 1})
+    redis_store.put("pending_auth", "state-1", {"verifier": "v"})
+    redis_store.put("pending_auth", "state-2", {"verifier": "v"})
+    redis_store._command("SET", "another-app:key", "value")
+
+    stats = redis_store.stats()
+
+    assert stats["entries"] == 3
+    assert stats["entries_by_namespace"] == {"tokens": 1, "pending_auth": 2}
+
+
+def test_sqlite_token_store_sweeps_expired_rows(tmp_path) -> None:
+    store = SQLiteTokenStore(str(tmp_path / "tokens.db"))
+    store.put("pending_auth", "abandoned", {"verifier": "v"}, ttl_seconds=10)
+    store.put("tokens", "session-1", {"v": 1})
+
+    assert store.sweep_expired(now=time.time() + 100) == 1
+    assert store.stats()["entries_by_namespace"] == {"tokens": 1}
+    store.close()
+
+
+def test_token_store_sweeper_runs_until_stopped() -> None:
+    store = MemoryTokenStore()
+    store.put("pending_auth", "abandoned", {"verifier": "v"}, ttl_seconds=0)
+
+    async def run_once() -> None:
+        stop_event = asyncio.Event()
+        sweeper = asyncio.create_task(run_token_store_sweeper(store, 60, stop_event))
+        await asyncio.sleep(0.05)
+        stop_event.set()
+        await sweeper
+
+    asyncio.run(run_once())
+
+    assert len(store) == 0
+
+
+def test_sqlite_token_store_is_shared_between_instances(tmp_path) -> None:
+    path = str(tmp_path / "tokens.db")
+    writer = SQLiteTokenStore(path)
+    reader = SQLiteTokenStore(path)
+
+    writer.put("tokens", "session-1", {"token_data": {"access_token": "a"}})
+
+    assert reader.get("tokens", "session-1") == {"token_data": {"access_token": "a"}}
+    assert reader._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    writer.close()
+    reader.close()
+
+
+def test_cached_token_store_reads_through_until_ttl(tmp_path) -> None:
+    backend = SQLiteTokenStore(str(tmp_path / "tokens.db"))
+    other_worker = SQLiteTokenStore(str(tmp_path / "tokens.db"))
+    store = CachedTokenStore(backend, ttl_seconds=60)
+    backend.put("tokens", "session-1", {"v": 1})
+
+    assert store.get("tokens", "session-1") == {"v": 1}
+    other_worker.put("tokens", "session-1", {"v": 2})
+    assert store.get("tokens", "session-1") == {"v": 1}
+    assert (store.hits, store.misses) == (1, 1)
+
+    store.clear_cache()
+    assert store.get("tokens", "session-1") == {"v": 2}
+
+    store.put("tokens", "session-1", {"v": 3})
+    assert store.get("tokens", "session-1") == {"v": 3}
+    assert store.pop("tokens", "session-1") == {"v": 3}
+    assert store.get("tokens", "session-1") is None
+    store.close()
+    other_worker.close()
+
+
+def test_create_token_store_parses_urls(tmp_path) -> None:
+    assert isinstance(create_token_store("memory://", cache_ttl_seconds=5), MemoryTokenStore)
+
+    sqlite_store = create_token_store(f"sqlite:///{tmp_path / 'tokens.db'}", cache_ttl_seconds=5)
+    assert isinstance(sqlite_store, CachedTokenStore)
+    assert isinstance(sqlite_store.backend, SQLiteTokenStore)
+    sqlite_store.close()
+
+    redis_store = create_token_store("redis://:secret@cache.local:6380/2")
+    assert isinstance(redis_store, RedisTokenStore)
+    assert (redis_store.host, redis_store.port, redis_store.db, redis_store.password) == (
+        "cache.local",
+        6380,
+        2,
+        "secret",
+    )
+
+    with pytest.raises(ValueError):
+        create_token_store("postgres://db")
+
+
+def test_incomplete_token_store_backend_fails_at_construction() -> None:
+    class GetOnlyStore(TokenStore):
+        def get(self, namespace: str, key: str):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyStore()
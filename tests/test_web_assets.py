@@ -0,0 +1,75 @@
+import gzip
+import re
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.static_assets import IMMUTABLE_CACHE_CONTROL, build_asset_bundle, negotiate_encoding
+
+client = TestClient(app)
+
+
+def test_index_references_hashed_assets_served_immutable() -> None:
+    index = client.get("/")
+
+    assert index.status_code == 200
+    assert index.headers["cache-control"] == "no-cache"
+    script_path = re.search(r'src="(/web/app\.[0-9a-f]{12}\.js)"', index.text).group(1)
+
+    script = client.get(script_path, headers={"Accept-Encoding": "gzip"})
+
+    assert script.status_code == 200
+    assert script.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert script.headers["content-encoding"] == "gzip"
+    assert script.headers["vary"] == "Accept-Encoding"
+    assert "javascript" in script.headers["content-type"]
+
+    revalidated = client.get(
+        script_path,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": script.headers["etag"]},
+    )
+    assert revalidated.status_code == 304
+
+
+def test_unhashed_asset_names_still_served() -> None:
+    response = client.get("/web/styles.css")
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert client.get("/web/missing.js").status_code == 404
+
+
+def test_assets_answer_head_requests() -> None:
+    for path in ("/", "/web/app.js"):
+        get = client.get(path)
+        head = client.head(path)
+
+        assert head.status_code == 200
+        assert head.content == b""
+        assert head.headers["etag"] == get.headers["etag"]
+        assert head.headers["content-type"] == get.headers["content-type"]
+
+
+def test_build_asset_bundle_precompresses_and_rewrites_index(tmp_path) -> None:
+    (tmp_path / "index.html").write_text('<script src="/web/app.js"></script><img src="/web/other.png">')
+    (tmp_path / "app.js").write_text("console.log('hello');\n" * 100)
+
+    assets = build_asset_bundle(tmp_path)
+
+    hashed_paths = [path for path in assets if re.fullmatch(r"/web/app\.[0-9a-f]{12}\.js", path)]
+    assert len(hashed_paths) == 1
+    assert f'src="{hashed_paths[0]}"' in assets["/"].variants["identity"].decode("utf-8")
+    assert 'src="/web/other.png"' in assets["/"].variants["identity"].decode("utf-8")
+    script = assets[hashed_paths[0]]
+    assert gzip.decompress(script.variants["gzip"]) == script.variants["identity"]
+    assert script.immutable
+    assert not assets["/web/app.js"].immutable
+
+
+def test_negotiate_encoding_prefers_brotli_and_honours_q_zero() -> None:
+    available = {"identity": b"x", "gzip": b"g", "br": b"b"}
+
+    assert negotiate_encoding("gzip, deflate, br", available) == "br"
+    assert negotiate_encoding("br;q=0, gzip", available) == "gzip"
+    assert negotiate_encoding("*", {"identity": b"x", "gzip": b"g"}) == "gzip"
+    assert negotiate_encoding(None, available) == "identity"